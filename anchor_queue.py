@@ -0,0 +1,372 @@
+#anchor_queue.py
+# Durable outbox between the wipe pipeline and the anchoring backend.
+#
+# A finished wipe only drops a small JSON file into anchor_outbox/pending/ and
+# moves on, so wipes complete at disk speed however slow the chain is. An
+# AnchorSubmitter (started by the GUI, or `python anchor_queue.py drain`)
+# claims pending entries in batches, submits them with retries and
+# exponential backoff, then writes the confirmed txid back into the chained
+# log, the certificate and the ledger.
+#
+# Outbox layout, one file per final hash:
+#   pending/   waiting for (re)submission
+#   inflight/  claimed by a submitter; rename() makes the claim atomic
+#   done/      anchored, with the txid recorded
+import os
+import sys
+import json
+import time
+import random
+import threading
+import argparse
+
+from blockchain_connector import get_anchor_backend, record_anchors
+
+OUTBOX_DIR = "anchor_outbox"
+BATCH_SIZE = 32
+POLL_INTERVAL = 2.0
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 600.0
+# Inflight entries older than this belong to a submitter that died mid-batch
+STALE_INFLIGHT_SECONDS = 300
+
+
+def _outbox_dirs(outbox_dir):
+    dirs = {name: os.path.join(outbox_dir, name) for name in ("pending", "inflight", "done")}
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+    return dirs
+
+
+def _write_json_durable(path, data):
+    """Write JSON via a temp file + fsync + rename so a crash never leaves a torn entry."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def enqueue(final_hash, log_path=None, json_path=None, outbox_dir=OUTBOX_DIR):
+    """
+    Queue final_hash for anchoring. log_path/json_path point at the chained
+    log and certificate that should receive the txid once it is confirmed.
+    Returns the path of the outbox entry.
+    """
+    dirs = _outbox_dirs(outbox_dir)
+    entry = {
+        "final_hash": final_hash,
+        "log_path": os.path.abspath(log_path) if log_path else None,
+        "json_path": os.path.abspath(json_path) if json_path else None,
+        "queued_at": time.time(),
+        "attempts": 0,
+        "next_attempt_at": 0,
+        "last_error": None,
+    }
+    path = os.path.join(dirs["pending"], f"{final_hash}.json")
+    _write_json_durable(path, entry)
+    return path
+
+
+def pending_count(outbox_dir=OUTBOX_DIR):
+    """Number of entries not yet anchored (pending or inflight)."""
+    dirs = _outbox_dirs(outbox_dir)
+    return sum(
+        1 for d in (dirs["pending"], dirs["inflight"])
+        for name in os.listdir(d) if name.endswith(".json")
+    )
+
+
+def recover_inflight(outbox_dir=OUTBOX_DIR, older_than=STALE_INFLIGHT_SECONDS):
+    """Return stale inflight entries to pending. Returns how many were recovered."""
+    dirs = _outbox_dirs(outbox_dir)
+    now = time.time()
+    recovered = 0
+    for name in os.listdir(dirs["inflight"]):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(dirs["inflight"], name)
+        try:
+            if now - os.path.getmtime(path) < older_than:
+                continue
+            os.rename(path, os.path.join(dirs["pending"], name))
+            recovered += 1
+        except FileNotFoundError:
+            continue
+    return recovered
+
+
+def _claim_batch(dirs, batch_size, now):
+    """Atomically move up to batch_size due entries from pending to inflight."""
+    candidates = []
+    for name in os.listdir(dirs["pending"]):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(dirs["pending"], name)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        if entry.get("next_attempt_at", 0) <= now:
+            candidates.append((entry.get("queued_at", 0), name, entry))
+
+    claimed = []
+    for _, name, entry in sorted(candidates, key=lambda c: c[:2])[:batch_size]:
+        inflight_path = os.path.join(dirs["inflight"], name)
+        try:
+            os.rename(os.path.join(dirs["pending"], name), inflight_path)
+        except FileNotFoundError:
+            continue  # another submitter claimed it first
+        # Touch so recover_inflight measures from the claim, not the enqueue
+        os.utime(inflight_path)
+        claimed.append((name, entry))
+    return claimed
+
+
+def _backoff_seconds(attempts):
+    """Exponential backoff with jitter, capped at MAX_BACKOFF."""
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _log_has_confirmation(log_path, txid):
+    with open(log_path, "r") as f:
+        entries = json.load(f)["log_entries"]
+    return any(e.get("event") == "anchor_confirmed" and e.get("txid") == txid for e in entries)
+
+
+def reconcile(entry, txid):
+    """
+    Write a confirmed txid into the chained log and the certificate. Safe to
+    repeat after a partial failure: the log entry is only appended once.
+    """
+    # Imported here: wipe_pipeline imports this module
+    from wipe_pipeline import append_log_entry
+    from report_generator import update_certificate
+
+    log_path = entry.get("log_path")
+    if log_path and os.path.exists(log_path) and not _log_has_confirmation(log_path, txid):
+        append_log_entry(log_path, {
+            "event": "anchor_confirmed",
+            "final_hash": entry["final_hash"],
+            "txid": txid,
+            "attempts": entry.get("attempts", 0),
+            "timestamp": time.time()
+        })
+    json_path = entry.get("json_path")
+    if json_path and os.path.exists(json_path):
+        update_certificate(json_path, {"Ledger ID": txid})
+
+
+def _submit(backend, dirs, claimed, now):
+    """
+    Anchor the claimed entries that have no txid yet. On failure they go
+    back to pending with a backoff and are dropped from claimed.
+    """
+    to_submit = [(name, entry) for name, entry in claimed if not entry.get("txid")]
+    if not to_submit:
+        return claimed, 0
+    try:
+        txids = backend.submit_batch([entry["final_hash"] for _, entry in to_submit])
+    except Exception as e:
+        for name, entry in to_submit:
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            entry["next_attempt_at"] = now + _backoff_seconds(entry["attempts"])
+            entry["last_error"] = str(e)
+            _write_json_durable(os.path.join(dirs["pending"], name), entry)
+            os.remove(os.path.join(dirs["inflight"], name))
+        return [c for c in claimed if c[1].get("txid")], len(to_submit)
+    anchored_at = time.time()
+    records = backend.ledger_records(txids)
+    for name, entry in to_submit:
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        entry["txid"] = txids[entry["final_hash"]]
+        entry["anchored_at"] = anchored_at
+        entry["ledger_record"] = records.get(entry["txid"])
+        # On disk before anything else can fail: after a crash from here on
+        # recover_inflight hands back an entry that is never re-submitted
+        _write_json_durable(os.path.join(dirs["inflight"], name), entry)
+    return claimed, 0
+
+
+def _mirror_to_ledger(claimed):
+    """Record the backend's ledger entries for the claimed txids in one write."""
+    records = {entry["txid"]: entry["ledger_record"] for _, entry in claimed if entry.get("ledger_record")}
+    if records:
+        record_anchors(records)
+
+
+def process_pending(backend=None, outbox_dir=OUTBOX_DIR, batch_size=BATCH_SIZE, on_anchored=None):
+    """
+    Submit one batch of due entries and reconcile the confirmed ones.
+    Returns (anchored, failed) counts. on_anchored(entry, txid) is called
+    for every entry once its txid is written back.
+
+    The txid is saved in the inflight entry as soon as the backend returns
+    it. An entry whose anchor succeeded but whose ledger mirror or
+    reconciliation failed goes back to pending with its txid kept; the
+    retry only redoes the bookkeeping and never re-submits the hash.
+    """
+    backend = backend or get_anchor_backend()
+    dirs = _outbox_dirs(outbox_dir)
+    now = time.time()
+    claimed = _claim_batch(dirs, batch_size, now)
+    if not claimed:
+        return 0, 0
+
+    claimed, failed = _submit(backend, dirs, claimed, now)
+    try:
+        _mirror_to_ledger(claimed)
+        ledger_error = None
+    except Exception as e:
+        ledger_error = e
+    anchored = 0
+    for name, entry in claimed:
+        txid = entry["txid"]
+        try:
+            if ledger_error is not None:
+                raise ledger_error
+            reconcile(entry, txid)
+        except Exception as e:
+            entry["reconcile_attempts"] = entry.get("reconcile_attempts", 0) + 1
+            entry["next_attempt_at"] = time.time() + _backoff_seconds(entry["reconcile_attempts"])
+            entry["reconcile_error"] = str(e)
+            _write_json_durable(os.path.join(dirs["pending"], name), entry)
+            os.remove(os.path.join(dirs["inflight"], name))
+            failed += 1
+            continue
+        entry.pop("reconcile_error", None)
+        entry["reconciled_at"] = time.time()
+        _write_json_durable(os.path.join(dirs["done"], name), entry)
+        os.remove(os.path.join(dirs["inflight"], name))
+        anchored += 1
+        if on_anchored:
+            on_anchored(entry, txid)
+    return anchored, failed
+
+
+class AnchorSubmitter(threading.Thread):
+    """
+    Background thread that keeps draining the outbox. Call wake() after
+    enqueueing to skip the poll delay, stop() to shut it down.
+    """
+    def __init__(self, backend=None, outbox_dir=OUTBOX_DIR, batch_size=BATCH_SIZE,
+                 poll_interval=POLL_INTERVAL, on_anchored=None):
+        super().__init__(name="anchor-submitter", daemon=True)
+        self.backend = backend or get_anchor_backend()
+        self.outbox_dir = outbox_dir
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.on_anchored = on_anchored
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self):
+        recover_inflight(self.outbox_dir)
+        while not self._stopping.is_set():
+            try:
+                anchored, _ = process_pending(self.backend, self.outbox_dir,
+                                              self.batch_size, self.on_anchored)
+            except Exception as e:
+                print("Anchor submitter error:", e)
+                anchored = 0
+            # A full batch means there may be more waiting; go straight round
+            if anchored < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+def drain(backend=None, outbox_dir=OUTBOX_DIR, batch_size=BATCH_SIZE, timeout=None):
+    """Submit until the outbox is empty or timeout expires. Returns entries left."""
+    backend = backend or get_anchor_backend()
+    deadline = None if timeout is None else time.time() + timeout
+    recover_inflight(outbox_dir, older_than=0)
+    while pending_count(outbox_dir):
+        if deadline is not None and time.time() >= deadline:
+            break
+        anchored, failed = process_pending(backend, outbox_dir, batch_size)
+        if not anchored and not failed:
+            time.sleep(min(POLL_INTERVAL, 0.5))  # everything left is backing off
+    return pending_count(outbox_dir)
+
+
+def make_stub_rpc_server(host="127.0.0.1", port=8545, latency=0.0, fail_rate=0.0, quiet=False, seed=None):
+    """
+    Local stand-in for the chain's JSON-RPC endpoint. Answers anchor_batch
+    with a fake txid per hash after `latency` seconds, failing a `fail_rate`
+    fraction of calls (drawn from `seed` when given, for repeatable runs),
+    so the queue can be exercised without a real node. Returns the server,
+    not yet serving; server.calls counts requests and server.batch_sizes
+    records how many hashes each one carried.
+    """
+    import hashlib
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    failures = random.Random(seed)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            self.server.calls += 1
+            self.server.batch_sizes.append(len(body["params"][0]))
+            time.sleep(latency)
+            if failures.random() < fail_rate:
+                reply = {"jsonrpc": "2.0", "id": body.get("id"),
+                         "error": {"code": -32000, "message": "stub: simulated failure"}}
+            else:
+                hashes = body["params"][0]
+                reply = {"jsonrpc": "2.0", "id": body.get("id"), "result": {
+                    h: "0x" + hashlib.sha256(b"stub-tx" + h.encode()).hexdigest() for h in hashes
+                }}
+            data = json.dumps(reply).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            if not quiet:
+                print("stub-rpc:", fmt % args)
+
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.calls = 0
+    server.batch_sizes = []
+    return server
+
+
+def serve_stub_rpc(host="127.0.0.1", port=8545, latency=0.0, fail_rate=0.0):
+    server = make_stub_rpc_server(host, port, latency, fail_rate)
+    print(f"Stub JSON-RPC anchoring server on http://{host}:{server.server_address[1]}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Anchoring outbox tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_drain = sub.add_parser("drain", help="submit everything in the outbox")
+    p_drain.add_argument("--timeout", type=float, default=None)
+    sub.add_parser("status", help="show how many entries are waiting")
+    p_stub = sub.add_parser("stub-server", help="run a local stand-in JSON-RPC endpoint")
+    p_stub.add_argument("--port", type=int, default=8545)
+    p_stub.add_argument("--latency", type=float, default=0.0)
+    p_stub.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "drain":
+        left = drain(timeout=args.timeout)
+        print(f"{left} entries still pending.")
+        sys.exit(1 if left else 0)
+    elif args.command == "status":
+        print(f"{pending_count()} entries pending anchoring.")
+    else:
+        serve_stub_rpc(port=args.port, latency=args.latency, fail_rate=args.fail_rate)
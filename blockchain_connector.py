@@ -1,10 +1,92 @@
 #blockchain_connector.py
 import json
 import os
+import time
+import fcntl
+import itertools
+import urllib.request
+from contextlib import contextmanager
 
 # The ledger file that stores anchored hashes
 LEDGER_FILE = "ledger.json"
 
+# When set, hashes are anchored through this JSON-RPC endpoint instead of
+# only the local ledger (see JsonRpcBackend).
+ANCHOR_RPC_URL = os.environ.get("SECUREWIPER_ANCHOR_RPC_URL")
+
+
+# The journal is started afresh once it grows past this; the ledger itself
+# always holds every entry
+JOURNAL_MAX_BYTES = 16 * 1024 * 1024
+
+# Lock contention counters for this process (read by the fleet simulator)
+LEDGER_LOCK_STATS = {"acquisitions": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+
+class AnchorError(Exception):
+    """Raised when a backend rejects or fails to anchor a batch."""
+
+
+@contextmanager
+def _ledger_lock():
+    """
+    Exclusive lock around ledger read-modify-write. Wipes run in separate
+    worker processes, so a plain load/dump would lose concurrent entries.
+    """
+    with open(LEDGER_FILE + ".lock", "a") as lock_file:
+        started = time.perf_counter()
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        waited = time.perf_counter() - started
+        LEDGER_LOCK_STATS["acquisitions"] += 1
+        LEDGER_LOCK_STATS["wait_seconds"] += waited
+        LEDGER_LOCK_STATS["max_wait_seconds"] = max(LEDGER_LOCK_STATS["max_wait_seconds"], waited)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_ledger(ledger):
+    """Write the ledger atomically so readers never see a half-written file."""
+    tmp_path = LEDGER_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(ledger, f, indent=2)
+    os.replace(tmp_path, LEDGER_FILE)
+
+
+def _append_journal(records):
+    """
+    Append the new entries to ledger.json.journal, one JSON line per txid,
+    after the ledger itself is written. Readers that keep the ledger in
+    memory (verify_server.py) tail this instead of re-reading the ledger.
+
+    Rotation: past JOURNAL_MAX_BYTES the journal is replaced by a new, empty
+    file. That is safe under the ledger lock, since the ledger just written
+    holds every entry; readers see the new inode and reload the ledger.
+    """
+    journal_path = LEDGER_FILE + ".journal"
+    try:
+        if os.path.getsize(journal_path) > JOURNAL_MAX_BYTES:
+            open(journal_path + ".tmp", "w").close()
+            os.replace(journal_path + ".tmp", journal_path)
+    except FileNotFoundError:
+        pass
+    with open(journal_path, "a") as f:
+        f.write("".join(json.dumps(dict(record, txid=txid)) + "\n" for txid, record in records.items()))
+
+
+def record_anchors(records):
+    """
+    Add {txid: record} entries to the local ledger in one locked write.
+    Each record must at least carry the anchored "hash".
+    """
+    with _ledger_lock():
+        ledger = get_ledger()
+        ledger.update(records)
+        _write_ledger(ledger)
+        _append_journal(records)
+
+
 def anchor_hash(final_hash: str):
     """
     Anchor the final wipe hash into a local JSON ledger.
@@ -12,27 +94,81 @@ def anchor_hash(final_hash: str):
     Returns the txid.
     """
     txid = final_hash  # in real blockchain this would be txid, here we just reuse the hash
+    record_anchors({txid: {"hash": final_hash}})
+    return txid
 
-    # Load existing ledger (if it exists)
-    ledger = {}
-    if os.path.exists(LEDGER_FILE):
+
+class LocalLedgerBackend:
+    """Anchors a batch straight into ledger.json; each txid is the hash itself."""
+    name = "local"
+
+    def submit_batch(self, hashes):
+        record_anchors({h: {"hash": h} for h in hashes})
+        return {h: h for h in hashes}
+
+    def ledger_records(self, txids):
+        return {}  # submit_batch already wrote them
+
+
+class JsonRpcBackend:
+    """
+    Anchors a batch with a single JSON-RPC 2.0 call:
+
+        {"method": <method>, "params": [[hash, ...]]}
+
+    The result is either {hash: txid} or a list of txids in submission
+    order. Confirmed txids should be mirrored into the local ledger so
+    verify.py keeps working offline; that is left to the caller (see
+    ledger_records), so a failed local write never re-submits the batch.
+    """
+    name = "jsonrpc"
+
+    def __init__(self, url, method="anchor_batch", timeout=15):
+        self.url = url
+        self.method = method
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+
+    def submit_batch(self, hashes):
+        payload = {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": self.method,
+            "params": [list(hashes)],
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
         try:
-            with open(LEDGER_FILE, "r") as f:
-                ledger = json.load(f)
-        except json.JSONDecodeError:
-            # Reset if file corrupted
-            ledger = {}
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.load(response)
+        except (OSError, ValueError) as e:
+            raise AnchorError(f"RPC call to {self.url} failed: {e}") from e
 
-    # Add this txid/hash entry
-    ledger[txid] = {
-        "hash": final_hash
-    }
+        if body.get("error"):
+            raise AnchorError(f"RPC error: {body['error']}")
+        result = body.get("result")
+        if isinstance(result, list) and len(result) == len(hashes):
+            txids = dict(zip(hashes, result))
+        elif isinstance(result, dict) and all(h in result for h in hashes):
+            txids = {h: result[h] for h in hashes}
+        else:
+            raise AnchorError(f"Unexpected RPC result: {result!r}")
+        return txids
 
-    # Save updated ledger back to disk
-    with open(LEDGER_FILE, "w") as f:
-        json.dump(ledger, f, indent=2)
+    def ledger_records(self, txids):
+        """Local ledger entries for confirmed {hash: txid}, for record_anchors()."""
+        return {txid: {"hash": h, "backend": self.url} for h, txid in txids.items()}
+
+
+def get_anchor_backend():
+    """The configured anchoring backend: JSON-RPC if a URL is set, else the local ledger."""
+    if ANCHOR_RPC_URL:
+        return JsonRpcBackend(ANCHOR_RPC_URL)
+    return LocalLedgerBackend()
 
-    return txid
 
 def get_ledger():
     """
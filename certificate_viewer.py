@@ -8,6 +8,8 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt
 from verify import verify_by_json_data
+import json
+from wipe_archive import artifact_path, load_artifact
 
 class CertificateViewer(QDialog):
     """
@@ -36,17 +38,20 @@ class CertificateViewer(QDialog):
 
         # Extract data for display
         self.cert_data = self.result_data.get("cert_data", {})
-        pdf_path = self.result_data.get("pdf", "N/A")
+        # Falls back to an extracted copy if the PDF has been archived
+        pdf_path = artifact_path(self.result_data.get("pdf")) or self.result_data.get("pdf") or "N/A"
 
-        # Data fields to display
+        # Data fields to display (signed certificates use report_generator's display names)
+        def get(key, cert_key, default="N/A"):
+            return self.cert_data.get(key, self.cert_data.get(cert_key, default))
         fields = {
-            "Status": self.cert_data.get("status", "Unknown"),
-            "Drive": self.cert_data.get("drive", "N/A"),
-            "Serial Number": self.cert_data.get("serial", "N/A"),
-            "Wipe Method": self.cert_data.get("wipe_method", "N/A"),
-            "Timestamp": self.cert_data.get("timestamp", "N/A"),
-            "Final Verification Hash": self.cert_data.get("final_hash", "N/A"),
-            "Ledger TXID": self.cert_data.get("ledger_txid", "N/A"),
+            "Status": get("status", "Status", "Unknown"),
+            "Drive": get("drive", "Drive Name"),
+            "Serial Number": get("serial", "Drive Serial"),
+            "Wipe Method": get("wipe_method", "Wipe Method"),
+            "Timestamp": get("timestamp", "Timestamp"),
+            "Final Verification Hash": get("final_hash", "Verification Hash"),
+            "Ledger TXID": get("ledger_txid", "Ledger ID"),
             "PDF Report": pdf_path,
         }
         
@@ -83,6 +88,18 @@ class CertificateViewer(QDialog):
         self.close_button.rejected.connect(self.reject)
         main_layout.addWidget(self.close_button)
 
+    @staticmethod
+    def result_from_certificate(json_path):
+        """
+        Result dict for an existing certificate JSON, on disk or archived,
+        so past certificates can be shown with CertificateViewer(...).
+        """
+        return {
+            "cert_data": json.loads(load_artifact(json_path)),
+            "json": json_path,
+            "pdf": os.path.splitext(json_path)[0] + ".pdf",
+        }
+
     def run_verification(self):
         """
         Runs the verification logic from verify.py and updates the UI.
@@ -0,0 +1,390 @@
+#erase_planner.py
+# Capability-aware erase planning. Instead of one fixed command per media
+# type, probe what the drive actually supports (hdparm -I, nvme id-ctrl)
+# and pick the fastest method that still meets the required NIST 800-88
+# level. Crypto erase / crypto scramble take seconds; overwrite takes hours.
+#
+# A plan is a plain dict so it can go straight into the chained log:
+#   {"method_name", "nist_level", "estimated_seconds", "reason",
+#    "steps": [{"cmd": [...], "poll": None | "ata-sanitize" | "nvme-sanitize"}],
+#    "candidates": [...every method considered, with why it was or wasn't usable]}
+import re
+import json
+import time
+import subprocess
+
+# Media types the planner probes; everything else keeps its NIST_METHODS entry
+PLANNED_MEDIA = ("SATA SSD", "NVMe M.2 SSD")
+
+NIST_LEVELS = {"Clear": 1, "Purge": 2}
+
+# Same throwaway password the fixed table always used
+ATA_PASSWORD = "p"
+
+# Rough costs where the drive doesn't report its own estimate
+CRYPTO_ERASE_SECONDS = 10
+BLOCK_ERASE_SECONDS = 120
+NVME_FORMAT_SECONDS = 60
+OVERWRITE_MB_PER_S = 150
+
+SANITIZE_POLL_INTERVAL = 5
+# Give up polling after this many status reads fail in a row
+MAX_POLL_ERRORS = 5
+# NVMe reports "no estimate" for a sanitize time as all ones
+NVME_TIME_UNREPORTED = 0xFFFFFFFF
+
+
+def _run(cmd):
+    return subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT)
+
+
+def parse_hdparm_identify(text):
+    """
+    Parse the capabilities we care about out of `hdparm -I` output.
+    Unknown or missing fields come back False / None.
+    """
+    caps = {
+        "model": None,
+        "serial": None,
+        "security_supported": False,
+        "security_enabled": False,
+        "security_locked": False,
+        "security_frozen": False,
+        "enhanced_erase_supported": False,
+        "erase_minutes": None,
+        "enhanced_erase_minutes": None,
+        "sanitize_supported": False,
+        "crypto_scramble": False,
+        "block_erase": False,
+        "overwrite": False,
+    }
+    m = re.search(r"Model Number:\s*(.+)", text)
+    if m:
+        caps["model"] = m.group(1).strip()
+    m = re.search(r"Serial Number:\s*(.+)", text)
+    if m:
+        caps["serial"] = m.group(1).strip()
+
+    # The Security: block runs until the next unindented section header
+    m = re.search(r"^Security:[ \t]*\n((?:[ \t][^\n]*\n)*)", text + "\n", re.MULTILINE)
+    if m:
+        for raw in m.group(1).splitlines():
+            line = " ".join(raw.split())
+            if line == "supported":
+                caps["security_supported"] = True
+            elif line == "enabled":
+                caps["security_enabled"] = True
+            elif line == "locked":
+                caps["security_locked"] = True
+            elif line == "frozen":
+                caps["security_frozen"] = True
+            elif line == "supported: enhanced erase":
+                caps["enhanced_erase_supported"] = True
+        times = m.group(1)
+        e = re.search(r"(\d+)min for SECURITY ERASE UNIT", times)
+        if e:
+            caps["erase_minutes"] = int(e.group(1))
+        e = re.search(r"(\d+)min for ENHANCED SECURITY ERASE UNIT", times)
+        if e:
+            caps["enhanced_erase_minutes"] = int(e.group(1))
+
+    # Feature lines look like "	   *	SANITIZE feature set", with '*' marking
+    # enabled. The sanitize commands count as soon as they are listed.
+    features = set()
+    m = re.search(r"^Commands/features:[ \t]*\n((?:[ \t][^\n]*\n)*)", text + "\n", re.MULTILINE)
+    if m:
+        for raw in m.group(1).splitlines():
+            features.add(" ".join(raw.strip().lstrip("*").split()))
+    caps["sanitize_supported"] = "SANITIZE feature set" in features
+    caps["crypto_scramble"] = "CRYPTO_SCRAMBLE_EXT command" in features
+    caps["block_erase"] = "BLOCK_ERASE_EXT command" in features
+    caps["overwrite"] = "OVERWRITE_EXT command" in features
+    return caps
+
+
+def parse_nvme_id_ctrl(text):
+    """Parse `nvme id-ctrl -o json` into format/sanitize capabilities."""
+    data = json.loads(text)
+    oacs = int(data.get("oacs", 0))
+    fna = int(data.get("fna", 0))
+    sanicap = int(data.get("sanicap", 0))
+    return {
+        "model": str(data.get("mn", "")).strip() or None,
+        "serial": str(data.get("sn", "")).strip() or None,
+        "format_supported": bool(oacs & 0x2),
+        # FNA bit 2: crypto erase is supported as part of Format NVM
+        "format_crypto_erase": bool(fna & 0x4),
+        # SANICAP bits 0-2: crypto erase, block erase, overwrite (any set
+        # means the Sanitize command itself is supported)
+        "sanitize_crypto_erase": bool(sanicap & 0x1),
+        "sanitize_block_erase": bool(sanicap & 0x2),
+        "sanitize_overwrite": bool(sanicap & 0x4),
+    }
+
+
+def parse_nvme_sanitize_log(text):
+    """
+    Parse `nvme sanitize-log -o json`. Returns {"state", "progress",
+    "estimates"} where state is one of idle / in_progress / completed /
+    failed and progress is 0.0-1.0. Newer nvme-cli nests the log under the
+    device name, older versions don't.
+    """
+    data = json.loads(text)
+    if "sprog" not in data:
+        data = next((v for v in data.values() if isinstance(v, dict) and "sprog" in v), data)
+    sprog = int(data.get("sprog", 0))
+    sstat = data.get("sstat", 0)
+    if isinstance(sstat, dict):  # nvme-cli 2.x decodes the fields
+        sstat = sstat.get("status", 0)
+    if isinstance(sstat, str):  # ... and spells the status out: "(2) A sanitize operation is ..."
+        m = re.match(r"\s*\((\d+)\)", sstat)
+        sstat = int(m.group(1)) if m else int(sstat, 0)
+    status = int(sstat) & 0x7
+    state = {0: "idle", 1: "completed", 2: "in_progress", 3: "failed", 4: "completed"}.get(status, "idle")
+
+    estimates = {}
+    for key, name in (("time_crypto_erase", "crypto_erase"), ("time_block_erase", "block_erase"),
+                      ("time_over_write", "overwrite")):
+        value = data.get(key)
+        if value is not None and int(value) not in (0, NVME_TIME_UNREPORTED):
+            estimates[name] = int(value)
+    return {
+        "state": state,
+        "progress": 1.0 if state == "completed" else sprog / 65536,
+        "estimates": estimates,
+    }
+
+
+def parse_hdparm_sanitize_status(text):
+    """
+    Parse `hdparm --sanitize-status` into the same shape as the NVMe log.
+    hdparm reports the ATA sanitize state (SD0 idle, SD1 frozen, SD2 in
+    process, SD3 failed, SD4 succeeded) plus a "Completed Without Error"
+    line once a sanitize has finished.
+    """
+    progress = 0.0
+    m = re.search(r"Progress:\s*0x[0-9a-fA-F]+\s*\((\d+)%\)", text)
+    if m:
+        progress = int(m.group(1)) / 100
+    lower = text.lower()
+    if "in process" in lower:
+        state = "in_progress"
+    elif any(s in lower for s in ("failed", "unsuccessfully", "completed with error", "frozen")):
+        state = "failed"
+    elif "completed without error" in lower or "succeeded" in lower:
+        state = "completed"
+        progress = 1.0
+    else:
+        state = "idle"
+    return {"state": state, "progress": progress, "estimates": {}}
+
+
+def nvme_controller_path(device_path):
+    """/dev/nvme0n1 -> /dev/nvme0 (sanitize is a controller-level command)."""
+    m = re.match(r"^(/dev/nvme\d+)n\d+$", device_path)
+    return m.group(1) if m else device_path
+
+
+def _candidate(method_name, nist_level, estimated_seconds, steps, available=True, reason=""):
+    return {
+        "method_name": method_name,
+        "nist_level": nist_level,
+        "estimated_seconds": estimated_seconds,
+        "steps": steps,
+        "available": available,
+        "reason": reason,
+    }
+
+
+def _overwrite_seconds(size_bytes):
+    if not size_bytes:
+        return None
+    return int(size_bytes / (OVERWRITE_MB_PER_S * 1e6))
+
+
+def ata_candidates(caps, device_path, size_bytes=None):
+    """Every erase method for a SATA drive, marked available or not."""
+    dev = device_path
+    sanitize_steps = lambda action: [{
+        "cmd": ["sudo", "hdparm", "--yes-i-know-what-i-am-doing", action, dev],
+        "poll": "ata-sanitize",
+    }]
+    security_steps = lambda erase_flag: [
+        {"cmd": ["sudo", "hdparm", "--user-master", "u", "--security-set-pass", ATA_PASSWORD, dev], "poll": None},
+        {"cmd": ["sudo", "hdparm", "--user-master", "u", erase_flag, ATA_PASSWORD, dev], "poll": None},
+    ]
+
+    security_problem = ""
+    if not caps["security_supported"]:
+        security_problem = "ATA security feature set not supported"
+    elif caps["security_frozen"]:
+        security_problem = "drive is security-frozen (suspend/resume or hot-plug to unfreeze)"
+    elif caps["security_enabled"] or caps["security_locked"]:
+        security_problem = "a security password is already set"
+
+    def minutes(m):
+        return m * 60 if m else None
+
+    return [
+        _candidate("Sanitize Crypto Scramble (NIST 800-88 Purge)", "Purge", CRYPTO_ERASE_SECONDS,
+                   sanitize_steps("--sanitize-crypto-scramble"),
+                   caps["sanitize_supported"] and caps["crypto_scramble"],
+                   "" if caps["crypto_scramble"] else "CRYPTO_SCRAMBLE_EXT not supported"),
+        _candidate("Sanitize Block Erase (NIST 800-88 Purge)", "Purge", BLOCK_ERASE_SECONDS,
+                   sanitize_steps("--sanitize-block-erase"),
+                   caps["sanitize_supported"] and caps["block_erase"],
+                   "" if caps["block_erase"] else "BLOCK_ERASE_EXT not supported"),
+        _candidate("Enhanced Secure Erase (NIST 800-88 Purge)", "Purge",
+                   minutes(caps["enhanced_erase_minutes"]) or _overwrite_seconds(size_bytes),
+                   security_steps("--security-erase-enhanced"),
+                   not security_problem and caps["enhanced_erase_supported"],
+                   security_problem or ("" if caps["enhanced_erase_supported"] else "enhanced erase not supported")),
+        _candidate("Secure Erase (NIST 800-88 Purge)", "Purge",
+                   minutes(caps["erase_minutes"]) or _overwrite_seconds(size_bytes),
+                   security_steps("--security-erase"),
+                   not security_problem, security_problem),
+        _candidate("Overwrite 1-pass (NIST 800-88 Clear)", "Clear", _overwrite_seconds(size_bytes),
+                   [{"cmd": ["sudo", "nwipe", "--autonuke", "--nogui", "--method=zero", dev], "poll": None}]),
+    ]
+
+
+def nvme_candidates(caps, device_path, size_bytes=None, estimates=None):
+    """Every erase method for an NVMe drive, marked available or not."""
+    estimates = estimates or {}
+    ctrl = nvme_controller_path(device_path)
+    return [
+        _candidate("NVMe Sanitize Crypto Erase (NIST 800-88 Purge)", "Purge",
+                   estimates.get("crypto_erase", CRYPTO_ERASE_SECONDS),
+                   [{"cmd": ["sudo", "nvme", "sanitize", ctrl, "--sanact=4"], "poll": "nvme-sanitize"}],
+                   caps["sanitize_crypto_erase"],
+                   "" if caps["sanitize_crypto_erase"] else "sanitize crypto erase not supported"),
+        _candidate("NVMe Format Crypto Erase (NIST 800-88 Purge)", "Purge", CRYPTO_ERASE_SECONDS,
+                   [{"cmd": ["sudo", "nvme", "format", device_path, "--ses=2"], "poll": None}],
+                   caps["format_supported"] and caps["format_crypto_erase"],
+                   "" if caps["format_crypto_erase"] else "format crypto erase not supported"),
+        _candidate("NVMe Sanitize Block Erase (NIST 800-88 Purge)", "Purge",
+                   estimates.get("block_erase", BLOCK_ERASE_SECONDS),
+                   [{"cmd": ["sudo", "nvme", "sanitize", ctrl, "--sanact=2"], "poll": "nvme-sanitize"}],
+                   caps["sanitize_block_erase"],
+                   "" if caps["sanitize_block_erase"] else "sanitize block erase not supported"),
+        _candidate("NVMe Format User Data Erase (NIST 800-88 Purge)", "Purge", NVME_FORMAT_SECONDS,
+                   [{"cmd": ["sudo", "nvme", "format", device_path, "--ses=1"], "poll": None}],
+                   caps["format_supported"],
+                   "" if caps["format_supported"] else "Format NVM not supported"),
+        _candidate("Overwrite 1-pass (NIST 800-88 Clear)", "Clear", _overwrite_seconds(size_bytes),
+                   [{"cmd": ["sudo", "nwipe", "--autonuke", "--nogui", "--method=zero", device_path], "poll": None}]),
+    ]
+
+
+def choose_plan(candidates, required_level="Purge"):
+    """
+    Fastest available candidate at required_level or better. If nothing
+    reaches that level, fall back to the fastest available one and say so.
+    """
+    def speed(c):
+        return c["estimated_seconds"] if c["estimated_seconds"] is not None else float("inf")
+
+    usable = [c for c in candidates if c["available"]]
+    compliant = [c for c in usable if NIST_LEVELS[c["nist_level"]] >= NIST_LEVELS[required_level]]
+    pool = compliant or usable
+    if not pool:
+        return None
+    best = dict(min(pool, key=speed))
+    best["reason"] = (
+        f"fastest available {required_level}-level method" if compliant
+        else f"no {required_level}-level method available, fell back to {best['nist_level']}"
+    )
+    best["candidates"] = [
+        {k: c[k] for k in ("method_name", "nist_level", "estimated_seconds", "available", "reason")}
+        for c in candidates
+    ]
+    return best
+
+
+def plan_erase(media_type, device_path, size_bytes=None, required_level="Purge", run=_run):
+    """
+    Probe the device and return the chosen plan, or None if the media type
+    isn't planned or probing failed (caller falls back to NIST_METHODS).
+    run(cmd) -> stdout text is injectable for fixtures and simulation.
+    """
+    try:
+        if media_type == "SATA SSD":
+            caps = parse_hdparm_identify(run(["sudo", "hdparm", "-I", device_path]))
+            candidates = ata_candidates(caps, device_path, size_bytes)
+        elif media_type == "NVMe M.2 SSD":
+            caps = parse_nvme_id_ctrl(run(["sudo", "nvme", "id-ctrl", device_path, "-o", "json"]))
+            estimates = {}
+            try:
+                log = run(["sudo", "nvme", "sanitize-log", nvme_controller_path(device_path), "-o", "json"])
+                estimates = parse_nvme_sanitize_log(log)["estimates"]
+            except Exception:
+                pass  # estimates are optional
+            candidates = nvme_candidates(caps, device_path, size_bytes, estimates)
+        else:
+            return None
+    except Exception:
+        return None
+    plan = choose_plan(candidates, required_level)
+    if plan is not None:
+        plan["capabilities"] = caps
+    return plan
+
+
+def sanitize_status(kind, device_path, run=_run):
+    """One status reading for a running sanitize ("ata-sanitize" or "nvme-sanitize")."""
+    if kind == "nvme-sanitize":
+        out = run(["sudo", "nvme", "sanitize-log", nvme_controller_path(device_path), "-o", "json"])
+        return parse_nvme_sanitize_log(out)
+    try:
+        out = run(["sudo", "hdparm", "--sanitize-status", device_path])
+    except subprocess.CalledProcessError as e:
+        # hdparm exits non-zero when the drive reports a failed sanitize;
+        # the reason is still in its output
+        if "error reason" not in (e.output or "").lower():
+            raise
+        out = e.output
+    return parse_hdparm_sanitize_status(out)
+
+
+def poll_sanitize(kind, device_path, estimated_seconds=None, on_progress=None,
+                  interval=SANITIZE_POLL_INTERVAL, run=_run, sleep=time.sleep):
+    """
+    Poll a sanitize that the drive runs in the background until it finishes.
+    on_progress(status) is called on every reading. Gives up after four
+    times the estimate (at least ten minutes). Returns (success, status).
+    Only an explicit completion counts as success: a drive that drops back
+    to idle without reporting one has not confirmed the purge.
+    """
+    deadline = time.time() + max(600, 4 * (estimated_seconds or 0))
+    status = {"state": "idle", "progress": 0.0, "estimates": {}}
+    seen_running = False
+    idle_readings = 0
+    errors = 0
+    while time.time() < deadline:
+        try:
+            status = sanitize_status(kind, device_path, run)
+            errors = 0
+        except Exception as e:
+            errors += 1
+            status = {"state": "error", "progress": status["progress"], "error": str(e)}
+            if errors >= MAX_POLL_ERRORS:
+                return False, status
+        if on_progress:
+            on_progress(status)
+        if status["state"] == "completed":
+            return True, status
+        if status["state"] == "failed":
+            return False, status
+        if status["state"] == "in_progress":
+            seen_running = True
+        elif status["state"] == "idle":
+            if seen_running:
+                status["error"] = "sanitize went idle without reporting completion"
+                return False, status
+            idle_readings += 1
+            if idle_readings >= 3:
+                status["error"] = "sanitize never started"
+                return False, status
+        sleep(interval)
+    status["state"] = "timeout"
+    return False, status
@@ -0,0 +1,278 @@
+#event_stream.py
+# Local publish/subscribe stream of wipe events for bay LED controllers,
+# floor dashboards and anything else that would otherwise scrape logs.
+#
+# The GUI process runs an EventBroker on a Unix socket. Subscribers connect
+# and read newline-delimited JSON, one event per line:
+#
+#   {"type": "throughput", "seq": 1042, "ts": 1760870000.1, "drive": "sdb", ...}
+#
+# Event types: drives_discovered, job_start, phase, throughput, job_finished,
+# certificate, ledger, plus events_dropped (see below). A subscriber may send
+# one line such as {"types": ["job_start", "job_finished"]} to filter.
+#
+# Publishing never blocks: every subscriber has a bounded buffer, and when a
+# slow one falls behind its oldest events are dropped and replaced with a
+# single {"type": "events_dropped", "count": N} so it knows it missed some.
+#
+#   python event_stream.py watch --types throughput,phase
+import os
+import json
+import time
+import socket
+import tempfile
+import argparse
+import selectors
+import threading
+from collections import deque
+
+EVENT_SOCKET = os.environ.get("SECUREWIPER_EVENT_SOCKET",
+                              os.path.join(tempfile.gettempdir(), "securewiper-events.sock"))
+# Per-subscriber backlog before its oldest events are dropped
+MAX_PENDING_BYTES = 1024 * 1024
+MAX_SUBSCRIBERS = 256
+# Throughput events per job are limited to one per this many seconds
+THROUGHPUT_INTERVAL = 1.0
+
+
+class _Subscriber:
+    def __init__(self, sock):
+        self.sock = sock
+        self.queue = deque()    # encoded lines
+        self.sent = 0           # bytes of queue[0] already written
+        self.pending = 0        # bytes queued
+        self.dropped = 0
+        self.types = None       # None = everything
+        self.inbuf = b""
+
+
+class EventBroker:
+    """
+    Unix-socket fan-out of events to any number of subscribers, run by one
+    I/O thread. publish() only encodes the event and appends it to each
+    subscriber's buffer, so it is safe to call from any thread.
+    """
+    def __init__(self, path=EVENT_SOCKET, max_pending_bytes=MAX_PENDING_BYTES):
+        self.path = path
+        self.max_pending_bytes = max_pending_bytes
+        self.seq = 0
+        self.subscribers = {}
+        self.published = 0
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._server = None
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Left over from a crashed run? Only take it over if nobody answers.
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise OSError(f"another event broker is already listening on {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)
+            finally:
+                probe.close()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen(64)
+        self._server.setblocking(False)
+        self._selector.register(self._server, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        self._thread = threading.Thread(target=self._run, name="event-broker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        for sub in list(self.subscribers.values()):
+            self._close(sub)
+        if self._server is not None:
+            self._server.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # already pending
+
+    def publish(self, event):
+        """Stamp event with a sequence number and queue it for every subscriber."""
+        with self._lock:
+            self.seq += 1
+            event = dict(event, seq=self.seq)
+            event.setdefault("ts", time.time())
+            line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+            self.published += 1
+            for sub in self.subscribers.values():
+                if sub.types is None or event.get("type") in sub.types:
+                    self._enqueue(sub, line)
+        self._wake()
+
+    def _enqueue(self, sub, line):
+        sub.queue.append(line)
+        sub.pending += len(line)
+        # Drop whole events from the front, never the one half written
+        while sub.pending > self.max_pending_bytes and len(sub.queue) > 1:
+            index = 1 if sub.sent else 0
+            dropped = sub.queue[index]
+            del sub.queue[index]
+            sub.pending -= len(dropped)
+            sub.dropped += 1
+
+    def _close(self, sub):
+        self.subscribers.pop(sub.sock.fileno(), None)
+        try:
+            self._selector.unregister(sub.sock)
+        except (KeyError, ValueError):
+            pass
+        sub.sock.close()
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        if len(self.subscribers) >= MAX_SUBSCRIBERS:
+            sock.close()
+            return
+        sock.setblocking(False)
+        sub = _Subscriber(sock)
+        with self._lock:
+            self.subscribers[sock.fileno()] = sub
+        self._selector.register(sock, selectors.EVENT_READ, sub)
+
+    def _read(self, sub):
+        try:
+            data = sub.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            with self._lock:
+                self._close(sub)
+            return
+        sub.inbuf = (sub.inbuf + data)[-65536:]
+        while b"\n" in sub.inbuf:
+            line, sub.inbuf = sub.inbuf.split(b"\n", 1)
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(request, dict) and "types" in request:
+                sub.types = set(request["types"]) if request["types"] else None
+
+    def _flush(self, sub):
+        """Write as much as the socket takes without blocking. Called with the lock held."""
+        if sub.dropped and not sub.sent:
+            notice = json.dumps({"type": "events_dropped", "count": sub.dropped, "ts": time.time()})
+            sub.queue.appendleft((notice + "\n").encode("utf-8"))
+            sub.pending += len(sub.queue[0])
+            sub.dropped = 0
+        while sub.queue:
+            head = sub.queue[0]
+            try:
+                n = sub.sock.send(memoryview(head)[sub.sent:])
+            except BlockingIOError:
+                return
+            except OSError:
+                self._close(sub)
+                return
+            sub.sent += n
+            if sub.sent < len(head):
+                return
+            sub.queue.popleft()
+            sub.pending -= len(head)
+            sub.sent = 0
+
+    def _run(self):
+        while not self._stopping:
+            with self._lock:
+                for sub in list(self.subscribers.values()):
+                    want = selectors.EVENT_READ | (selectors.EVENT_WRITE if sub.queue else 0)
+                    if self._selector.get_key(sub.sock).events != want:
+                        self._selector.modify(sub.sock, want, sub)
+            for key, mask in self._selector.select(timeout=1.0):
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wake":
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    sub = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(sub)
+                    if mask & selectors.EVENT_WRITE and sub.sock.fileno() in self.subscribers:
+                        with self._lock:
+                            self._flush(sub)
+
+
+# The broker of this process, if any. Wipe worker processes have none and
+# forward their events to the GUI process over their result pipe instead.
+_broker = None
+
+
+def start_broker(path=EVENT_SOCKET):
+    global _broker
+    if _broker is None:
+        _broker = EventBroker(path).start()
+    return _broker
+
+
+def stop_broker():
+    global _broker
+    if _broker is not None:
+        _broker.stop()
+        _broker = None
+
+
+def publish_event(event):
+    """Publish an already built event dict; a no-op without a broker."""
+    if _broker is not None:
+        _broker.publish(event)
+
+
+def publish(event_type, **fields):
+    publish_event(dict(fields, type=event_type, ts=time.time()))
+
+
+def subscribe(path=EVENT_SOCKET, types=None):
+    """Yield events from a running broker (for consumers and debugging)."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    if types:
+        sock.sendall((json.dumps({"types": list(types)}) + "\n").encode("utf-8"))
+    with sock, sock.makefile("rb") as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the SecureWiper event stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_watch = sub.add_parser("watch", help="print events as they arrive")
+    p_watch.add_argument("--socket", default=EVENT_SOCKET)
+    p_watch.add_argument("--types", help="comma-separated event types")
+    args = parser.parse_args()
+
+    try:
+        for event in subscribe(args.socket, args.types.split(",") if args.types else None):
+            print(json.dumps(event), flush=True)
+    except KeyboardInterrupt:
+        pass
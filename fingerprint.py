@@ -0,0 +1,196 @@
+#fingerprint.py
+# Whole-device fingerprint: the device is split into fixed-size chunks, each
+# chunk is hashed on a thread pool (preadv and hashlib both release the GIL,
+# so the threads really run in parallel) and the chunk digests are combined
+# into a binary hash tree. Two fingerprints with the same chunk size can be
+# diffed chunk by chunk to show exactly which regions changed.
+import os
+import sys
+import errno
+import json
+import mmap
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 64 * 1024 * 1024
+READ_SIZE = 4 * 1024 * 1024
+ALIGNMENT = 4096
+WORKERS = min(8, os.cpu_count() or 1)
+ALGORITHM = "sha256-tree"
+
+
+def device_size_bytes(path):
+    """Size of a file or block device (getsize() is 0 for block devices)."""
+    with open(path, "rb") as f:
+        return f.seek(0, os.SEEK_END)
+
+
+def _open_for_reading(path):
+    """
+    Open with O_DIRECT where the device/filesystem allows it so a full-device
+    read streams past the page cache instead of evicting everything else.
+    Returns (fd, direct).
+    """
+    direct_flag = getattr(os, "O_DIRECT", 0)
+    if direct_flag:
+        try:
+            return os.open(path, os.O_RDONLY | direct_flag), True
+        except OSError:
+            pass
+    return os.open(path, os.O_RDONLY), False
+
+
+def _hash_chunk(path, fd, offset, length, direct):
+    h = hashlib.sha256()
+    # mmap buffers are page aligned, which O_DIRECT requires
+    buf = mmap.mmap(-1, READ_SIZE)
+    view = memoryview(buf)
+    buffered_fd = None
+    try:
+        pos = offset
+        end = offset + length
+        while pos < end:
+            want = min(READ_SIZE, end - pos)
+            if direct:
+                want = -(-want // ALIGNMENT) * ALIGNMENT
+            try:
+                got = os.preadv(fd, [view[:want]], pos)
+            except OSError as e:
+                # Some filesystems accept O_DIRECT at open() but not the
+                # read; the flag belongs to the fd, so carry on with a
+                # buffered one of our own
+                if not direct or e.errno != errno.EINVAL:
+                    raise
+                buffered_fd = fd = os.open(path, os.O_RDONLY)
+                direct = False
+                continue
+            if got <= 0:
+                break
+            got = min(got, end - pos)
+            h.update(view[:got])
+            pos += got
+    finally:
+        if buffered_fd is not None:
+            os.close(buffered_fd)
+        view.release()
+        buf.close()
+    return h.hexdigest()
+
+
+def tree_root(chunk_hashes):
+    """
+    Combine chunk digests into a binary hash tree and return the root.
+    Leaves and inner nodes are domain-separated (0x00 / 0x01 prefixes) so a
+    chunk digest can never be mistaken for an inner node; an odd node at the
+    end of a level is carried up unchanged.
+    """
+    if not chunk_hashes:
+        return hashlib.sha256(b"\x00").hexdigest()
+    level = [hashlib.sha256(b"\x00" + bytes.fromhex(c)).digest() for c in chunk_hashes]
+    while len(level) > 1:
+        nxt = []
+        for i in range(0, len(level) - 1, 2):
+            nxt.append(hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest())
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+
+def fingerprint_device(path, chunk_size=CHUNK_SIZE, workers=WORKERS, progress=None):
+    """
+    Fingerprint the whole of `path`. progress(done_bytes, total_bytes) is
+    called as chunks complete. Returns a dict with the per-chunk digests and
+    the tree root.
+    """
+    if chunk_size % ALIGNMENT:
+        raise ValueError(f"chunk_size must be a multiple of {ALIGNMENT}")
+    size = device_size_bytes(path)
+    offsets = list(range(0, size, chunk_size))
+    start = time.time()
+
+    fd, direct = _open_for_reading(path)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_hash_chunk, path, fd, off, min(chunk_size, size - off), direct)
+                for off in offsets
+            ]
+            chunks = []
+            for i, fut in enumerate(futures):
+                chunks.append(fut.result())
+                if progress:
+                    progress(min((i + 1) * chunk_size, size), size)
+    finally:
+        os.close(fd)
+
+    elapsed = time.time() - start
+    return {
+        "algorithm": ALGORITHM,
+        "device_path": path,
+        "device_size": size,
+        "chunk_size": chunk_size,
+        "chunk_count": len(chunks),
+        "chunks": chunks,
+        "root": tree_root(chunks),
+        "elapsed_seconds": round(elapsed, 3),
+        "mb_per_s": round(size / 1e6 / elapsed, 1) if elapsed > 0 else None,
+        "timestamp": time.time(),
+    }
+
+
+def diff_fingerprints(old, new):
+    """
+    Return the chunks that differ between two fingerprints as a list of
+    {"index", "offset", "length"} dicts. Chunks present in only one of them
+    (different device sizes) count as differing.
+    """
+    if old["chunk_size"] != new["chunk_size"]:
+        raise ValueError("Fingerprints use different chunk sizes and cannot be compared")
+    chunk_size = old["chunk_size"]
+    size = max(old["device_size"], new["device_size"])
+    a, b = old["chunks"], new["chunks"]
+    changed = []
+    for i in range(max(len(a), len(b))):
+        if i >= len(a) or i >= len(b) or a[i] != b[i]:
+            offset = i * chunk_size
+            changed.append({"index": i, "offset": offset, "length": min(chunk_size, size - offset)})
+    return changed
+
+
+def save_fingerprint(fp, path):
+    with open(path, "w") as f:
+        json.dump(fp, f, indent=2)
+
+
+def load_fingerprint(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Device tree-hash fingerprint")
+    parser.add_argument("paths", nargs="+", help="device to fingerprint, or two fingerprint files with --diff")
+    parser.add_argument("--diff", action="store_true", help="compare two saved fingerprints")
+    parser.add_argument("-o", "--output", help="write the fingerprint JSON here")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    if args.diff:
+        if len(args.paths) != 2:
+            parser.error("--diff needs exactly two fingerprint files")
+        old, new = (load_fingerprint(p) for p in args.paths)
+        changed = diff_fingerprints(old, new)
+        print(f"Roots: {old['root']} -> {new['root']}")
+        print(f"{len(changed)} of {max(old['chunk_count'], new['chunk_count'])} chunks differ.")
+        for c in changed:
+            print(f"  chunk {c['index']}: offset {c['offset']} length {c['length']}")
+        sys.exit(1 if changed else 0)
+
+    fp = fingerprint_device(args.paths[0], chunk_size=args.chunk_mb * 1024 * 1024, workers=args.workers)
+    print(f"{fp['root']}  {args.paths[0]} ({fp['chunk_count']} chunks, {fp['mb_per_s']} MB/s)")
+    if args.output:
+        save_fingerprint(fp, args.output)
@@ -0,0 +1,495 @@
+#fleet_sim.py
+# End-to-end load test of the wipe pipeline without root or real disks.
+#
+# Generates a fleet of virtual drives (realistic sizes, media types, speeds
+# and failure rates), backs each one with a sparse file and a fake command
+# runner that prints nwipe/dd-style progress and answers hdparm/nvme queries
+# with the planner's tool-output fixtures (tests/fixtures; synthetic, written
+# in hdparm/nvme-cli's output format, not captured), then pushes them all
+# through the real WipeJob: planning, erase, logging, sampling, anchoring and
+# certificate generation. Erase time is simulated and compressed by
+# --time-scale; everything else runs for real, so the per-stage latencies
+# and ledger/report contention are what a real station would see.
+#
+#   python fleet_sim.py --drives 300 --bays 96
+import os
+import re
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import statistics
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from wipe_pipeline import CommandRunner, WipeJob
+from erase_planner import nvme_controller_path
+import blockchain_connector
+
+# Per media type: share of the fleet, capacities (GB), sequential write
+# speed (MB/s), chance the erase fails, and model names to draw from.
+SIM_PROFILES = {
+    "HDD": {
+        "weight": 0.50, "sizes_gb": [500, 1000, 2000, 4000, 8000], "mb_per_s": (110, 260),
+        "failure_rate": 0.04, "models": ["WDC WD40EFRX-68N", "ST2000DM008-2FR1", "TOSHIBA HDWD110"],
+    },
+    "SATA SSD": {
+        "weight": 0.20, "sizes_gb": [240, 480, 960, 1920], "mb_per_s": (350, 520),
+        "failure_rate": 0.02, "models": ["Samsung SSD 860 EVO", "CT500MX500SSD1", "KINGSTON SA400S37"],
+        # Share of drives exposing sanitize crypto scramble / arriving security-frozen
+        "crypto_rate": 0.6, "frozen_rate": 0.15,
+    },
+    "NVMe M.2 SSD": {
+        "weight": 0.15, "sizes_gb": [256, 512, 1000, 2000], "mb_per_s": (1500, 3500),
+        "failure_rate": 0.01, "models": ["Samsung SSD 970 EVO Plus", "WDC WDS500G2B0C", "INTEL SSDPEKNW010T8"],
+        "crypto_rate": 0.8,
+    },
+    "USB Thumb Drive": {
+        "weight": 0.10, "sizes_gb": [16, 32, 64, 128], "mb_per_s": (8, 40),
+        "failure_rate": 0.06, "models": ["SanDisk Cruzer Blade", "Kingston DataTraveler"],
+    },
+    "SD / microSD": {
+        "weight": 0.05, "sizes_gb": [16, 32, 64], "mb_per_s": (10, 30),
+        "failure_rate": 0.05, "models": ["SD SC32G", "SD EB1QT"],
+    },
+}
+
+# hdparm / nvme-cli output the fake runner answers with, keyed by drive
+# capability or state: the planner tests' fixtures, which are hand-written
+# in the tools' format rather than captured (see tests/fixtures/README)
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures")
+HDPARM_IDENTIFY = {True: "hdparm_identify_micron_5300.txt", False: "hdparm_identify_samsung_860evo.txt"}
+HDPARM_SANITIZE_STATUS = {
+    "idle": "hdparm_sanitize_status_idle.txt",
+    "in_progress": "hdparm_sanitize_status_in_process.txt",
+    "completed": "hdparm_sanitize_status_completed.txt",
+    "failed": "hdparm_sanitize_status_failed.txt",
+}
+NVME_ID_CTRL = {True: "nvme_id_ctrl_micron_7450.json", False: "nvme_id_ctrl_samsung_970evoplus.json"}
+NVME_SANITIZE_LOG = {
+    "idle": "nvme_sanitize_log_never.json",
+    "in_progress": "nvme_sanitize_log_in_progress.json",
+    "completed": "nvme_sanitize_log_completed.json",
+    "failed": "nvme_sanitize_log_failed.json",
+}
+
+# 4 TB at 200 MB/s is 20000 s simulated, 2 s real
+TIME_SCALE = 1e-4
+PROGRESS_LINES = 10
+# Solo certificate generations timed before the fleet starts, as the
+# uncontended reference for the report stage
+REPORT_BASELINE_SAMPLES = 5
+
+
+@lru_cache(maxsize=None)
+def tool_output(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+def make_fleet(count, seed=None):
+    """Draw `count` virtual drives from SIM_PROFILES."""
+    rng = random.Random(seed)
+    media_types = list(SIM_PROFILES)
+    weights = [SIM_PROFILES[m]["weight"] for m in media_types]
+    fleet = []
+    for i in range(count):
+        media_type = rng.choices(media_types, weights)[0]
+        profile = SIM_PROFILES[media_type]
+        fleet.append({
+            "name": f"sim{i:03d}",
+            "media_type": media_type,
+            "model": rng.choice(profile["models"]),
+            "serial": f"SIM{rng.getrandbits(40):010X}",
+            "size_bytes": rng.choice(profile["sizes_gb"]) * 10**9,
+            "mb_per_s": rng.uniform(*profile["mb_per_s"]),
+            "fails": rng.random() < profile["failure_rate"],
+            "crypto": rng.random() < profile.get("crypto_rate", 0),
+            "frozen": rng.random() < profile.get("frozen_rate", 0),
+            "seed": rng.getrandbits(32),
+        })
+    return fleet
+
+
+class FakeCommandRunner(CommandRunner):
+    """
+    Plays the part of nwipe, dd, hdparm and nvme-cli for one virtual drive.
+    Sleeps are scaled by time_scale; sim_seconds accumulates the unscaled
+    erase time for capacity planning.
+    """
+    def __init__(self, drive, time_scale=TIME_SCALE):
+        self.drive = drive
+        self.time_scale = time_scale
+        self.rng = random.Random(drive["seed"])
+        self.sim_seconds = 0.0
+        self._sanitize = None  # (real start, real duration, fails) of a background sanitize
+
+    def sleep(self, seconds):
+        self.sim_seconds += seconds
+        time.sleep(seconds * self.time_scale)
+
+    def _overwrite_seconds(self):
+        return self.drive["size_bytes"] / (self.drive["mb_per_s"] * 1e6)
+
+    def stream(self, cmd, on_line):
+        tool = cmd[1] if cmd[0] == "sudo" else cmd[0]
+        if tool == "nwipe":
+            return self._stream_overwrite(on_line, self._nwipe_line)
+        if tool == "dd":
+            return self._stream_overwrite(on_line, self._dd_line)
+        if tool == "hdparm":
+            return self._stream_hdparm(cmd, on_line)
+        if tool == "nvme":
+            return self._stream_nvme(cmd, on_line)
+        on_line(f"{tool}: command not found")
+        return 127
+
+    def _nwipe_line(self, done, elapsed):
+        pct = 100.0 * done / self.drive["size_bytes"]
+        stamp = time.strftime("[%Y/%m/%d %H:%M:%S]")
+        return f"{stamp}    info: /dev/{self.drive['name']} pass 1/1 zero fill, {pct:.1f}% complete, {self.drive['mb_per_s']:.0f} MB/s"
+
+    def _dd_line(self, done, elapsed):
+        return (f"{done} bytes ({done / 1e9:.1f} GB, {done / 2**30:.1f} GiB) copied, "
+                f"{elapsed:.0f} s, {self.drive['mb_per_s']:.0f} MB/s")
+
+    def _stream_overwrite(self, on_line, fmt):
+        total = self._overwrite_seconds()
+        size = self.drive["size_bytes"]
+        fail_at = self.rng.randint(1, PROGRESS_LINES) if self.drive["fails"] else None
+        if fmt == self._nwipe_line:
+            on_line(f"[{time.strftime('%Y/%m/%d %H:%M:%S')}]  notice: Found /dev/{self.drive['name']}, "
+                    f"ATA, {self.drive['model']}, {size // 10**9} GB, S/N={self.drive['serial']}")
+        for step in range(1, PROGRESS_LINES + 1):
+            self.sleep(total / PROGRESS_LINES)
+            if step == fail_at:
+                on_line(f"error: write failed at byte {size * step // PROGRESS_LINES}: Input/output error")
+                return 1
+            on_line(fmt(size * step // PROGRESS_LINES, total * step / PROGRESS_LINES))
+        return 0
+
+    def _stream_hdparm(self, cmd, on_line):
+        dev = cmd[-1]
+        if "--security-set-pass" in cmd:
+            on_line('security_password: "p"')
+            on_line(f"{dev}:")
+            on_line(" Issuing SECURITY_SET_PASS command, password=\"p\", user=user, mode=high")
+            return 0
+        if "--security-erase" in cmd or "--security-erase-enhanced" in cmd:
+            on_line(f"{dev}:")
+            on_line(" Issuing SECURITY_ERASE command, password=\"p\", user=user")
+            self.sleep(self._overwrite_seconds() * 0.5)
+            return 5 if self.drive["fails"] else 0
+        if any(flag.startswith("--sanitize-") for flag in cmd):
+            on_line(f"{dev}:")
+            on_line("Issuing SANITIZE_CRYPTO_SCRAMBLE command")
+            on_line("Operation started in background")
+            self._start_sanitize(10)
+            return 0
+        return 1
+
+    def _stream_nvme(self, cmd, on_line):
+        if cmd[2] == "sanitize":
+            self._start_sanitize(5 if "--sanact=4" in cmd else 60)
+            on_line("Sanitize command succeeded")
+            return 0
+        if cmd[2] == "format":
+            self.sleep(5 if "--ses=2" in cmd else 60)
+            if self.drive["fails"]:
+                on_line("NVMe status: FORMAT_IN_PROGRESS: A Format NVM command is in progress(0x2184)")
+                return 1
+            on_line("Success formatting namespace:1")
+            return 0
+        return 1
+
+    def _start_sanitize(self, sim_seconds):
+        self.sim_seconds += sim_seconds
+        self._sanitize = (time.time(), sim_seconds * self.time_scale, self.drive["fails"])
+
+    def _sanitize_progress(self):
+        """(state, fraction) of the background sanitize right now."""
+        if self._sanitize is None:
+            return "idle", 0.0
+        started, duration, fails = self._sanitize
+        fraction = min(1.0, (time.time() - started) / duration) if duration else 1.0
+        if fraction < 1.0:
+            return "in_progress", fraction
+        return ("failed" if fails else "completed"), 1.0
+
+    def check_output(self, cmd):
+        tool = cmd[1] if cmd[0] == "sudo" else cmd[0]
+        if tool == "blockdev":
+            return f"{self.drive['size_bytes']}\n"
+        if tool == "hdparm" and "-I" in cmd:
+            return self._hdparm_identify(cmd[-1])
+        if tool == "hdparm" and "--sanitize-status" in cmd:
+            state, fraction = self._sanitize_progress()
+            text = tool_output(HDPARM_SANITIZE_STATUS[state]).replace("/dev/sdb", cmd[-1])
+            progress = int(fraction * 0xffff)
+            return re.sub(r"Progress: 0x[0-9a-f]+ \(\d+%\)",
+                          f"Progress: 0x{progress:x} ({100 * (progress + 1) // 0xffff}%)", text)
+        if tool == "nvme" and cmd[2] == "id-ctrl":
+            data = json.loads(tool_output(NVME_ID_CTRL[self.drive["crypto"]]))
+            # nvme-cli passes the space-padded identify strings through
+            data["mn"] = f"{self.drive['model']:<40}"
+            data["sn"] = f"{self.drive['serial']:<20}"
+            return json.dumps(data, indent=2)
+        if tool == "nvme" and cmd[2] == "sanitize-log":
+            state, fraction = self._sanitize_progress()
+            log = json.loads(tool_output(NVME_SANITIZE_LOG[state]))["nvme0"]
+            if state == "in_progress":
+                log["sprog"] = min(65535, int(fraction * 65536))
+            return json.dumps({nvme_controller_path(cmd[3]).split("/")[-1]: log}, indent=2)
+        raise OSError(f"simulated {tool} has no answer for {' '.join(cmd)}")
+
+    def _hdparm_identify(self, dev):
+        """The hdparm -I fixture with this drive's identity, freeze state and erase time patched in."""
+        d = self.drive
+        text = tool_output(HDPARM_IDENTIFY[d["crypto"]])
+        erase_min = max(2, int(self._overwrite_seconds() / 60 * 0.5))
+        text = re.sub(r"^/dev/\w+:$", f"{dev}:", text, count=1, flags=re.MULTILINE)
+        text = re.sub(r"(Model Number:\s+).*", lambda m: f"{m.group(1)}{d['model']:<40}", text, count=1)
+        text = re.sub(r"(Serial Number:\s+).*", lambda m: f"{m.group(1)}{d['serial']:<20}", text, count=1)
+        text = re.sub(r"^\t(?:not)?\tfrozen$", "\t\tfrozen" if d["frozen"] else "\tnot\tfrozen",
+                      text, count=1, flags=re.MULTILINE)
+        return re.sub(r"\d+min for SECURITY ERASE UNIT\. \d+min for ENHANCED",
+                      f"{erase_min}min for SECURITY ERASE UNIT. {erase_min}min for ENHANCED", text, count=1)
+
+
+def simulate_drive(drive, device_path, time_scale, anchor_mode, sample_count):
+    """Run one virtual drive through a real WipeJob. Top level so worker processes can pickle it."""
+    runner = FakeCommandRunner(drive, time_scale)
+    lock_before = dict(blockchain_connector.LEDGER_LOCK_STATS)
+    started = time.perf_counter()
+    job = WipeJob(drive["name"], drive["media_type"], drive["serial"], sample_count,
+                  runner=runner, device_path=device_path, anchor_mode=anchor_mode,
+                  model=drive["model"],
+                  # Real in-process I/O would read/fill the sparse backing
+                  # files; keep every overwrite on the fake dd/nwipe runner
+                  overwrite_mode="command", quick_kill=False)
+    result = job.run()
+    lock_after = blockchain_connector.LEDGER_LOCK_STATS
+    return {
+        "name": drive["name"],
+        "media_type": drive["media_type"],
+        "method_name": result["cert_data"]["Wipe Method"] if result["cert_data"] else None,
+        "success": result["success"],
+        "expected_failure": drive["fails"],
+        "wall_seconds": time.perf_counter() - started,
+        "sim_erase_seconds": runner.sim_seconds,
+        "stage_timings": result.get("stage_timings", {}),
+        "ledger_lock": {
+            "acquisitions": lock_after["acquisitions"] - lock_before["acquisitions"],
+            "wait_seconds": lock_after["wait_seconds"] - lock_before["wait_seconds"],
+            "max_wait_seconds": lock_after["max_wait_seconds"],
+        },
+    }
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles plus max; empty input gives Nones."""
+    ordered = sorted(values)
+    out = {}
+    for p in points:
+        out[f"p{p}"] = ordered[max(0, -(-len(ordered) * p // 100) - 1)] if ordered else None
+    out["max"] = ordered[-1] if ordered else None
+    return out
+
+
+def project_station(jobs, bays):
+    """
+    Replay the jobs on `bays` bays in submission order using unscaled erase
+    time plus the measured real overhead, giving the makespan a physical
+    station would see.
+    """
+    free_at = [0.0] * bays
+    for job in jobs:
+        overhead = job["wall_seconds"] - job["stage_timings"].get("erase", 0.0)
+        bay = free_at.index(min(free_at))
+        free_at[bay] += job["sim_erase_seconds"] + overhead
+    makespan = max(free_at) if jobs else 0.0
+    busy = sum(j["sim_erase_seconds"] for j in jobs)
+    return {
+        "makespan_hours": makespan / 3600,
+        "drives_per_hour": len(jobs) / (makespan / 3600) if makespan else None,
+        "bay_utilisation": busy / (makespan * bays) if makespan else None,
+    }
+
+
+def report_baseline(samples=REPORT_BASELINE_SAMPLES):
+    """Median seconds per generate_report_and_sign with nothing else running."""
+    from report_generator import generate_report_and_sign
+    timings = []
+    for i in range(samples):
+        started = time.perf_counter()
+        generate_report_and_sign(f"baseline{i}", "BASELINE", "Overwrite 1-pass (NIST 800-88 Clear)",
+                                 True, "0" * 64, "Pending anchor")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run_simulation(drives=200, bays=24, time_scale=TIME_SCALE, backend="thread",
+                   anchor_mode="queue", sample_count=5, seed=None, workdir=None):
+    """
+    Run the whole fleet and return a summary dict. Works inside `workdir`
+    (a fresh temp dir by default) so the real wipes/, ledger and outbox are
+    never touched.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="securewiper-sim-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.makedirs("devices", exist_ok=True)
+
+    fleet = make_fleet(drives, seed)
+    device_paths = {}
+    for d in fleet:
+        path = os.path.abspath(os.path.join("devices", f"{d['name']}.img"))
+        with open(path, "wb") as f:
+            f.truncate(d["size_bytes"])  # sparse: no blocks allocated
+        device_paths[d["name"]] = path
+
+    # Before anything else runs, so the report stage under load has
+    # something to be compared with
+    baseline = report_baseline()
+
+    submitter = None
+    anchor_lags = []
+    if anchor_mode == "queue":
+        from anchor_queue import AnchorSubmitter
+        submitter = AnchorSubmitter(poll_interval=0.2,
+                                    on_anchored=lambda e, txid: anchor_lags.append(e["anchored_at"] - e["queued_at"]))
+        submitter.start()
+
+    if backend == "process":
+        executor = ProcessPoolExecutor(max_workers=bays, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=bays)
+
+    started = time.perf_counter()
+    with executor:
+        futures = [
+            executor.submit(simulate_drive, d, device_paths[d["name"]], time_scale, anchor_mode, sample_count)
+            for d in fleet
+        ]
+        jobs = [f.result() for f in futures]
+    pipeline_seconds = time.perf_counter() - started
+
+    if submitter is not None:
+        from anchor_queue import pending_count
+        deadline = time.time() + 120
+        while pending_count() and time.time() < deadline:
+            submitter.wake()
+            time.sleep(0.1)
+        submitter.stop()
+        submitter.join(timeout=10)
+    total_seconds = time.perf_counter() - started
+
+    stages = sorted({s for j in jobs for s in j["stage_timings"]})
+    lock = dict(blockchain_connector.LEDGER_LOCK_STATS)
+    if backend == "process":
+        # Each worker counted its own lock waits
+        lock["acquisitions"] += sum(j["ledger_lock"]["acquisitions"] for j in jobs)
+        lock["wait_seconds"] += sum(j["ledger_lock"]["wait_seconds"] for j in jobs)
+        lock["max_wait_seconds"] = max([lock["max_wait_seconds"]] +
+                                       [j["ledger_lock"]["max_wait_seconds"] for j in jobs])
+
+    report_load = percentiles([j["stage_timings"]["report"] for j in jobs if "report" in j["stage_timings"]])
+    return {
+        "workdir": workdir,
+        "drives": drives,
+        "bays": bays,
+        "backend": backend,
+        "anchor_mode": anchor_mode,
+        "time_scale": time_scale,
+        "succeeded": sum(1 for j in jobs if j["success"]),
+        "failed": sum(1 for j in jobs if not j["success"]),
+        "unexpected_results": sum(1 for j in jobs if j["success"] == j["expected_failure"]),
+        "pipeline_seconds": pipeline_seconds,
+        "total_seconds": total_seconds,
+        "jobs_per_second": drives / pipeline_seconds if pipeline_seconds else None,
+        "job_latency": percentiles([j["wall_seconds"] for j in jobs]),
+        "stage_latency": {s: percentiles([j["stage_timings"][s] for j in jobs if s in j["stage_timings"]])
+                          for s in stages},
+        "anchor_lag": percentiles(anchor_lags),
+        "ledger_lock": lock,
+        "report_contention": {
+            "baseline_seconds": baseline,
+            "under_load": report_load,
+            "p95_slowdown": report_load["p95"] / baseline if report_load["p95"] and baseline else None,
+        },
+        "methods": {m: sum(1 for j in jobs if j["method_name"] == m)
+                    for m in sorted({j["method_name"] for j in jobs if j["method_name"]})},
+        "station": project_station(jobs, bays),
+    }
+
+
+def format_summary(summary):
+    def fmt(p):
+        if p["max"] is None:
+            return "n/a"
+        return "  ".join(f"{k}={v * 1000:8.1f}ms" for k, v in p.items())
+
+    lines = [
+        f"Simulated {summary['drives']} drives on {summary['bays']} bays "
+        f"({summary['backend']} backend, anchoring: {summary['anchor_mode']}, time scale {summary['time_scale']:g})",
+        f"  succeeded {summary['succeeded']}, failed {summary['failed']}"
+        f" (unexpected outcomes: {summary['unexpected_results']})",
+        f"  pipeline wall time {summary['pipeline_seconds']:.2f} s, {summary['jobs_per_second']:.1f} jobs/s;"
+        f" anchoring drained after {summary['total_seconds']:.2f} s",
+        "",
+        "Latency per stage (real seconds; erase is time-scaled):",
+        f"  {'job':<12} {fmt(summary['job_latency'])}",
+    ]
+    for stage, p in summary["stage_latency"].items():
+        lines.append(f"  {stage:<12} {fmt(p)}")
+    lines += [
+        f"  {'anchor lag':<12} {fmt(summary['anchor_lag'])}",
+        "",
+        f"Ledger lock: {summary['ledger_lock']['acquisitions']} acquisitions, "
+        f"{summary['ledger_lock']['wait_seconds'] * 1000:.1f} ms total wait, "
+        f"{summary['ledger_lock']['max_wait_seconds'] * 1000:.1f} ms max",
+    ]
+    report = summary["report_contention"]
+    if report["under_load"]["max"] is not None:
+        lines.append(
+            f"Report generation: {report['baseline_seconds'] * 1000:.1f} ms alone, "
+            f"p50 {report['under_load']['p50'] * 1000:.1f} ms / p95 {report['under_load']['p95'] * 1000:.1f} ms "
+            f"under load ({report['p95_slowdown']:.1f}x at p95)")
+    lines += [
+        "",
+        "Methods chosen:",
+    ]
+    lines += [f"  {count:4d}  {method}" for method, count in summary["methods"].items()]
+    station = summary["station"]
+    lines += [
+        "",
+        f"Projected real station: makespan {station['makespan_hours']:.1f} h, "
+        f"{station['drives_per_hour'] or 0:.1f} drives/h, bay utilisation {(station['bay_utilisation'] or 0) * 100:.0f}%",
+        f"Artifacts in {summary['workdir']}",
+    ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the wipe pipeline with a simulated fleet")
+    parser.add_argument("--drives", type=int, default=200)
+    parser.add_argument("--bays", type=int, default=24)
+    parser.add_argument("--time-scale", type=float, default=TIME_SCALE,
+                        help="real seconds per simulated second of erase time")
+    parser.add_argument("--backend", choices=("thread", "process"), default="thread")
+    parser.add_argument("--anchor-mode", choices=("queue", "sync"), default="queue")
+    parser.add_argument("--samples", type=int, default=5, help="sectors sampled per drive")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    # Resolve before run_simulation chdirs into the scratch directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    summary = run_simulation(args.drives, args.bays, args.time_scale, args.backend,
+                             args.anchor_mode, args.samples, args.seed,
+                             os.path.abspath(args.workdir) if args.workdir else None)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
@@ -1,13 +1,24 @@
+import os
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QLabel, QVBoxLayout,
-    QMessageBox, QTextEdit, QComboBox, QProgressBar
+    QMessageBox, QTextEdit, QComboBox, QProgressBar, QInputDialog
 )
 from PyQt5.QtGui import QFont # <--- FIX: Import QFont here
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
 from drive_manager import list_drives
-from wipe_manager import WipeThread
-from certificate_viewer import CertificateViewer # Import the new viewer
-from PyQt5.QtWidgets import QListWidget, QListWidgetItem
+import event_stream
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem, QCheckBox
+# wipe_manager (reportlab, cryptography via the pipeline), certificate_viewer
+# and anchor_queue are imported on first use so the window paints quickly.
+
+
+class DriveScanThread(QThread):
+    """Runs list_drives() (lsblk/findmnt) off the GUI thread."""
+    scanned = pyqtSignal(list)
+
+    def run(self):
+        self.scanned.emit(list_drives())
 
 
 class WiperApp(QWidget):
@@ -36,11 +47,26 @@ class WiperApp(QWidget):
         self.refresh_button.clicked.connect(self.load_drives)
         layout.addWidget(self.refresh_button)
 
+        # Optional whole-device pre/post wipe fingerprint (reads the full drive twice)
+        self.fingerprint_checkbox = QCheckBox("Record pre/post-wipe device fingerprint")
+        layout.addWidget(self.fingerprint_checkbox)
+
+        # Overwrite in-process, skipping and retrying around bad regions
+        self.failing_media_checkbox = QCheckBox("Failing-media mode (skip bad regions, bounded retries)")
+        if hasattr(os, "geteuid") and os.geteuid() != 0:
+            self.failing_media_checkbox.setToolTip("Needs root: drives this user cannot open get the standard overwrite.")
+        layout.addWidget(self.failing_media_checkbox)
+
         # Start wipe button
         self.wipe_button = QPushButton("Start Wipe")
         self.wipe_button.clicked.connect(self.start_wipe)
         layout.addWidget(self.wipe_button)
 
+        # Past certificates, including ones already packed into the archive
+        self.certificates_button = QPushButton("Open Past Certificate...")
+        self.certificates_button.clicked.connect(self.open_past_certificate)
+        layout.addWidget(self.certificates_button)
+
         # Progress bar
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 0)  # indeterminate
@@ -54,16 +80,54 @@ class WiperApp(QWidget):
         layout.addWidget(self.log_box)
 
         self.setLayout(layout)
-        self.load_drives()
         self.thread = None # To hold the worker thread
+        self.scan_thread = None
+        self.anchor_submitter = None
+
+        # All run once the event loop is up, i.e. after the window is shown
+        QTimer.singleShot(0, self.start_event_stream)
+        QTimer.singleShot(0, self.load_drives)
+        QTimer.singleShot(0, self.start_anchor_submitter)
+
+    def start_event_stream(self):
+        # Local socket feed for bay LEDs and dashboards (see event_stream.py)
+        try:
+            broker = event_stream.start_broker()
+            self.log_box.append(f"Event stream on {broker.path}")
+        except OSError as e:
+            self.log_box.append(f"Event stream unavailable: {e}")
+
+    def start_anchor_submitter(self):
+        # Drains the anchoring outbox in the background; wipes only enqueue
+        from anchor_queue import AnchorSubmitter
+        self.anchor_submitter = AnchorSubmitter(on_anchored=self.anchor_confirmed)
+        self.anchor_submitter.start()
+
+    def anchor_confirmed(self, entry, txid):
+        # Runs on the submitter thread; publishing is thread-safe
+        event_stream.publish("ledger", status="confirmed", final_hash=entry["final_hash"], txid=txid,
+                             log_path=entry.get("log_path"), json=entry.get("json_path"))
 
-   
     def load_drives(self):
-    # Keep dummy, clear rest
+        if self.scan_thread is not None and self.scan_thread.isRunning():
+            return
+        self.refresh_button.setEnabled(False)
+        self.refresh_button.setText("Scanning drives...")
+        self.scan_thread = DriveScanThread()
+        self.scan_thread.scanned.connect(self.drives_scanned)
+        self.scan_thread.start()
+
+    def drives_scanned(self, drives):
+        self.refresh_button.setText("Refresh Drives")
+        # Stay disabled while a wipe is running
+        self.refresh_button.setEnabled(self.wipe_button.isEnabled())
+
+        # Keep dummy, clear rest
         while self.drive_list.count() > 1:
             self.drive_list.takeItem(1)
 
-        drives = list_drives()
+        event_stream.publish("drives_discovered", drives=[d for d in drives if "error" not in d])
+
         for d in drives:
             display = d.get("error") or f"{d['name']} | {d['size']} | {d['model']} | {d['media_type']} | {d.get('serial','')}"
             item = QListWidgetItem(display)
@@ -88,25 +152,72 @@ class WiperApp(QWidget):
 
         self.progress_bar.show()
         self.log_box.clear()
+        if self.failing_media_checkbox.isChecked() and hasattr(os, "geteuid") and os.geteuid() != 0:
+            self.log_box.append("Failing-media mode needs root; drives this user cannot open will get "
+                                "the standard overwrite instead.")
         self.wipe_button.setEnabled(False)
         self.refresh_button.setEnabled(False)
 
+        from wipe_manager import WIPE_BAYS
+        import wipe_stats
         self.threads = []  # Track multiple threads
 
-        for item in selected_items:
-            drive_info = item.data(1000)
-            thread = WipeThread(
+        # Longest expected erase first, so the last bays to free up aren't
+        # left waiting on one big drive started at the end
+        jobs = [dict(item.data(1000)) for item in selected_items]
+        for job in jobs:
+            job["size_bytes"] = wipe_stats.parse_size(job.get("size"))
+        try:
+            jobs = wipe_stats.order_longest_first(jobs)
+        except Exception as e:
+            self.log_box.append(f"Wipe history unavailable, keeping selection order: {e}")
+        for job in jobs:
+            eta = job.get("eta")
+            self.log_box.append(f"Queued {job['name']}: "
+                                + (f"~{wipe_stats.format_duration(eta['seconds'])} ({eta['basis']})" if eta else "no ETA yet"))
+
+        self.pending_jobs = jobs
+        self.max_running = WIPE_BAYS or len(jobs)
+        self.running_threads = 0
+        self.remaining_threads = len(jobs)
+        self.start_pending_wipes()
+
+    def start_pending_wipes(self):
+        from wipe_manager import create_wipe_thread
+        while self.pending_jobs and self.running_threads < self.max_running:
+            drive_info = self.pending_jobs.pop(0)
+            thread = create_wipe_thread(
                 drive_info["name"],
                 drive_info["media_type"],
-                drive_info.get("serial")
+                drive_info.get("serial"),
+                fingerprint=self.fingerprint_checkbox.isChecked(),
+                overwrite_mode="resilient" if self.failing_media_checkbox.isChecked() else None,
+                model=drive_info.get("model")
             )
             thread.progress.connect(lambda line, d=drive_info["name"]: self.update_log(f"[{d}] {line}"))
             thread.finished.connect(self.thread_done)
             self.threads.append(thread)
             thread.start()
+            self.running_threads += 1
 
-        self.remaining_threads = len(self.threads)
 
+    def open_past_certificate(self):
+        from wipe_archive import certificate_paths
+        from certificate_viewer import CertificateViewer
+        paths = certificate_paths()
+        if not paths:
+            QMessageBox.information(self, "Certificates", "No certificates found.")
+            return
+        names = [os.path.basename(p) for p in paths]
+        name, ok = QInputDialog.getItem(self, "Open Past Certificate", "Certificate:", names, 0, False)
+        if not ok:
+            return
+        try:
+            result = CertificateViewer.result_from_certificate(paths[names.index(name)])
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Could not read certificate {name}: {e}")
+            return
+        CertificateViewer(result, self).exec_()
 
     def update_log(self, line):
         self.log_box.append(line)
@@ -130,7 +241,9 @@ class WiperApp(QWidget):
             QMessageBox.critical(self, "Error", "Wipe thread failed unexpectedly.")
             return
 
-        if not result.get("success", False):
+        if result.get("partial"):
+             self.log_box.append("WARNING: Wipe finished with unwritable regions; see the certificate for the map.")
+        elif not result.get("success", False):
              self.log_box.append("WARNING: Wipe process failed. Check logs above for details.")
 
         cert_data = result.get("cert_data")
@@ -143,13 +256,20 @@ class WiperApp(QWidget):
 
         # Show the certificate viewer dialog if all checks pass
         self.log_box.append("Wipe successful. Opening certificate viewer...")
+        from certificate_viewer import CertificateViewer
         cert_viewer = CertificateViewer(result, self)
         cert_viewer.exec_()
     
     def thread_done(self, result):
         self.remaining_threads -= 1
+        self.running_threads -= 1
+        self.start_pending_wipes()
+        if result.get("anchor_status") == "queued" and self.anchor_submitter:
+            self.anchor_submitter.wake()
         if not result.get("success", False):
             self.log_box.append(f"[{result.get('drive','?')}] WARNING: Wipe failed.")
+        if result.get("slow_drive"):
+            self.log_box.append(f"[{result.get('drive','?')}] WARNING: Throughput far below this model's history; drive may be failing.")
 
         cert_data = result.get("cert_data")
         if cert_data:
@@ -164,6 +284,12 @@ class WiperApp(QWidget):
             self.refresh_button.setEnabled(True)
             self.log_box.append("\n=== ALL WIPE PROCESSES FINISHED ===")
 
+    def closeEvent(self, event):
+        if self.anchor_submitter:
+            self.anchor_submitter.stop()
+        event_stream.stop_broker()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
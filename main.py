@@ -1,10 +1,73 @@
 # main.py
+import time
+_T0 = time.perf_counter()  # as early as possible, for --startup-benchmark
+
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui import WiperApp
+
+# First paint on the kiosk machines should stay well under this
+STARTUP_TARGET_SECONDS = 1.0
+
+
+def _seconds_since_process_start():
+    """Wall time since the kernel started this process (Linux), else None."""
+    try:
+        import os
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime) counts clock ticks since boot; the command
+            # name in field 2 may contain spaces, so split after its ')'.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def run_startup_benchmark(app):
+    """
+    Show the main window, wait for its first paint and report how long
+    startup took. Exits non-zero if the target is missed.
+    """
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from gui import WiperApp
+    t_import = time.perf_counter()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and not timings:
+                timings["paint"] = time.perf_counter()
+                timings["since_process_start"] = _seconds_since_process_start()
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    timings = {}
+    window = WiperApp()
+    paint_filter = FirstPaint()
+    window.installEventFilter(paint_filter)
+    window.show()
+    app.exec_()
+
+    if "paint" not in timings:
+        print("Startup benchmark: window was never painted")
+        return 1
+    first_paint = timings["paint"] - _T0
+    print(f"QApplication + gui:     {t_import - _T0:.3f} s")
+    print(f"First paint:            {first_paint:.3f} s")
+    if timings["since_process_start"] is not None:
+        print(f"  incl. interpreter:    {timings['since_process_start']:.3f} s")
+    print(f"Target:                 < {STARTUP_TARGET_SECONDS:.3f} s")
+    total = timings["since_process_start"] or first_paint
+    return 0 if total < STARTUP_TARGET_SECONDS else 1
+
 
 def main():
+    # Qt and the GUI are imported here so wipe worker processes, which
+    # re-import this module under the spawn start method, don't load them.
+    from PyQt5.QtWidgets import QApplication
     app = QApplication(sys.argv)
+    if "--startup-benchmark" in sys.argv:
+        sys.exit(run_startup_benchmark(app))
+    from gui import WiperApp
     window = WiperApp()
     window.show()
     sys.exit(app.exec_())
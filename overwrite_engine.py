@@ -0,0 +1,362 @@
+#overwrite_engine.py
+# In-process overwrite engines used instead of dd/nwipe when the media
+# needs special handling.
+#
+# ResilientOverwriter, for failing media. dd/nwipe run as one opaque
+# subprocess that can stall for minutes on every bad sector; here every
+# write is a separate, timed I/O so the wipe can react the way ddrescue does:
+#
+#   1. Forward pass with large blocks. A failed or timed-out block is set
+#      aside and the pass skips ahead, doubling the skip on consecutive
+#      failures so a dead region costs a handful of I/Os, not thousands.
+#   2. Retry pass over everything set aside, in small blocks with bounded
+#      retries and an overall time budget.
+#
+# Whatever still can't be written ends up in an unwritable-range map that
+# goes into the chained log and the certificate, so a degraded drive
+# finishes in predictable time with an honest partial result.
+#
+# CompareSkipOverwriter, for flash media (USB sticks, SD cards) that reads
+# several times faster than it writes and often arrives mostly blank: only
+# chunks that don't already hold the pattern are written, which saves both
+# time and flash wear, and every chunk ends up read back as verification.
+import os
+import mmap
+import time
+import errno
+import queue
+import threading
+
+BLOCK_SIZE = 4 * 1024 * 1024
+RETRY_BLOCK_SIZE = 64 * 1024
+SKIP_MIN = 1024 * 1024
+SKIP_MAX = 256 * 1024 * 1024
+# Per-write timeout; a write taking longer than SLOW_IO_SECONDS still counts
+# as written but the region is reported as slow
+IO_TIMEOUT = 30.0
+SLOW_IO_SECONDS = 2.0
+MAX_RETRIES = 2
+RETRY_BUDGET_SECONDS = 600.0
+# A timed-out write leaves its thread stuck in the kernel; after this many
+# the device is written off rather than piling up more stuck threads
+MAX_STUCK_IO = 4
+PROGRESS_INTERVAL = 5.0
+
+
+class _IoTimeout(Exception):
+    pass
+
+
+class _IoWorker(threading.Thread):
+    """
+    Performs writes on its own fd so the caller can stop waiting on one
+    that hangs. A worker that times out is closed and abandoned, never
+    reused.
+    """
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.direct = bool(getattr(os, "O_DIRECT", 0))
+        self.fd = self._open()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.start()
+
+    def _open(self):
+        # O_DSYNC makes each write report its own media error instead of a
+        # later fsync; O_DIRECT keeps the page cache out of the way.
+        flags = os.O_WRONLY | getattr(os, "O_DSYNC", 0)
+        if self.direct:
+            try:
+                return os.open(self.path, flags | os.O_DIRECT)
+            except OSError:
+                self.direct = False
+        return os.open(self.path, flags)
+
+    def _write(self, offset, view):
+        try:
+            n = os.pwrite(self.fd, view, offset)
+        except OSError as e:
+            if e.errno == errno.EINVAL and self.direct:
+                # Unaligned tail or a filesystem without O_DIRECT: not a media error
+                os.close(self.fd)
+                self.direct = False
+                self.fd = self._open()
+                return self._write(offset, view)
+            return e.strerror or str(e)
+        return None if n == len(view) else f"short write ({n} of {len(view)} bytes)"
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            offset, view = request
+            started = time.perf_counter()
+            error = self._write(offset, view)
+            self.results.put((error, time.perf_counter() - started))
+        os.close(self.fd)
+
+    def write(self, offset, view, timeout):
+        """Returns (error or None, seconds). Raises _IoTimeout if the write hangs."""
+        self.requests.put((offset, view))
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            raise _IoTimeout() from None
+
+    def close(self):
+        self.requests.put(None)
+
+
+def merge_ranges(ranges):
+    """Merge touching/overlapping {"start", "end", "reason"} ranges (keeps the first reason)."""
+    merged = []
+    for r in sorted(ranges, key=lambda r: r["start"]):
+        if merged and r["start"] <= merged[-1]["end"]:
+            merged[-1]["end"] = max(merged[-1]["end"], r["end"])
+        else:
+            merged.append(dict(r))
+    return merged
+
+
+class ResilientOverwriter:
+    """
+    Overwrite device_path (size_bytes long) with `pattern`, skipping and
+    retrying around bad regions. run() returns the report dict; progress is
+    called as progress(bytes_done, size_bytes, message).
+    """
+    def __init__(self, device_path, size_bytes, pattern=b"\x00", block_size=BLOCK_SIZE,
+                 retry_block_size=RETRY_BLOCK_SIZE, io_timeout=IO_TIMEOUT,
+                 max_retries=MAX_RETRIES, retry_budget=RETRY_BUDGET_SECONDS, progress=None):
+        self.device_path = device_path
+        self.size = size_bytes
+        self.block_size = block_size
+        self.retry_block_size = retry_block_size
+        self.io_timeout = io_timeout
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.progress = progress or (lambda done, total, message: None)
+
+        # Page-aligned (O_DIRECT) buffer holding the pattern, shared read-only by all writes
+        self._buffer = mmap.mmap(-1, block_size)
+        self._buffer.write((pattern * (block_size // len(pattern) + 1))[:block_size])
+        self._view = memoryview(self._buffer)
+
+        self._worker = None
+        self.stuck_workers = 0
+        self.aborted = False
+        self.bytes_written = 0
+        self.io_errors = 0
+        self.timeouts = 0
+        self.unwritable = []
+        self.slow = []
+        self._last_progress = 0.0
+
+    def _write(self, offset, length):
+        """One timed write. Returns None on success or an error string."""
+        if self._worker is None:
+            self._worker = _IoWorker(self.device_path)
+        try:
+            error, elapsed = self._worker.write(offset, self._view[:length], self.io_timeout)
+        except _IoTimeout:
+            self.timeouts += 1
+            self.stuck_workers += 1
+            # Abandoned: queue the stop so it closes its fd if the stuck write
+            # ever returns; the thread itself may hang forever
+            self._worker.close()
+            self._worker = None
+            if self.stuck_workers >= MAX_STUCK_IO:
+                self.aborted = True
+            return f"timed out after {self.io_timeout:g} s"
+        if error:
+            self.io_errors += 1
+            return error
+        if elapsed > SLOW_IO_SECONDS:
+            self.slow.append({"start": offset, "end": offset + length,
+                              "reason": f"slow write ({elapsed:.1f} s)"})
+        self.bytes_written += length
+        return None
+
+    def _report_progress(self, message=None, force=False):
+        now = time.time()
+        if force or message or now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress(self.bytes_written, self.size, message)
+
+    def _forward_pass(self):
+        """Big blocks front to back; returns the regions set aside for retry."""
+        pending = []
+        pos = 0
+        skip = SKIP_MIN
+        while pos < self.size and not self.aborted:
+            length = min(self.block_size, self.size - pos)
+            error = self._write(pos, length)
+            if error is None:
+                pos += length
+                skip = SKIP_MIN
+                self._report_progress()
+                continue
+            # Set aside the failed block plus a skipped stretch after it
+            skip_end = min(self.size, pos + length + skip)
+            pending.append({"start": pos, "end": skip_end, "reason": error})
+            self._report_progress(f"write error at {pos}: {error}; skipping to {skip_end}")
+            pos = skip_end
+            skip = min(skip * 2, SKIP_MAX)
+        if self.aborted and pos < self.size:
+            pending.append({"start": pos, "end": self.size, "reason": "not attempted"})
+        return pending
+
+    def _retry_pass(self, pending):
+        """Small blocks over set-aside regions, bounded by retries and time."""
+        deadline = time.time() + self.retry_budget
+        for region in pending:
+            pos = region["start"]
+            while pos < region["end"]:
+                if self.aborted:
+                    self.unwritable.append({"start": pos, "end": region["end"],
+                                            "reason": "aborted: too many hung I/Os"})
+                    break
+                if time.time() > deadline:
+                    self.unwritable.append({"start": pos, "end": region["end"],
+                                            "reason": "retry time budget exhausted"})
+                    break
+                length = min(self.retry_block_size, region["end"] - pos)
+                error = None
+                for _ in range(1 + self.max_retries):
+                    error = self._write(pos, length)
+                    if error is None or self.aborted:
+                        break
+                if error is not None:
+                    self.unwritable.append({"start": pos, "end": pos + length, "reason": error})
+                pos += length
+                self._report_progress()
+
+    def run(self):
+        started = time.time()
+        try:
+            pending = self._forward_pass()
+            if pending:
+                self._report_progress(f"{len(pending)} regions set aside; retrying in "
+                                      f"{self.retry_block_size // 1024} KiB blocks", force=True)
+                self._retry_pass(pending)
+        finally:
+            if self._worker is not None:
+                self._worker.close()
+        self._report_progress(force=True)
+
+        unwritable = merge_ranges(self.unwritable)
+        return {
+            "bytes_total": self.size,
+            "bytes_written": self.bytes_written,
+            "unwritable_ranges": unwritable,
+            "unwritable_bytes": sum(r["end"] - r["start"] for r in unwritable),
+            "slow_ranges": merge_ranges(self.slow),
+            "io_errors": self.io_errors,
+            "timeouts": self.timeouts,
+            "aborted": self.aborted,
+            "elapsed_seconds": round(time.time() - started, 3),
+        }
+
+
+COMPARE_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class CompareSkipOverwriter:
+    """
+    Overwrite for flash media that reads faster than it writes: each chunk
+    is read and compared with the pattern (a plain memcmp) and only chunks
+    that differ are written, then read back. A skipped chunk has just been
+    read and found to hold the pattern and a written chunk is re-read after
+    the write, so by the end every byte has been verified.
+    """
+    def __init__(self, device_path, size_bytes, pattern=b"\x00", chunk_size=COMPARE_CHUNK_SIZE,
+                 progress=None):
+        self.device_path = device_path
+        self.size = size_bytes
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda done, total, message: None)
+        self._pattern = (pattern * (chunk_size // len(pattern) + 1))[:chunk_size]
+        # Page-aligned buffers for O_DIRECT; reads must hit the media, not the page cache
+        self._read_buffer = mmap.mmap(-1, chunk_size)
+        self._write_buffer = mmap.mmap(-1, chunk_size)
+        self._write_buffer.write(self._pattern)
+        self.direct = bool(getattr(os, "O_DIRECT", 0))
+
+    def _open(self):
+        flags = os.O_RDWR | getattr(os, "O_DSYNC", 0)
+        if self.direct:
+            try:
+                return os.open(self.device_path, flags | os.O_DIRECT)
+            except OSError:
+                self.direct = False
+        return os.open(self.device_path, flags)
+
+    def _io(self, fd, op, buffer, offset, length):
+        """preadv/pwritev of length bytes, dropping O_DIRECT if the kernel refuses it."""
+        view = memoryview(buffer)[:length]
+        try:
+            n = op(fd, [view], offset)
+        except OSError as e:
+            if e.errno != errno.EINVAL or not self.direct:
+                raise
+            # Unaligned tail or a filesystem without O_DIRECT
+            os.close(fd)
+            self.direct = False
+            fd = self._open()
+            n = op(fd, [view], offset)
+        if n != length:
+            raise OSError(errno.EIO, f"short transfer ({n} of {length} bytes)")
+        return fd
+
+    def _matches(self, length):
+        return self._read_buffer[:length] == self._pattern[:length]
+
+    def run(self):
+        started = time.time()
+        last_progress = started
+        skipped = written = verified = 0
+        mismatches = []
+        errors = []
+        fd = self._open()
+        try:
+            for pos in range(0, self.size, self.chunk_size):
+                length = min(self.chunk_size, self.size - pos)
+                try:
+                    fd = self._io(fd, os.preadv, self._read_buffer, pos, length)
+                    if self._matches(length):
+                        skipped += length
+                        verified += length
+                    else:
+                        fd = self._io(fd, os.pwritev, self._write_buffer, pos, length)
+                        written += length
+                        if not self.direct:
+                            # Make the read-back come from the device, not the page cache
+                            os.posix_fadvise(fd, pos, length, os.POSIX_FADV_DONTNEED)
+                        fd = self._io(fd, os.preadv, self._read_buffer, pos, length)
+                        if self._matches(length):
+                            verified += length
+                        else:
+                            mismatches.append({"start": pos, "end": pos + length,
+                                               "reason": "read-back differs from pattern"})
+                except OSError as e:
+                    errors.append({"start": pos, "end": pos + length, "reason": e.strerror or str(e)})
+                    self.progress(skipped + written, self.size, f"I/O error at {pos}: {e}")
+                now = time.time()
+                if now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    self.progress(skipped + written, self.size, None)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        failed = merge_ranges(mismatches + errors)
+        self.progress(skipped + written, self.size, None)
+        return {
+            "bytes_total": self.size,
+            "bytes_skipped": skipped,
+            "bytes_written": written,
+            "bytes_verified": verified,
+            "failed_ranges": failed,
+            "elapsed_seconds": round(time.time() - started, 3),
+        }
@@ -0,0 +1,227 @@
+#quick_kill.py
+# Pre-pass that destroys the most valuable metadata on a drive in seconds,
+# before the hours-long full overwrite gets to it: partition tables (MBR,
+# primary and backup GPT), filesystem superblocks and their backups, and
+# the first/last few MB of the disk and of every partition (boot sectors,
+# LUKS headers, ZFS labels, md superblocks, ...). If the full pass is
+# interrupted, what is left no longer mounts or lists files.
+#
+# The partition table and superblocks are read before anything is written,
+# so the region list is built from the drive's own layout. Writes go through
+# overwrite_engine's timed I/O workers, so a failing drive that hangs a write
+# costs IO_TIMEOUT rather than stalling the job.
+#
+# The GUI runs unprivileged, so WipeJob runs this file through sudo, like the
+# erase commands, when it cannot open the device itself: progress lines are
+# printed as they happen and the report last, as one JSON line.
+#
+#   sudo python3 quick_kill.py /dev/sdb 2000398934016
+import os
+import json
+import mmap
+import argparse
+import struct
+import time
+
+from overwrite_engine import IO_TIMEOUT, MAX_STUCK_IO, _IoTimeout, _IoWorker, merge_ranges
+
+QUICK_KILL_EDGE_BYTES = int(os.environ.get("SECUREWIPER_QUICK_KILL_MB", "16")) * 1024 * 1024
+PARTITION_EDGE_BYTES = 1024 * 1024
+WRITE_CHUNK = 4 * 1024 * 1024
+ALIGN = 4096
+
+# Filesystem superblock copies are capped so a huge filesystem can't turn
+# the pre-pass into a long one
+MAX_SUPERBLOCK_COPIES = 64
+BTRFS_MIRRORS = (64 * 1024, 64 * 1024 ** 2, 256 * 1024 ** 3)
+
+
+def _read(fd, offset, length):
+    try:
+        return os.pread(fd, length, offset)
+    except OSError:
+        return b""
+
+
+def _region(start, length, reason, size_bytes):
+    """Aligned, clipped region dict, or None if it falls outside the device."""
+    end = min(size_bytes, -(-(start + length) // ALIGN) * ALIGN)
+    start = max(0, start - start % ALIGN)
+    return {"start": start, "end": end, "reason": reason} if end > start else None
+
+
+def read_partitions(fd, size_bytes):
+    """
+    (start, end) byte ranges of partitions from the GPT (tried at 512 and
+    4096-byte sectors) or else the MBR. Unreadable tables give [].
+    """
+    for sector in (512, 4096):
+        header = _read(fd, sector, 92)
+        if header[:8] != b"EFI PART":
+            continue
+        entries_lba, count, entry_size = struct.unpack_from("<QII", header, 72)
+        if not 0 < count <= 1024 or not 128 <= entry_size <= 4096:
+            break
+        table = _read(fd, entries_lba * sector, count * entry_size)
+        partitions = []
+        for i in range(len(table) // entry_size):
+            entry = table[i * entry_size:(i + 1) * entry_size]
+            if entry[:16] == bytes(16):
+                continue
+            first, last = struct.unpack_from("<QQ", entry, 32)
+            if first <= last and (last + 1) * sector <= size_bytes:
+                partitions.append((first * sector, (last + 1) * sector))
+        return partitions
+
+    mbr = _read(fd, 0, 512)
+    if len(mbr) < 512 or mbr[510:512] != b"\x55\xaa":
+        return []
+    partitions = []
+    for i in range(4):
+        ptype, first, count = struct.unpack_from("<B3xII", mbr, 446 + 16 * i + 4)
+        # 0xEE is the protective entry of a GPT disk whose header we couldn't read
+        if ptype and count and ptype != 0xEE and (first + count) * 512 <= size_bytes:
+            partitions.append((first * 512, (first + count) * 512))
+    return partitions
+
+
+def _ext_superblocks(fd, start):
+    """Offsets of ext2/3/4 superblock backups (sparse_super groups 1 and powers of 3, 5, 7)."""
+    sb = _read(fd, start + 1024, 1024)
+    if len(sb) < 1024 or struct.unpack_from("<H", sb, 56)[0] != 0xEF53:
+        return []
+    blocks_count, = struct.unpack_from("<I", sb, 4)
+    log_block_size, = struct.unpack_from("<I", sb, 24)
+    blocks_per_group, = struct.unpack_from("<I", sb, 32)
+    if log_block_size > 6 or not blocks_per_group:
+        return []
+    block_size = 1024 << log_block_size
+    groups = -(-blocks_count // blocks_per_group)
+    backup_groups = {1}
+    for base in (3, 5, 7):
+        g = base
+        while g < groups:
+            backup_groups.add(g)
+            g *= base
+    first_data_block = 1 if block_size == 1024 else 0
+    return [start + (g * blocks_per_group + first_data_block) * block_size
+            for g in sorted(backup_groups) if g < groups][:MAX_SUPERBLOCK_COPIES]
+
+
+def _xfs_superblocks(fd, start):
+    """Offsets of the secondary superblocks at the start of each XFS allocation group."""
+    sb = _read(fd, start, 512)
+    if sb[:4] != b"XFSB":
+        return []
+    block_size, = struct.unpack_from(">I", sb, 4)
+    ag_blocks, ag_count = struct.unpack_from(">II", sb, 84)
+    return [start + ag * ag_blocks * block_size for ag in range(1, ag_count)][:MAX_SUPERBLOCK_COPIES]
+
+
+def _btrfs_superblocks(fd, start, end):
+    sb = _read(fd, start + BTRFS_MIRRORS[0], 128)
+    if sb[64:72] != b"_BHRfS_M":
+        return []
+    return [start + m for m in BTRFS_MIRRORS[1:] if start + m < end]
+
+
+def plan_regions(device_path, size_bytes, edge_bytes=QUICK_KILL_EDGE_BYTES):
+    """
+    Regions to overwrite, most valuable first: disk head and tail (MBR,
+    primary and backup GPT, whole-disk signatures), then each partition's
+    head and tail, then filesystem superblock backups.
+    """
+    fd = os.open(device_path, os.O_RDONLY)
+    try:
+        partitions = read_partitions(fd, size_bytes)
+        regions = [
+            _region(0, edge_bytes, "disk head (MBR/GPT, boot and volume headers)", size_bytes),
+            _region(size_bytes - edge_bytes, edge_bytes, "disk tail (backup GPT, end-of-disk labels)", size_bytes),
+        ]
+        superblocks = []
+        for start, end in partitions:
+            regions.append(_region(start, PARTITION_EDGE_BYTES, f"partition head at {start}", size_bytes))
+            regions.append(_region(end - PARTITION_EDGE_BYTES, PARTITION_EDGE_BYTES,
+                                   f"partition tail at {end}", size_bytes))
+            for offset in _ext_superblocks(fd, start):
+                superblocks.append(_region(offset, 1024, "ext superblock backup", size_bytes))
+            for offset in _xfs_superblocks(fd, start):
+                superblocks.append(_region(offset, 512, "xfs AG superblock", size_bytes))
+            for offset in _btrfs_superblocks(fd, start, end):
+                superblocks.append(_region(offset, 4096, "btrfs superblock mirror", size_bytes))
+    finally:
+        os.close(fd)
+
+    # Keep the priority order, dropping anything already covered
+    ordered = []
+    for region in [r for r in regions + superblocks if r]:
+        if not any(o["start"] <= region["start"] and region["end"] <= o["end"] for o in ordered):
+            ordered.append(region)
+    return ordered, partitions
+
+
+def quick_kill(device_path, size_bytes, edge_bytes=QUICK_KILL_EDGE_BYTES, progress=None,
+               io_timeout=IO_TIMEOUT):
+    """
+    Plan and overwrite the metadata regions with zeros. A failing region is
+    recorded and skipped; the full pass that follows will meet it again.
+    After MAX_STUCK_IO timed-out writes the rest is left to that pass too.
+    Returns the report dict for the chained log.
+    """
+    progress = progress or (lambda message: None)
+    started = time.time()
+    regions, partitions = plan_regions(device_path, size_bytes, edge_bytes)
+    # Page-aligned zeros, as the worker writes with O_DIRECT
+    zeros = memoryview(mmap.mmap(-1, WRITE_CHUNK))
+    written = 0
+    errors = []
+    stuck = 0
+    worker = _IoWorker(device_path)
+    try:
+        for region in regions:
+            pos = region["start"]
+            while pos < region["end"]:
+                length = min(WRITE_CHUNK, region["end"] - pos)
+                try:
+                    error, _ = worker.write(pos, zeros[:length], io_timeout)
+                except _IoTimeout:
+                    # Abandoned like the overwrite engine's: the stuck write
+                    # keeps its thread, the next region gets a fresh worker
+                    worker.close()
+                    worker = None
+                    stuck += 1
+                    error = f"timed out after {io_timeout:g} s"
+                if error:
+                    errors.append({"start": pos, "end": region["end"], "error": error})
+                    progress(f"Quick-kill write failed at {pos}: {error}")
+                    break
+                written += length
+                pos += length
+            if worker is None:
+                if stuck >= MAX_STUCK_IO:
+                    progress(f"Quick-kill stopped after {stuck} stuck writes")
+                    break
+                worker = _IoWorker(device_path)
+    finally:
+        if worker is not None:
+            worker.close()
+
+    return {
+        "regions": merge_ranges(regions),
+        "partitions_found": len(partitions),
+        "bytes_written": written,
+        "errors": errors,
+        "elapsed_seconds": round(time.time() - started, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quick-kill metadata pre-pass")
+    parser.add_argument("device")
+    parser.add_argument("size_bytes", type=int)
+    parser.add_argument("--edge-mb", type=int, default=QUICK_KILL_EDGE_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+
+    report = quick_kill(args.device, args.size_bytes, args.edge_mb * 1024 * 1024,
+                        progress=lambda message: print(message, flush=True))
+    print(json.dumps(report), flush=True)
@@ -70,9 +70,12 @@ def generate_pdf(cert_data, pdf_path):
     
     c.save()
 
-def generate_report_and_sign(drive, serial, wipe_method, success, final_hash, txid):
+def generate_report_and_sign(drive, serial, wipe_method, success, final_hash, txid,
+                             status=None, extra_fields=None):
     """
     Creates JSON and PDF reports, signs the data, and returns the certificate details.
+    status overrides the Success/FAILED wording (e.g. "PARTIAL"); extra_fields
+    are appended to the certificate after the standard fields.
     """
     ensure_dirs()
     timestamp = datetime.datetime.now()
@@ -81,11 +84,12 @@ def generate_report_and_sign(drive, serial, wipe_method, success, final_hash, tx
         "Drive Name": drive,
         "Drive Serial": serial or "N/A",
         "Wipe Method": wipe_method,
-        "Status": "Success" if success else "FAILED",
+        "Status": status or ("Success" if success else "FAILED"),
         "Timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
         "Verification Hash": final_hash,
         "Ledger ID": txid,
     }
+    cert_data.update(extra_fields or {})
     
     base_name = f"{drive.replace('/', '_')}_{timestamp.strftime('%Y%m%d_%H%M%S')}"
     json_path = os.path.join(WIPES_DIR, f"{base_name}.json")
@@ -100,12 +104,35 @@ def generate_report_and_sign(drive, serial, wipe_method, success, final_hash, tx
     generate_pdf(cert_data, pdf_path)
 
     # 3. Sign the JSON data with the private key
+    sign_certificate(cert_data, sig_path)
+    
+    # Return file paths and the data dictionary for the GUI viewer
+    return json_path, pdf_path, cert_data
+
+def sign_certificate(cert_data, sig_path):
+    """Signs the canonical JSON form of cert_data and writes the raw signature."""
     private_key = load_private_key()
     message = json.dumps(cert_data, sort_keys=True).encode()
     signature = private_key.sign(message)
     with open(sig_path, "wb") as f:
         f.write(signature)
-    
-    # Return file paths and the data dictionary for the GUI viewer
-    return json_path, pdf_path, cert_data
+
+def update_certificate(json_path, updates):
+    """
+    Applies updates (e.g. a confirmed "Ledger ID") to an existing certificate,
+    then regenerates its PDF and signature so all three stay consistent.
+    Returns the updated certificate data.
+    """
+    with open(json_path, "r") as f:
+        cert_data = json.load(f)
+    cert_data.update(updates)
+
+    base_path = os.path.splitext(json_path)[0]
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cert_data, f, indent=4)
+    os.replace(tmp_path, json_path)
+    generate_pdf(cert_data, f"{base_path}.pdf")
+    sign_certificate(cert_data, f"{base_path}.sig")
+    return cert_data
 
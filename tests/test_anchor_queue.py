@@ -0,0 +1,171 @@
+import os
+import json
+import threading
+
+import pytest
+
+import anchor_queue
+import blockchain_connector
+from blockchain_connector import JsonRpcBackend
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # ledger.json and its lock are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(anchor_queue, "BASE_BACKOFF", 0.01)
+    monkeypatch.setattr(anchor_queue, "MAX_BACKOFF", 0.05)
+    return tmp_path
+
+
+@pytest.fixture
+def stub_rpc():
+    servers = []
+
+    def start(latency=0.0, fail_rate=0.0):
+        server = anchor_queue.make_stub_rpc_server(port=0, latency=latency, fail_rate=fail_rate,
+                                                   quiet=True, seed=1234)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, JsonRpcBackend(f"http://127.0.0.1:{server.server_address[1]}/")
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _queue_wipes(workdir, count):
+    outbox = str(workdir / "outbox")
+    hashes = []
+    for i in range(count):
+        final_hash = f"{i:064x}"
+        log_path = workdir / f"wipe_{i}.log"
+        log_path.write_text(json.dumps({"log_entries": []}))
+        anchor_queue.enqueue(final_hash, log_path=str(log_path), outbox_dir=outbox)
+        hashes.append(final_hash)
+    return outbox, hashes
+
+
+def _entries(outbox, state):
+    state_dir = os.path.join(outbox, state)
+    entries = {}
+    for name in os.listdir(state_dir):
+        with open(os.path.join(state_dir, name)) as f:
+            entry = json.load(f)
+        entries[entry["final_hash"]] = entry
+    return entries
+
+
+def _confirmations(log_path):
+    with open(log_path) as f:
+        return [e for e in json.load(f)["log_entries"] if e["event"] == "anchor_confirmed"]
+
+
+def test_drain_batches_retries_and_reconciles(workdir, stub_rpc):
+    server, backend = stub_rpc(latency=0.02, fail_rate=0.3)
+    outbox, hashes = _queue_wipes(workdir, 40)
+
+    left = anchor_queue.drain(backend, outbox, batch_size=8, timeout=60)
+
+    assert left == 0
+    assert max(server.batch_sizes) == 8
+    # Every hash went out exactly once in a batch that succeeded, so failed
+    # batches show up as calls beyond the minimum
+    assert server.calls > len(hashes) // 8
+    done = _entries(outbox, "done")
+    assert sorted(done) == hashes
+    assert any(entry["attempts"] > 1 for entry in done.values())
+    with open("ledger.json") as f:
+        ledger = json.load(f)
+    for final_hash, entry in done.items():
+        assert ledger[entry["txid"]]["hash"] == final_hash
+        confirmations = _confirmations(entry["log_path"])
+        assert [c["txid"] for c in confirmations] == [entry["txid"]]
+
+
+def test_failed_batch_backs_off(workdir, stub_rpc, monkeypatch):
+    monkeypatch.setattr(anchor_queue, "BASE_BACKOFF", 30.0)
+    server, backend = stub_rpc(fail_rate=1.0)
+    outbox, hashes = _queue_wipes(workdir, 5)
+
+    assert anchor_queue.process_pending(backend, outbox) == (0, 5)
+    pending = _entries(outbox, "pending")
+    assert sorted(pending) == hashes
+    for entry in pending.values():
+        assert entry["attempts"] == 1
+        assert "simulated failure" in entry["last_error"]
+        assert entry["next_attempt_at"] > entry["queued_at"]
+    # Nothing is due yet, so nothing is sent
+    assert anchor_queue.process_pending(backend, outbox) == (0, 0)
+    assert server.calls == 1
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(anchor_queue, "BASE_BACKOFF", 2.0)
+    monkeypatch.setattr(anchor_queue, "MAX_BACKOFF", 600.0)
+    for attempts, full in ((1, 2.0), (2, 4.0), (5, 32.0), (20, 600.0)):
+        delay = anchor_queue._backoff_seconds(attempts)
+        assert full * 0.5 <= delay <= full
+
+
+def test_reconcile_failure_is_retried_without_resubmitting(workdir, stub_rpc, monkeypatch):
+    server, backend = stub_rpc()
+    outbox, (final_hash,) = _queue_wipes(workdir, 1)
+    real_reconcile = anchor_queue.reconcile
+
+    def broken_reconcile(entry, txid):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(anchor_queue, "reconcile", broken_reconcile)
+    assert anchor_queue.process_pending(backend, outbox) == (0, 1)
+    entry = _entries(outbox, "pending")[final_hash]
+    assert entry["txid"] and entry["reconcile_error"] == "disk full"
+    assert anchor_queue.pending_count(outbox) == 1
+
+    monkeypatch.setattr(anchor_queue, "reconcile", real_reconcile)
+    left = anchor_queue.drain(backend, outbox, timeout=10)
+
+    assert left == 0
+    assert server.calls == 1
+    done = _entries(outbox, "done")[final_hash]
+    assert done["txid"] == entry["txid"] and "reconcile_error" not in done
+    assert [c["txid"] for c in _confirmations(done["log_path"])] == [entry["txid"]]
+
+
+def test_crash_after_submit_does_not_resubmit(workdir, stub_rpc, monkeypatch):
+    server, backend = stub_rpc()
+    outbox, (final_hash,) = _queue_wipes(workdir, 1)
+    real_reconcile = anchor_queue.reconcile
+
+    def crash(entry, txid):
+        raise SystemExit("submitter died")
+
+    monkeypatch.setattr(anchor_queue, "reconcile", crash)
+    with pytest.raises(SystemExit):
+        anchor_queue.process_pending(backend, outbox)
+    inflight = _entries(outbox, "inflight")[final_hash]
+    assert inflight["txid"] and inflight["anchored_at"]
+
+    monkeypatch.setattr(anchor_queue, "reconcile", real_reconcile)
+    assert anchor_queue.drain(backend, outbox, timeout=10) == 0
+    assert server.calls == 1
+    assert _entries(outbox, "done")[final_hash]["txid"] == inflight["txid"]
+
+
+def test_ledger_mirror_failure_is_retried_without_resubmitting(workdir, stub_rpc, monkeypatch):
+    server, backend = stub_rpc()
+    outbox, (final_hash,) = _queue_wipes(workdir, 1)
+
+    def broken_record(records):
+        raise OSError("ledger locked")
+
+    monkeypatch.setattr(anchor_queue, "record_anchors", broken_record)
+    assert anchor_queue.process_pending(backend, outbox) == (0, 1)
+    entry = _entries(outbox, "pending")[final_hash]
+    assert entry["txid"] and entry["reconcile_error"] == "ledger locked"
+
+    monkeypatch.setattr(anchor_queue, "record_anchors", blockchain_connector.record_anchors)
+    assert anchor_queue.drain(backend, outbox, timeout=10) == 0
+    assert server.calls == 1
+    assert blockchain_connector.get_ledger()[entry["txid"]]["hash"] == final_hash
@@ -0,0 +1,171 @@
+import os
+import subprocess
+
+import pytest
+
+import erase_planner
+from erase_planner import (
+    ata_candidates, choose_plan, parse_hdparm_identify, parse_hdparm_sanitize_status,
+    parse_nvme_id_ctrl, parse_nvme_sanitize_log, plan_erase, poll_sanitize,
+)
+
+# Synthetic tool output, not captured from drives; see fixtures/README
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read()
+
+
+def fake_run(outputs):
+    """
+    run(cmd) answering from fixtures, keyed by an argument of the command.
+    A value may be an iterator of fixture names (one per call) or an
+    exception to raise.
+    """
+    def run(cmd):
+        for key, value in outputs.items():
+            if key in cmd:
+                if hasattr(value, "__next__"):
+                    value = next(value)
+                if isinstance(value, Exception):
+                    raise value
+                return fixture(value)
+        raise OSError(f"no fixture for {cmd}")
+    return run
+
+
+def test_hdparm_identify_without_sanitize():
+    caps = parse_hdparm_identify(fixture("hdparm_identify_samsung_860evo.txt"))
+    assert caps["model"] == "Samsung SSD 860 EVO 500GB"
+    assert caps["serial"] == "S3Z2NB0K512345A"
+    assert caps["security_supported"] and caps["enhanced_erase_supported"]
+    assert caps["security_frozen"]
+    assert not caps["security_enabled"] and not caps["security_locked"]
+    assert (caps["erase_minutes"], caps["enhanced_erase_minutes"]) == (2, 8)
+    assert not caps["sanitize_supported"]
+    assert not caps["crypto_scramble"] and not caps["block_erase"] and not caps["overwrite"]
+
+
+def test_hdparm_identify_with_sanitize():
+    caps = parse_hdparm_identify(fixture("hdparm_identify_micron_5300.txt"))
+    assert caps["model"] == "Micron_5300_MTFDDAK960TDS"
+    assert caps["sanitize_supported"]
+    assert caps["crypto_scramble"] and caps["block_erase"] and caps["overwrite"]
+    assert not caps["security_frozen"]
+
+
+def test_frozen_drive_without_sanitize_falls_back_to_clear():
+    caps = parse_hdparm_identify(fixture("hdparm_identify_samsung_860evo.txt"))
+    plan = choose_plan(ata_candidates(caps, "/dev/sda", 500 * 10 ** 9))
+    assert plan["nist_level"] == "Clear"
+    assert "fell back" in plan["reason"]
+    secure_erase = next(c for c in plan["candidates"] if c["method_name"].startswith("Secure Erase"))
+    assert "frozen" in secure_erase["reason"]
+
+
+def test_sata_plan_prefers_crypto_scramble():
+    run = fake_run({"-I": "hdparm_identify_micron_5300.txt"})
+    plan = plan_erase("SATA SSD", "/dev/sdb", 960 * 10 ** 9, run=run)
+    assert plan["method_name"].startswith("Sanitize Crypto Scramble")
+    assert plan["steps"][0]["cmd"][-2:] == ["--sanitize-crypto-scramble", "/dev/sdb"]
+    assert plan["steps"][0]["poll"] == "ata-sanitize"
+
+
+@pytest.mark.parametrize("name, state, progress", [
+    ("hdparm_sanitize_status_idle.txt", "idle", 0.0),
+    ("hdparm_sanitize_status_in_process.txt", "in_progress", 0.36),
+    ("hdparm_sanitize_status_completed.txt", "completed", 1.0),
+    ("hdparm_sanitize_status_failed.txt", "failed", 0.0),
+    ("hdparm_sanitize_status_error_reason.txt", "failed", 0.0),
+])
+def test_hdparm_sanitize_status(name, state, progress):
+    status = parse_hdparm_sanitize_status(fixture(name))
+    assert status["state"] == state
+    assert status["progress"] == pytest.approx(progress)
+
+
+def test_hdparm_sanitize_status_reads_output_of_failed_call():
+    error = subprocess.CalledProcessError(1, ["hdparm"], output=fixture("hdparm_sanitize_status_error_reason.txt"))
+    status = erase_planner.sanitize_status("ata-sanitize", "/dev/sdb", fake_run({"--sanitize-status": error}))
+    assert status["state"] == "failed"
+
+
+def test_nvme_id_ctrl_consumer_drive():
+    caps = parse_nvme_id_ctrl(fixture("nvme_id_ctrl_samsung_970evoplus.json"))
+    assert caps["model"] == "Samsung SSD 970 EVO Plus 1TB"
+    assert caps["serial"] == "S4EWNX0R512345K"
+    assert caps["format_supported"]
+    assert not caps["format_crypto_erase"]
+    assert not any(caps[k] for k in ("sanitize_crypto_erase", "sanitize_block_erase", "sanitize_overwrite"))
+
+
+def test_nvme_id_ctrl_datacenter_drive():
+    caps = parse_nvme_id_ctrl(fixture("nvme_id_ctrl_micron_7450.json"))
+    assert caps["format_crypto_erase"]
+    assert caps["sanitize_crypto_erase"] and caps["sanitize_block_erase"]
+    assert not caps["sanitize_overwrite"]
+
+
+def test_nvme_plan_without_sanitize_uses_format():
+    run = fake_run({"id-ctrl": "nvme_id_ctrl_samsung_970evoplus.json",
+                    "sanitize-log": "nvme_sanitize_log_never.json"})
+    plan = plan_erase("NVMe M.2 SSD", "/dev/nvme0n1", 10 ** 12, run=run)
+    assert plan["method_name"].startswith("NVMe Format User Data Erase")
+    assert plan["steps"][0]["cmd"] == ["sudo", "nvme", "format", "/dev/nvme0n1", "--ses=1"]
+
+
+def test_nvme_plan_uses_sanitize_and_drive_estimate():
+    run = fake_run({"id-ctrl": "nvme_id_ctrl_micron_7450.json",
+                    "sanitize-log": "nvme_sanitize_log_never.json"})
+    plan = plan_erase("NVMe M.2 SSD", "/dev/nvme0n1", 960 * 10 ** 9, run=run)
+    assert plan["method_name"].startswith("NVMe Sanitize Crypto Erase")
+    assert plan["estimated_seconds"] == 6
+    assert plan["steps"][0]["cmd"] == ["sudo", "nvme", "sanitize", "/dev/nvme0", "--sanact=4"]
+
+
+ESTIMATES = {"crypto_erase": 6, "block_erase": 90}
+
+
+@pytest.mark.parametrize("name, state, progress, estimates", [
+    ("nvme_sanitize_log_never.json", "idle", 65535 / 65536, ESTIMATES),
+    ("nvme_sanitize_log_in_progress.json", "in_progress", 23951 / 65536, ESTIMATES),
+    ("nvme_sanitize_log_completed.json", "completed", 1.0, ESTIMATES),
+    ("nvme_sanitize_log_failed.json", "failed", 65535 / 65536, ESTIMATES),
+    ("nvme_sanitize_log_v1_completed.json", "completed", 1.0, {}),
+])
+def test_nvme_sanitize_log(name, state, progress, estimates):
+    log = parse_nvme_sanitize_log(fixture(name))
+    assert log["state"] == state
+    assert log["progress"] == pytest.approx(progress)
+    assert log["estimates"] == estimates
+
+
+def _poll(kind, *names):
+    key = "sanitize-log" if kind == "nvme-sanitize" else "--sanitize-status"
+    run = fake_run({key: iter(names)})
+    return poll_sanitize(kind, "/dev/nvme0n1", interval=0, run=run, sleep=lambda s: None)
+
+
+def test_poll_sanitize_completes():
+    ok, status = _poll("nvme-sanitize", "nvme_sanitize_log_in_progress.json",
+                       "nvme_sanitize_log_in_progress.json", "nvme_sanitize_log_completed.json")
+    assert ok and status["state"] == "completed"
+    ok, status = _poll("ata-sanitize", "hdparm_sanitize_status_in_process.txt",
+                       "hdparm_sanitize_status_completed.txt")
+    assert ok and status["state"] == "completed"
+
+
+def test_poll_sanitize_idle_without_completion_is_not_success():
+    ok, status = _poll("ata-sanitize", "hdparm_sanitize_status_in_process.txt",
+                       "hdparm_sanitize_status_idle.txt")
+    assert not ok
+    assert "without reporting completion" in status["error"]
+
+
+def test_poll_sanitize_failure_and_never_started():
+    ok, status = _poll("nvme-sanitize", "nvme_sanitize_log_in_progress.json", "nvme_sanitize_log_failed.json")
+    assert not ok and status["state"] == "failed"
+    ok, status = _poll("ata-sanitize", *["hdparm_sanitize_status_idle.txt"] * 3)
+    assert not ok and status["error"] == "sanitize never started"
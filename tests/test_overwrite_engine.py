@@ -0,0 +1,137 @@
+import os
+import time
+import errno
+
+import pytest
+
+import overwrite_engine
+from overwrite_engine import CompareSkipOverwriter, ResilientOverwriter
+
+CHUNK = 64 * 1024
+
+
+@pytest.fixture
+def image(tmp_path):
+    # Chunks 0 and 2 already blank, 1 and 3 hold data
+    path = tmp_path / "disk.img"
+    path.write_bytes(bytes(CHUNK) + b"\xaa" * CHUNK + bytes(CHUNK) + b"\xbb" * CHUNK)
+    return str(path)
+
+
+def test_compare_skips_blank_chunks_and_writes_the_rest(image):
+    report = CompareSkipOverwriter(image, 4 * CHUNK, chunk_size=CHUNK).run()
+    assert report["bytes_skipped"] == 2 * CHUNK
+    assert report["bytes_written"] == 2 * CHUNK
+    assert report["bytes_verified"] == 4 * CHUNK
+    assert report["failed_ranges"] == []
+    with open(image, "rb") as f:
+        assert f.read() == bytes(4 * CHUNK)
+
+
+def test_compare_failed_read_back_is_not_counted_verified(image, monkeypatch):
+    real_pwritev, real_preadv = os.pwritev, os.preadv
+    written = set()
+
+    def pwritev(fd, buffers, offset):
+        written.add(offset)
+        return real_pwritev(fd, buffers, offset)
+
+    def preadv(fd, buffers, offset):
+        if offset == CHUNK and offset in written:
+            raise OSError(errno.EIO, "Input/output error")
+        return real_preadv(fd, buffers, offset)
+
+    monkeypatch.setattr(overwrite_engine.os, "pwritev", pwritev)
+    monkeypatch.setattr(overwrite_engine.os, "preadv", preadv)
+    report = CompareSkipOverwriter(image, 4 * CHUNK, chunk_size=CHUNK).run()
+    assert report["bytes_written"] == 2 * CHUNK
+    assert report["bytes_verified"] == 3 * CHUNK
+    assert report["failed_ranges"] == [{"start": CHUNK, "end": 2 * CHUNK, "reason": "Input/output error"}]
+
+
+def test_compare_read_back_mismatch_is_a_failed_range(image, monkeypatch):
+    real_pwritev = os.pwritev
+
+    def pwritev(fd, buffers, offset):
+        # The drive acknowledges the write but keeps the old data
+        return sum(len(b) for b in buffers) if offset == 3 * CHUNK else real_pwritev(fd, buffers, offset)
+
+    monkeypatch.setattr(overwrite_engine.os, "pwritev", pwritev)
+    report = CompareSkipOverwriter(image, 4 * CHUNK, chunk_size=CHUNK).run()
+    assert report["bytes_verified"] == 3 * CHUNK
+    assert report["failed_ranges"] == [{"start": 3 * CHUNK, "end": 4 * CHUNK,
+                                        "reason": "read-back differs from pattern"}]
+
+
+KB = 1024
+
+
+class FailingDrive:
+    """
+    Wraps _IoWorker._write: writes touching a bad range fail (or hang for
+    `hang` seconds), the first `flaky` attempts at a flaky range fail too.
+    """
+    def __init__(self, monkeypatch, bad=(), flaky=(), flaky_attempts=0, hang=0.0):
+        self.bad, self.flaky, self.flaky_left, self.hang = bad, flaky, flaky_attempts, hang
+        self.real_write = overwrite_engine._IoWorker._write
+        drive = self
+
+        def write(worker, offset, view):
+            return drive.write(worker, offset, view)
+
+        monkeypatch.setattr(overwrite_engine._IoWorker, "_write", write)
+
+    @staticmethod
+    def _touches(ranges, offset, length):
+        return any(start < offset + length and offset < end for start, end in ranges)
+
+    def write(self, worker, offset, view):
+        if self._touches(self.bad, offset, len(view)):
+            if self.hang:
+                time.sleep(self.hang)
+            return "Input/output error"
+        if self._touches(self.flaky, offset, len(view)) and self.flaky_left:
+            self.flaky_left -= 1
+            return "Input/output error"
+        return self.real_write(worker, offset, view)
+
+
+@pytest.fixture
+def disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(overwrite_engine, "SKIP_MIN", 64 * KB)
+    path = tmp_path / "disk.img"
+    path.write_bytes(b"\xff" * (1024 * KB))
+    return str(path)
+
+
+def _overwriter(disk, **kwargs):
+    return ResilientOverwriter(disk, 1024 * KB, block_size=64 * KB, retry_block_size=4 * KB, **kwargs)
+
+
+def test_resilient_skips_and_reports_a_bad_region(disk, monkeypatch):
+    FailingDrive(monkeypatch, bad=[(200 * KB, 206 * KB)])
+    report = _overwriter(disk).run()
+    assert report["unwritable_ranges"] == [{"start": 200 * KB, "end": 208 * KB, "reason": "Input/output error"}]
+    assert report["bytes_written"] == 1016 * KB
+    assert not report["aborted"]
+    with open(disk, "rb") as f:
+        data = f.read()
+    assert data[:200 * KB] == bytes(200 * KB) and data[208 * KB:] == bytes(816 * KB)
+
+
+def test_resilient_retries_transient_errors(disk, monkeypatch):
+    FailingDrive(monkeypatch, flaky=[(512 * KB, 513 * KB)], flaky_attempts=2)
+    report = _overwriter(disk).run()
+    assert report["unwritable_ranges"] == []
+    assert report["io_errors"] == 2
+    with open(disk, "rb") as f:
+        assert f.read() == bytes(1024 * KB)
+
+
+def test_resilient_gives_up_after_stuck_writes(disk, monkeypatch):
+    FailingDrive(monkeypatch, bad=[(0, 1024 * KB)], hang=0.2)
+    report = _overwriter(disk, io_timeout=0.02).run()
+    assert report["aborted"]
+    assert report["timeouts"] == overwrite_engine.MAX_STUCK_IO
+    assert report["unwritable_bytes"] == 1024 * KB
+    assert report["bytes_written"] == 0
@@ -0,0 +1,150 @@
+import os
+import re
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+import quick_kill
+import wipe_pipeline
+from wipe_pipeline import CommandRunner, WipeJob
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "disk.img"
+    path.write_bytes(b"\xff" * (32 * MB))
+    return str(path)
+
+
+class UnprivilegedRunner(CommandRunner):
+    """Runs what WipeJob would send to sudo, minus the sudo."""
+    def __init__(self):
+        self.commands = []
+
+    def stream(self, cmd, on_line):
+        self.commands.append(cmd)
+        return super().stream(cmd[1:] if cmd[0] == "sudo" else cmd, on_line)
+
+
+def test_quick_kill_goes_through_sudo_without_device_access(image, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(wipe_pipeline.os, "access", lambda path, mode: False)
+    runner = UnprivilegedRunner()
+    lines, entries = [], []
+    job = WipeJob("sdz", "HDD", runner=runner, device_path=image, emit=lines.append)
+    job._append_entry = entries.append
+
+    report = job._run_quick_kill(image, 32 * MB)
+
+    assert runner.commands[0][:2] == ["sudo", wipe_pipeline.sys.executable]
+    assert report["bytes_written"] == 32 * MB and not report["errors"]
+    assert entries[0]["event"] == "quick_kill" and entries[0]["bytes_written"] == 32 * MB
+    with open(image, "rb") as f:
+        assert f.read() == bytes(32 * MB)
+
+
+def _write_at(path, offset, data):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+@pytest.fixture
+def blank(tmp_path):
+    def make(size):
+        path = tmp_path / "blank.img"
+        with open(path, "wb") as f:
+            f.truncate(size)
+        return str(path)
+    return make
+
+
+def _partitions(path, size):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return quick_kill.read_partitions(fd, size)
+    finally:
+        os.close(fd)
+
+
+@pytest.mark.parametrize("sector", [512, 4096])
+def test_read_partitions_gpt(blank, sector):
+    size = 64 * MB
+    path = blank(size)
+    header = bytearray(92)
+    header[:8] = b"EFI PART"
+    struct.pack_into("<QII", header, 72, 2, 128, 128)
+    entries = bytearray(128 * 128)
+    for i, (first, last) in enumerate([(2048, 4095), (4096, 8191)]):
+        entries[i * 128:i * 128 + 16] = b"\x01" * 16     # any non-empty type GUID
+        struct.pack_into("<QQ", entries, i * 128 + 32, first, last)
+    _write_at(path, sector, bytes(header))
+    _write_at(path, 2 * sector, bytes(entries))
+    assert _partitions(path, size) == [(2048 * sector, 4096 * sector), (4096 * sector, 8192 * sector)]
+
+
+def test_read_partitions_mbr_ignores_protective_entry(blank):
+    size = 64 * MB
+    path = blank(size)
+    mbr = bytearray(512)
+    struct.pack_into("<B3xII", mbr, 446 + 4, 0x83, 2048, 4096)
+    struct.pack_into("<B3xII", mbr, 446 + 16 + 4, 0xEE, 1, 100)
+    mbr[510:512] = b"\x55\xaa"
+    _write_at(path, 0, bytes(mbr))
+    assert _partitions(path, size) == [(2048 * 512, 6144 * 512)]
+
+
+def test_unreadable_table_gives_no_partitions(blank):
+    size = 8 * MB
+    assert _partitions(blank(size), size) == []
+
+
+@pytest.mark.skipif(not shutil.which("mkfs.ext4") or not shutil.which("dumpe2fs"), reason="needs e2fsprogs")
+@pytest.mark.parametrize("block_size, size", [(1024, 64 * MB), (4096, 1024 * MB)])
+def test_ext_superblocks_match_dumpe2fs(blank, block_size, size):
+    path = blank(size)
+    subprocess.run(["mkfs.ext4", "-q", "-F", "-b", str(block_size), path], check=True)
+    listing = subprocess.run(["dumpe2fs", path], capture_output=True, text=True, check=True).stdout
+    expected = [int(b) * block_size for b in re.findall(r"Backup superblock at (\d+)", listing)]
+    assert expected
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        assert quick_kill._ext_superblocks(fd, 0) == expected
+    finally:
+        os.close(fd)
+
+
+def test_xfs_and_btrfs_superblocks(blank):
+    size = 1024 * MB
+    path = blank(size)
+    xfs = bytearray(512)
+    xfs[:4] = b"XFSB"
+    struct.pack_into(">I", xfs, 4, 4096)
+    struct.pack_into(">II", xfs, 84, 16384, 4)           # 64 MiB allocation groups
+    _write_at(path, 0, bytes(xfs))
+    btrfs_start = 256 * MB
+    _write_at(path, btrfs_start + 64 * 1024 + 64, b"_BHRfS_M")
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        assert quick_kill._xfs_superblocks(fd, 0) == [64 * MB, 128 * MB, 192 * MB]
+        assert quick_kill._btrfs_superblocks(fd, btrfs_start, size) == [btrfs_start + 64 * MB]
+        assert quick_kill._btrfs_superblocks(fd, 0, size) == []
+    finally:
+        os.close(fd)
+
+
+def test_plan_regions_orders_and_dedupes(blank):
+    size = 64 * MB
+    path = blank(size)
+    mbr = bytearray(512)
+    struct.pack_into("<B3xII", mbr, 446 + 4, 0x83, 2048, 32768)  # 1 MiB .. 17 MiB
+    mbr[510:512] = b"\x55\xaa"
+    _write_at(path, 0, bytes(mbr))
+    regions, partitions = quick_kill.plan_regions(path, size, edge_bytes=4 * MB)
+    assert partitions == [(MB, 17 * MB)]
+    # The partition head lies inside the disk head and is dropped
+    assert [(r["start"], r["end"]) for r in regions] == [(0, 4 * MB), (60 * MB, 64 * MB), (16 * MB, 17 * MB)]
@@ -0,0 +1,79 @@
+import json
+import threading
+import http.client
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+import blockchain_connector
+import verify_server
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # ledger.json is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    blockchain_connector.record_anchors({"tx1": {"hash": "h1"}})
+    key = Ed25519PrivateKey.generate()
+    (tmp_path / "keys").mkdir()
+    (tmp_path / "keys" / "station.pem").write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    svc = verify_server.VerificationService(keys_dir=str(tmp_path / "keys"))
+    svc.sign = lambda cert: key.sign(json.dumps(cert, sort_keys=True).encode()).hex()
+    return svc
+
+
+CERT = {"Ledger ID": "tx1", "Verification Hash": "h1", "Drive Name": "sdb"}
+
+
+def test_signed_certificate_is_valid(service):
+    result = service.verify_certificate(CERT, service.sign(CERT))
+    assert result["valid"] and result["signature"] == "valid"
+
+
+def test_unsigned_certificate_is_not_valid(service):
+    result = service.verify_certificate(CERT)
+    assert not result["valid"]
+    assert result["status"] == "unsigned" and result["found"]
+
+
+def test_forged_drive_details_fail(service):
+    forged = dict(CERT, **{"Drive Name": "sdc"})
+    assert not service.verify_certificate(forged, service.sign(CERT))["valid"]
+
+
+@pytest.mark.parametrize("txid", [["tx1"], {"tx1": 1}, 7])
+def test_non_string_ids_are_rejected(service, txid):
+    result = service.verify_item({"certificate": dict(CERT, **{"Ledger ID": txid})})
+    assert result["valid"] is False
+    assert "must be strings" in result["message"]
+
+
+def _post(server, path, body, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    conn.request("POST", path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.fixture
+def server(service):
+    server, _ = verify_server.make_server(port=0, service=service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_batch_survives_a_malformed_item(server):
+    items = [{"certificate": {"Ledger ID": ["a"], "Verification Hash": "x"}}, {"txid": "tx1", "hash": "h1"}]
+    status, body = _post(server, "/verify/batch", json.dumps({"items": items}))
+    assert status == 200
+    assert [r["valid"] for r in body["results"]] == [False, True]
+
+
+@pytest.mark.parametrize("length", ["-1", "abc"])
+def test_bad_content_length_is_rejected(server, length):
+    status, body = _post(server, "/verify/certificate", None, {"Content-Length": length})
+    assert status == 400
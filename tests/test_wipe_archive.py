@@ -0,0 +1,94 @@
+import os
+import json
+import time
+
+import pytest
+
+import anchor_queue
+import wipe_archive
+
+OLD = time.time() - 90 * 86400
+
+# What every certificate PDF shares: fonts, catalog, page tree
+SHARED_OBJECTS = (b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+                  b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n"
+                  b"4 0 obj\n<< /Type /Font /BaseFont /Helvetica >>\nendobj\n")
+
+
+def _pdf(drive):
+    return (b"%PDF-1.4\n" + SHARED_OBJECTS
+            + f"3 0 obj\n<< /Contents (Drive {drive} wiped) >>\nendobj\n".encode()
+            + b"xref\n0 5\ntrailer\n<< /Root 1 0 R >>\nstartxref\n0\n%%EOF\n")
+
+
+@pytest.fixture
+def wipes(tmp_path, monkeypatch):
+    # The anchor outbox is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    wipes_dir = tmp_path / "wipes"
+    wipes_dir.mkdir()
+    files = {}
+    for drive in ("sdb", "sdc"):
+        base = f"{drive}_20250101_120000"
+        files[base + ".pdf"] = _pdf(drive)
+        files[base + ".json"] = json.dumps({"Drive Name": drive}).encode()
+        files[base + ".log"] = json.dumps({"log_entries": [{"event": "start_wipe", "drive": drive}]}).encode()
+        files[base + ".fp.json"] = b"{}"
+    for name, data in files.items():
+        (wipes_dir / name).write_bytes(data)
+        os.utime(wipes_dir / name, (OLD, OLD))
+    return str(wipes_dir), str(tmp_path / "archive"), files
+
+
+def test_pack_round_trip(wipes):
+    wipes_dir, archive_dir, files = wipes
+    summary = wipe_archive.pack(30, wipes_dir, archive_dir)
+    assert summary["files"] == len(files) and not summary["errors"]
+    assert os.listdir(wipes_dir) == []
+    for name, data in files.items():
+        assert wipe_archive.load_artifact(os.path.join(wipes_dir, name), archive_dir) == data
+    assert wipe_archive.verify_archive(archive_dir) == []
+
+
+def test_pack_stores_shared_chunks_once(wipes):
+    wipes_dir, archive_dir, files = wipes
+    chunks = [c for name, data in files.items() for c in wipe_archive.split_chunks(name, data)]
+    summary = wipe_archive.pack(30, wipes_dir, archive_dir)
+    assert summary["chunks_new"] == len(set(chunks))
+    assert summary["chunks_shared"] == len(chunks) - len(set(chunks))
+    # Only the per-drive content object differs between the two PDFs
+    pdf_chunks = [set(wipe_archive.split_chunks("x.pdf", _pdf(d))) for d in ("sdb", "sdc")]
+    assert len(pdf_chunks[0] ^ pdf_chunks[1]) == 2
+
+
+def test_pack_leaves_recent_and_anchoring_artifacts(wipes, tmp_path):
+    wipes_dir, archive_dir, files = wipes
+    os.utime(os.path.join(wipes_dir, "sdb_20250101_120000.log"))
+    anchor_queue.enqueue("f" * 64, json_path=os.path.join(wipes_dir, "sdc_20250101_120000.json"))
+    wipe_archive.pack(30, wipes_dir, archive_dir)
+    assert sorted(os.listdir(wipes_dir)) == ["sdb_20250101_120000.log", "sdc_20250101_120000.json",
+                                             "sdc_20250101_120000.pdf"]
+
+
+def test_damaged_segment_is_reported(wipes):
+    wipes_dir, archive_dir, _ = wipes
+    wipe_archive.pack(30, wipes_dir, archive_dir)
+    segment = os.path.join(archive_dir, "seg-000001.dat")
+    with open(segment, "r+b") as f:
+        f.seek(os.path.getsize(segment) - 4)
+        f.write(b"\0\0\0\0")
+    assert wipe_archive.verify_archive(archive_dir)
+    with pytest.raises(wipe_archive.ArchiveError):
+        wipe_archive.read_artifact("sdc_20250101_120000.pdf", archive_dir)
+
+
+def test_certificates_and_restored_files_come_from_the_archive(wipes):
+    wipes_dir, archive_dir, files = wipes
+    wipe_archive.pack(30, wipes_dir, archive_dir)
+    paths = wipe_archive.certificate_paths(wipes_dir, archive_dir)
+    assert [os.path.basename(p) for p in paths] == ["sdc_20250101_120000.json", "sdb_20250101_120000.json"]
+    restored = wipe_archive.artifact_path(os.path.join(wipes_dir, "sdb_20250101_120000.pdf"), archive_dir)
+    with open(restored, "rb") as f:
+        assert f.read() == files["sdb_20250101_120000.pdf"]
+    with pytest.raises(FileNotFoundError):
+        wipe_archive.load_artifact(os.path.join(wipes_dir, "nope.json"), archive_dir)
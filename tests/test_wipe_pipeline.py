@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import wipe_pipeline
+from wipe_pipeline import CommandRunner, WipeJob
+
+MB = 1024 * 1024
+
+
+class RecordingRunner(CommandRunner):
+    """Records erase commands and reports success without running them."""
+    def __init__(self):
+        self.commands = []
+
+    def stream(self, cmd, on_line):
+        self.commands.append(cmd)
+        return 0
+
+
+@pytest.fixture
+def image(tmp_path, monkeypatch):
+    # wipes/, keys and the anchor outbox are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "disk.img"
+    path.write_bytes(b"\xff" * (8 * MB))
+    return str(path)
+
+
+def _without_access(monkeypatch, device):
+    real_access = os.access
+    monkeypatch.setattr(wipe_pipeline.os, "access",
+                        lambda path, mode: False if path == device else real_access(path, mode))
+
+
+def test_failing_media_mode_without_access_keeps_the_sudo_command(image, monkeypatch):
+    _without_access(monkeypatch, image)
+    runner, lines = RecordingRunner(), []
+    job = WipeJob("sdz", "HDD", runner=runner, device_path=image, overwrite_mode="resilient",
+                  quick_kill=False, emit=lines.append)
+    result = job.run()
+    assert result["success"]
+    assert runner.commands[0][:2] == ["sudo", "nwipe"]
+    assert any("Failing-media mode needs read-write access" in line for line in lines)
+
+
+def test_failing_media_mode_with_access_overwrites_in_process(image):
+    runner = RecordingRunner()
+    job = WipeJob("sdz", "HDD", runner=runner, device_path=image, overwrite_mode="resilient", quick_kill=False)
+    result = job.run()
+    assert result["success"] and not runner.commands
+    with open(image, "rb") as f:
+        assert f.read() == bytes(8 * MB)
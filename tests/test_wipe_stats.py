@@ -0,0 +1,45 @@
+import pytest
+
+import wipe_stats
+
+SCRAMBLE = "Sanitize Crypto Scramble (NIST 800-88 Purge)"
+OVERWRITE = "Overwrite 1-pass (NIST 800-88 Clear)"
+SIZE = 960 * 10 ** 9
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "stats.db")
+    for i in range(3):
+        wipe_stats.record_wipe(str(tmp_path / f"scramble{i}.log"), "sdb", "Micron_5300", f"S{i}", "SATA SSD",
+                               SCRAMBLE, SIZE, 0, 8.0, True, db_path=path)
+        wipe_stats.record_wipe(str(tmp_path / f"overwrite{i}.log"), "sdc", "Micron_5300", f"O{i}", "SATA SSD",
+                               OVERWRITE, SIZE, 0, 6400.0, True, db_path=path)
+    return path
+
+
+def test_fixed_time_method_uses_its_own_median_duration(db):
+    eta = wipe_stats.estimate_seconds("Micron_5300", "SATA SSD", SCRAMBLE, SIZE, db_path=db)
+    assert eta == {"seconds": 8.0, "basis": f"model Micron_5300, {SCRAMBLE}", "samples": 3}
+
+
+def test_method_without_history_never_borrows_other_methods(db):
+    assert wipe_stats.estimate_seconds("Micron_5300", "SATA SSD", "NVMe Format", SIZE, db_path=db) is None
+
+
+def test_overwrite_uses_rate(db):
+    eta = wipe_stats.estimate_seconds("Micron_5300", "SATA SSD", OVERWRITE, SIZE // 2, db_path=db)
+    assert eta["seconds"] == pytest.approx(3200.0)
+
+
+def test_order_longest_first_estimates_the_usual_method(db, tmp_path):
+    # One more crypto scramble makes it this model's usual method
+    wipe_stats.record_wipe(str(tmp_path / "scramble3.log"), "sdb", "Micron_5300", "S3", "SATA SSD",
+                           SCRAMBLE, SIZE, 0, 8.0, True, db_path=db)
+    jobs = wipe_stats.order_longest_first([
+        {"name": "sdb", "model": "Micron_5300", "media_type": "SATA SSD", "size_bytes": SIZE},
+        {"name": "sdc", "model": "Micron_5300", "media_type": "SATA SSD", "size_bytes": SIZE, "method": OVERWRITE},
+        {"name": "sdd", "model": "Unknown", "media_type": "HDD", "size_bytes": SIZE},
+    ], db_path=db)
+    assert [j["name"] for j in jobs] == ["sdd", "sdc", "sdb"]
+    assert jobs[2]["eta"]["seconds"] == 8.0
@@ -1,6 +1,7 @@
 import sys
 import json
 from blockchain_connector import get_ledger
+from wipe_archive import load_artifact
 
 def verify_by_txid(txid):
     """
@@ -15,21 +16,31 @@ def verify_by_txid(txid):
         message = f"TXID {txid} not found in ledger records."
         return False, message
 
+def certificate_ids(cert_data):
+    """
+    (txid, final_hash, drive) of a certificate. Signed certificates use the
+    display names from report_generator; older exports used snake_case keys.
+    """
+    return (
+        cert_data.get("ledger_txid") or cert_data.get("Ledger ID"),
+        cert_data.get("final_hash") or cert_data.get("Verification Hash"),
+        cert_data.get("drive") or cert_data.get("Drive Name"),
+    )
+
 def verify_by_json_data(cert_data):
     """
     Verifies a certificate from a dictionary object.
     This is the function the certificate viewer imports.
     Returns: (bool, str) tuple of (success, message)
     """
-    txid = cert_data.get("ledger_txid")
-    final_hash = cert_data.get("final_hash")
+    txid, final_hash, drive = certificate_ids(cert_data)
 
     if not txid or not final_hash:
         return False, "Invalid certificate format (missing hash or txid)."
 
     ledger = get_ledger()
     if txid in ledger and ledger[txid]["hash"] == final_hash:
-        message = f"Hash matches ledger record for drive {cert_data.get('drive')}."
+        message = f"Hash matches ledger record for drive {drive}."
         return True, message
     elif txid in ledger:
         return False, "Hash mismatch! The certificate may be fraudulent."
@@ -39,10 +50,10 @@ def verify_by_json_data(cert_data):
 def verify_by_json_file(cert_file):
     """
     Verifies a certificate from a JSON file path (for CLI use).
+    Certificates moved out of wipes/ by wipe_archive.py are read from the archive.
     """
     try:
-        with open(cert_file, "r") as f:
-            cert = json.load(f)
+        cert = json.loads(load_artifact(cert_file))
         is_valid, message = verify_by_json_data(cert)
         if is_valid:
             print(f"✅ VERIFIED\n{message}")
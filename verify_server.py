@@ -0,0 +1,427 @@
+#verify_server.py
+# Local HTTP verification service, meant to sit behind the reverse proxy.
+# verify.py re-reads ledger.json on every call; this keeps the ledger and
+# the signing public keys indexed in memory instead, follows new anchors by
+# tailing ledger.json.journal (see blockchain_connector.record_anchors), and
+# caches certificate signature checks in an LRU.
+#
+#   GET  /verify/txid/<txid>[?hash=<final hash>]
+#   GET  /verify/hash/<final hash>
+#   POST /verify/certificate   {"certificate": {...}, "signature": "<hex or base64>"}
+#                              (a bare certificate object is accepted too; without
+#                              a signature it is reported "unsigned", never valid,
+#                              since the ledger hash does not bind the drive details)
+#   POST /verify/batch         {"items": [{"txid": ...} | {"hash": ...} | {"certificate": ..., "signature": ...}]}
+#   GET  /health
+#
+#   python verify_server.py --port 8600
+import os
+import json
+import time
+import base64
+import hashlib
+import binascii
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+import blockchain_connector
+from verify import certificate_ids
+
+HOST = os.environ.get("SECUREWIPER_VERIFY_HOST", "127.0.0.1")
+PORT = int(os.environ.get("SECUREWIPER_VERIFY_PORT", "8600"))
+KEYS_DIR = "keys"
+# How often the journal and keys directory are checked for changes
+WATCH_INTERVAL = 1.0
+# Re-read the whole ledger now and then in case a journal line was lost
+FULL_RELOAD_INTERVAL = 300.0
+CACHE_SIZE = 65536
+MAX_BATCH = 1000
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+
+class LedgerIndex:
+    """
+    In-memory txid -> record and hash -> txid maps of the ledger. refresh()
+    applies only the journal lines added since the last call; readers never
+    lock, since every update is a single dict assignment.
+    """
+    def __init__(self, ledger_path=None):
+        self.ledger_path = ledger_path or blockchain_connector.LEDGER_FILE
+        self.journal_path = self.ledger_path + ".journal"
+        self.by_txid = {}
+        self.by_hash = {}
+        self.journal_offset = 0
+        self.journal_inode = None
+        self.last_full_reload = 0.0
+        self.full_reloads = 0
+        self._refresh_lock = threading.Lock()
+
+    def _journal_stat(self):
+        """(size, inode) of the journal, or (None, None) if there is none yet."""
+        try:
+            st = os.stat(self.journal_path)
+        except OSError:
+            return None, None
+        return st.st_size, st.st_ino
+
+    def full_reload(self):
+        # Take the journal offset first: lines written while the ledger is
+        # being read are replayed on the next refresh rather than missed.
+        offset, inode = self._journal_stat()
+        offset = offset or 0
+        try:
+            with open(self.ledger_path) as f:
+                ledger = json.load(f)
+        except (OSError, ValueError):
+            ledger = {}
+        self.by_txid = ledger
+        self.by_hash = {record.get("hash"): txid for txid, record in ledger.items()}
+        self.journal_offset = offset
+        self.journal_inode = inode
+        self.last_full_reload = time.time()
+        self.full_reloads += 1
+
+    def _apply_journal(self, size):
+        with open(self.journal_path, "rb") as f:
+            f.seek(self.journal_offset)
+            data = f.read(size - self.journal_offset)
+        # A writer may be mid-line; leave the partial line for next time
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+                txid = record.pop("txid")
+            except (ValueError, KeyError):
+                continue
+            self.by_txid[txid] = record
+            self.by_hash[record.get("hash")] = txid
+        self.journal_offset += len(complete)
+        return len(complete)
+
+    def refresh(self):
+        """Pick up new anchors. Returns True if anything changed."""
+        with self._refresh_lock:
+            size, inode = self._journal_stat()
+            if (inode != self.journal_inode or (size or 0) < self.journal_offset
+                    or time.time() - self.last_full_reload > FULL_RELOAD_INTERVAL):
+                # First load, journal rotated (see blockchain_connector) or
+                # truncated, or periodic resync
+                self.full_reload()
+                return True
+            if size and size > self.journal_offset:
+                return self._apply_journal(size) > 0
+            return False
+
+
+class KeyRing:
+    """Ed25519 public keys from KEYS_DIR (public PEMs, or derived from private ones)."""
+    def __init__(self, keys_dir=KEYS_DIR):
+        self.keys_dir = keys_dir
+        self.keys = {}
+        self._stamp = None
+
+    def _dir_stamp(self):
+        try:
+            return sorted((e.name, e.stat().st_mtime_ns) for e in os.scandir(self.keys_dir)
+                          if e.name.endswith(".pem"))
+        except OSError:
+            return []
+
+    def reload_if_changed(self):
+        stamp = self._dir_stamp()
+        if stamp == self._stamp:
+            return False
+        keys = {}
+        for name, _ in stamp:
+            with open(os.path.join(self.keys_dir, name), "rb") as f:
+                pem = f.read()
+            try:
+                key = serialization.load_pem_public_key(pem)
+            except ValueError:
+                try:
+                    key = serialization.load_pem_private_key(pem, password=None).public_key()
+                except (ValueError, TypeError):
+                    continue
+            if not isinstance(key, Ed25519PublicKey):
+                continue
+            raw = key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            keys[hashlib.sha256(raw).hexdigest()[:16]] = key
+        self.keys = keys
+        self._stamp = stamp
+        return True
+
+    def find_signer(self, message, signature):
+        """key_id of the key that signed message, or None."""
+        for key_id, key in self.keys.items():
+            try:
+                key.verify(signature, message)
+                return key_id
+            except InvalidSignature:
+                continue
+        return None
+
+
+class LRUCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _decode_signature(text):
+    """Signatures may be sent as hex or base64."""
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        try:
+            return base64.b64decode(text, validate=True)
+        except (binascii.Error, ValueError):
+            return None
+
+
+class VerificationService:
+    """The verification logic behind the HTTP handler; usable without a server."""
+    def __init__(self, ledger_path=None, keys_dir=KEYS_DIR, cache_size=CACHE_SIZE):
+        self.index = LedgerIndex(ledger_path)
+        self.keyring = KeyRing(keys_dir)
+        self.cache = LRUCache(cache_size)
+        self.started = time.time()
+        self.refresh()
+
+    def refresh(self):
+        self.index.refresh()
+        if self.keyring.reload_if_changed():
+            # Cached signature results may name a key that is gone
+            self.cache.clear()
+
+    def verify_txid(self, txid, expected_hash=None):
+        record = self.index.by_txid.get(txid)
+        if record is None:
+            return {"txid": txid, "valid": False, "found": False, "message": "TXID not found in ledger."}
+        result = {"txid": txid, "valid": True, "found": True, "hash": record.get("hash")}
+        if expected_hash is not None and expected_hash != record.get("hash"):
+            result.update(valid=False, message="Hash mismatch! The certificate may be fraudulent.")
+        return result
+
+    def verify_hash(self, final_hash):
+        txid = self.index.by_hash.get(final_hash)
+        if txid is None:
+            return {"hash": final_hash, "valid": False, "found": False, "message": "Hash not anchored."}
+        return {"hash": final_hash, "valid": True, "found": True, "txid": txid}
+
+    def _signature_status(self, cert, signature_text):
+        """Cached: the signature only depends on the certificate and signature bytes."""
+        message = json.dumps(cert, sort_keys=True).encode()
+        signature_text = str(signature_text) if signature_text else None
+        cache_key = hashlib.sha256(message + b"\0" + (signature_text or "").encode()).digest()
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if not signature_text:
+            status = {"signature": "not provided", "key_id": None}
+        else:
+            signature = _decode_signature(signature_text)
+            key_id = self.keyring.find_signer(message, signature) if signature else None
+            status = {"signature": "valid" if key_id else "invalid", "key_id": key_id}
+        self.cache.put(cache_key, status)
+        return status
+
+    def verify_certificate(self, cert, signature=None):
+        if not isinstance(cert, dict):
+            return {"valid": False, "message": "Certificate must be a JSON object."}
+        txid, final_hash, drive = certificate_ids(cert)
+        if not txid or not final_hash:
+            return {"valid": False, "message": "Invalid certificate format (missing hash or txid)."}
+        if not isinstance(txid, str) or not isinstance(final_hash, str):
+            return {"valid": False, "message": "Invalid certificate format (hash and txid must be strings)."}
+        result = dict(self.verify_txid(txid, final_hash), drive=drive)
+        result.update(self._signature_status(cert, signature))
+        if result["signature"] == "invalid":
+            result.update(valid=False, message="Signature does not match any known key.")
+        elif result["signature"] == "not provided" and result["valid"]:
+            # Any anchored hash could be paired with any drive name or serial
+            result.update(valid=False, status="unsigned",
+                          message="Hash is anchored, but the certificate is not signed; "
+                                  "its drive details cannot be verified.")
+        elif result["valid"]:
+            result["message"] = f"Hash matches ledger record for drive {drive}."
+        return result
+
+    def verify_item(self, item):
+        if not isinstance(item, dict):
+            return {"valid": False, "message": "Batch items must be JSON objects."}
+        if "certificate" in item:
+            return self.verify_certificate(item["certificate"], item.get("signature"))
+        if "txid" in item:
+            return self.verify_txid(str(item["txid"]), item.get("hash"))
+        if "hash" in item:
+            return self.verify_hash(str(item["hash"]))
+        return {"valid": False, "message": "Item needs a txid, hash or certificate."}
+
+    def health(self):
+        return {
+            "status": "ok",
+            "ledger_entries": len(self.index.by_txid),
+            "journal_offset": self.index.journal_offset,
+            "full_reloads": self.index.full_reloads,
+            "keys": sorted(self.keyring.keys),
+            "cache": {"entries": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+
+def watch(service, interval=WATCH_INTERVAL, stop_event=None):
+    """Refresh loop for the ledger index and keys; run in a daemon thread."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(interval):
+        try:
+            service.refresh()
+        except Exception as e:
+            print(f"verify-server: refresh failed: {e}")
+
+
+class VerifyHandler(BaseHTTPRequestHandler):
+    # Keep-alive: the proxy reuses upstream connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY the
+    # second one waits on the client's delayed ACK (~40 ms per request)
+    disable_nagle_algorithm = True
+    service = None
+    access_log = False
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # rfile.read(-1) would wait for a close that never comes on a
+            # keep-alive connection; the body's framing is unknown, so drop it
+            self._send(400, {"error": "invalid Content-Length"})
+            self.close_connection = True
+            return None
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": "request body too large"})
+            self.close_connection = True
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send(400, {"error": "body is not valid JSON"})
+            return None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        if parts == ["health"]:
+            self._send(200, self.service.health())
+        elif len(parts) == 3 and parts[:2] == ["verify", "txid"]:
+            expected = parse_qs(url.query).get("hash", [None])[0]
+            result = self.service.verify_txid(parts[2], expected)
+            self._send(200 if result["found"] else 404, result)
+        elif len(parts) == 3 and parts[:2] == ["verify", "hash"]:
+            result = self.service.verify_hash(parts[2])
+            self._send(200 if result["found"] else 404, result)
+        else:
+            self._send(404, {"error": "unknown endpoint"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path not in ("/verify/certificate", "/verify/batch"):
+            self._send(404, {"error": "unknown endpoint"})
+            return
+        body = self._read_json()
+        if body is None:
+            return
+        if path == "/verify/certificate":
+            if isinstance(body, dict) and "certificate" in body:
+                result = self.service.verify_certificate(body["certificate"], body.get("signature"))
+            else:
+                result = self.service.verify_certificate(body)
+            self._send(200, result)
+            return
+        items = body.get("items") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            self._send(400, {"error": "expected {\"items\": [...]}"})
+        elif len(items) > MAX_BATCH:
+            self._send(413, {"error": f"at most {MAX_BATCH} items per batch"})
+        else:
+            results = []
+            for item in items:
+                try:
+                    results.append(self.service.verify_item(item))
+                except Exception as e:
+                    # One malformed item must not cost the client the whole batch
+                    results.append({"valid": False, "message": f"Could not verify item: {e}"})
+            self._send(200, {"results": results})
+
+    def log_message(self, fmt, *args):
+        if self.access_log:
+            print("verify-server:", fmt % args)
+
+
+def make_server(host=HOST, port=PORT, service=None, access_log=False):
+    """Build (server, service) without starting either; serve with server.serve_forever()."""
+    service = service or VerificationService()
+    handler = type("BoundVerifyHandler", (VerifyHandler,), {"service": service, "access_log": access_log})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local certificate verification server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    server, service = make_server(args.host, args.port, access_log=args.access_log)
+    threading.Thread(target=watch, args=(service,), daemon=True).start()
+    print(f"Verification server on http://{args.host}:{server.server_address[1]}/ "
+          f"({len(service.index.by_txid)} ledger entries, {len(service.keyring.keys)} keys)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
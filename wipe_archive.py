@@ -0,0 +1,368 @@
+#wipe_archive.py
+# Packs old wipe artifacts (.log, .json, .pdf, .sig) out of wipes/ into a
+# compressed, content-addressed archive so the directory stays small:
+#
+#   wipes/archive/seg-000001.dat   append-only segments of zlib blobs
+#   wipes/archive/index.db         artifact name -> chunk list, chunk -> segment/offset
+#
+# Files are split into chunks addressed by their sha256 and every chunk is
+# stored once. Most files are a single chunk; PDFs are split at object
+# boundaries so the font, catalog and page-tree objects every certificate
+# shares are stored once for the whole archive. A file is only removed from
+# wipes/ after it has been read back from the archive and matches byte for
+# byte. load_artifact()/artifact_path() serve archived files back to
+# verify.py and the certificate viewer.
+#
+#   python wipe_archive.py pack --older-than 30
+#   python wipe_archive.py list
+#   python wipe_archive.py extract sdb_20250909_231949.pdf -o /tmp
+#   python wipe_archive.py verify
+import os
+import re
+import json
+import time
+import zlib
+import fcntl
+import sqlite3
+import hashlib
+import argparse
+from contextlib import contextmanager
+
+WIPES_DIR = "wipes"
+ARCHIVE_DIR = os.environ.get("SECUREWIPER_ARCHIVE_DIR", os.path.join(WIPES_DIR, "archive"))
+ARCHIVE_AFTER_DAYS = float(os.environ.get("SECUREWIPER_ARCHIVE_AFTER_DAYS", "30"))
+ARTIFACT_EXTENSIONS = (".log", ".json", ".pdf", ".sig")
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+COMPRESS_LEVEL = 9
+# Each blob in a segment: sha256 digest, compressed length, compressed data
+_RECORD_HEADER = 32 + 4
+
+# Start of every PDF object and of the xref/trailer sections
+_PDF_CUT = re.compile(rb"(?m)^(?:\d+ \d+ obj\b|xref\b|trailer\b|startxref\b)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash     TEXT PRIMARY KEY,
+    segment  TEXT NOT NULL,
+    offset   INTEGER NOT NULL,
+    length   INTEGER NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    name        TEXT PRIMARY KEY,
+    sha256      TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL,
+    chunks      TEXT NOT NULL,
+    archived_at REAL
+);
+"""
+
+
+class ArchiveError(Exception):
+    """Raised when an artifact cannot be archived or read back intact."""
+
+
+def _connect(archive_dir):
+    conn = sqlite3.connect(os.path.join(archive_dir, "index.db"), timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextmanager
+def _archive_lock(archive_dir):
+    """One packer at a time; readers go through SQLite and need no lock."""
+    os.makedirs(archive_dir, exist_ok=True)
+    with open(os.path.join(archive_dir, "pack.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def split_chunks(name, data):
+    """Content-defined pieces of a file: PDF objects for PDFs, else the whole file."""
+    if not name.endswith(".pdf"):
+        return [data]
+    cuts = [m.start() for m in _PDF_CUT.finditer(data)]
+    bounds = [0] + [c for c in cuts if c > 0] + [len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _anchoring_paths():
+    """Artifacts an outbox entry will still update when its anchor confirms."""
+    from anchor_queue import OUTBOX_DIR
+    paths = set()
+    for state in ("pending", "inflight"):
+        state_dir = os.path.join(OUTBOX_DIR, state)
+        if not os.path.isdir(state_dir):
+            continue
+        for entry_name in os.listdir(state_dir):
+            try:
+                with open(os.path.join(state_dir, entry_name)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            paths.update(os.path.abspath(p) for p in (entry.get("log_path"), entry.get("json_path")) if p)
+            if entry.get("json_path"):
+                base = os.path.splitext(os.path.abspath(entry["json_path"]))[0]
+                paths.update((base + ".pdf", base + ".sig"))
+    return paths
+
+
+class _SegmentWriter:
+    """Appends blobs to the newest segment, rolling over at SEGMENT_MAX_BYTES."""
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        existing = sorted(n for n in os.listdir(archive_dir) if re.fullmatch(r"seg-\d{6}\.dat", n))
+        self.number = int(existing[-1][4:10]) if existing else 1
+        self.f = None
+
+    def _open(self):
+        name = f"seg-{self.number:06d}.dat"
+        self.f = open(os.path.join(self.archive_dir, name), "ab")
+        return name
+
+    def append(self, digest, blob):
+        """Returns (segment name, offset of the compressed data)."""
+        name = f"seg-{self.number:06d}.dat"
+        if self.f is None:
+            name = self._open()
+        if self.f.tell() and self.f.tell() + _RECORD_HEADER + len(blob) > SEGMENT_MAX_BYTES:
+            self.close()
+            self.number += 1
+            name = self._open()
+        self.f.write(bytes.fromhex(digest) + len(blob).to_bytes(4, "big"))
+        offset = self.f.tell()
+        self.f.write(blob)
+        return name, offset
+
+    def close(self):
+        if self.f is not None:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.f.close()
+            self.f = None
+
+
+def _read_chunk(archive_dir, segment, offset, length, digest):
+    with open(os.path.join(archive_dir, segment), "rb") as f:
+        f.seek(offset - _RECORD_HEADER)
+        header = f.read(_RECORD_HEADER)
+        blob = f.read(length)
+    if header[:32].hex() != digest or len(blob) != length:
+        raise ArchiveError(f"chunk {digest[:12]} is damaged in {segment}")
+    try:
+        data = zlib.decompress(blob)
+    except zlib.error as e:
+        raise ArchiveError(f"chunk {digest[:12]} is damaged in {segment}: {e}") from e
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ArchiveError(f"chunk {digest[:12]} fails its hash check")
+    return data
+
+
+def _read_archived(conn, archive_dir, name):
+    row = conn.execute("SELECT sha256, chunks FROM artifacts WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    parts = []
+    for digest in json.loads(row[1]):
+        location = conn.execute("SELECT segment, offset, length FROM chunks WHERE hash = ?", (digest,)).fetchone()
+        if location is None:
+            raise ArchiveError(f"{name}: chunk {digest[:12]} missing from index")
+        parts.append(_read_chunk(archive_dir, *location, digest))
+    data = b"".join(parts)
+    if hashlib.sha256(data).hexdigest() != row[0]:
+        raise ArchiveError(f"{name}: reassembled file does not match its recorded hash")
+    return data
+
+
+def pack(older_than_days=ARCHIVE_AFTER_DAYS, wipes_dir=WIPES_DIR, archive_dir=ARCHIVE_DIR, dry_run=False):
+    """
+    Archive artifacts in wipes_dir last modified more than older_than_days
+    ago. Artifacts still waiting on an anchor confirmation are left alone.
+    Returns a summary dict.
+    """
+    cutoff = time.time() - older_than_days * 86400
+    busy = _anchoring_paths()
+    candidates = sorted(
+        name for name in os.listdir(wipes_dir)
+        if name.endswith(ARTIFACT_EXTENSIONS)
+        and os.path.getmtime(os.path.join(wipes_dir, name)) < cutoff
+        and os.path.abspath(os.path.join(wipes_dir, name)) not in busy
+    )
+    summary = {"files": 0, "bytes_in": 0, "bytes_stored": 0, "chunks_new": 0,
+               "chunks_shared": 0, "skipped_anchoring": len(busy), "errors": []}
+    if dry_run:
+        summary["files"] = len(candidates)
+        return summary
+
+    with _archive_lock(archive_dir):
+        conn = _connect(archive_dir)
+        writer = _SegmentWriter(archive_dir)
+        packed = []
+        try:
+            for name in candidates:
+                path = os.path.join(wipes_dir, name)
+                with open(path, "rb") as f:
+                    data = f.read()
+                digests = []
+                for chunk in split_chunks(name, data):
+                    digest = hashlib.sha256(chunk).hexdigest()
+                    digests.append(digest)
+                    if conn.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone():
+                        summary["chunks_shared"] += 1
+                        continue
+                    blob = zlib.compress(chunk, COMPRESS_LEVEL)
+                    segment, offset = writer.append(digest, blob)
+                    conn.execute("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                                 (digest, segment, offset, len(blob), len(chunk)))
+                    summary["chunks_new"] += 1
+                    summary["bytes_stored"] += _RECORD_HEADER + len(blob)
+                conn.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)",
+                             (name, hashlib.sha256(data).hexdigest(), len(data),
+                              os.path.getmtime(path), json.dumps(digests), time.time()))
+                packed.append((name, path, data))
+                summary["bytes_in"] += len(data)
+            # Segments are on disk before the index points at them
+            writer.close()
+            conn.commit()
+        finally:
+            writer.close()
+
+        # Only drop the originals that read back byte for byte
+        for name, path, data in packed:
+            try:
+                if _read_archived(conn, archive_dir, name) != data:
+                    raise ArchiveError(f"{name}: archived copy differs from the original")
+            except (ArchiveError, OSError, zlib.error) as e:
+                conn.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+                conn.commit()
+                summary["errors"].append(str(e))
+                continue
+            os.remove(path)
+            summary["files"] += 1
+        conn.close()
+    return summary
+
+
+def read_artifact(name, archive_dir=ARCHIVE_DIR):
+    """Bytes of an archived artifact (by file name), or None if not archived."""
+    if not os.path.exists(os.path.join(archive_dir, "index.db")):
+        return None
+    conn = _connect(archive_dir)
+    try:
+        return _read_archived(conn, archive_dir, os.path.basename(name))
+    finally:
+        conn.close()
+
+
+def load_artifact(path, archive_dir=ARCHIVE_DIR):
+    """Contents of a wipe artifact, from disk if it is still there, else from the archive."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    data = read_artifact(path, archive_dir)
+    if data is None:
+        raise FileNotFoundError(f"{path} is neither on disk nor in the archive")
+    return data
+
+
+def artifact_path(path, archive_dir=ARCHIVE_DIR):
+    """
+    A real file for `path`: the original if present, else an extracted copy
+    under <archive_dir>/restored/ (for programs that need a file, e.g. the
+    PDF viewer). Returns None if the artifact is nowhere to be found.
+    """
+    if path and os.path.exists(path):
+        return path
+    data = read_artifact(path, archive_dir) if path else None
+    if data is None:
+        return None
+    restored = os.path.join(archive_dir, "restored", os.path.basename(path))
+    if not os.path.exists(restored):
+        os.makedirs(os.path.dirname(restored), exist_ok=True)
+        with open(restored + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(restored + ".tmp", restored)
+    return restored
+
+
+def list_artifacts(archive_dir=ARCHIVE_DIR):
+    if not os.path.exists(os.path.join(archive_dir, "index.db")):
+        return []
+    conn = _connect(archive_dir)
+    rows = conn.execute("SELECT name, size, archived_at FROM artifacts ORDER BY name").fetchall()
+    conn.close()
+    return rows
+
+
+def certificate_paths(wipes_dir=WIPES_DIR, archive_dir=ARCHIVE_DIR):
+    """
+    Paths of every certificate JSON, whether still in wipes_dir or packed
+    into the archive (load_artifact() reads either), newest first.
+    """
+    names = set()
+    if os.path.isdir(wipes_dir):
+        names.update(os.listdir(wipes_dir))
+    names.update(row[0] for row in list_artifacts(archive_dir))
+    # <drive>_<YYYYmmdd_HHMMSS>.json; .fp.json files are fingerprint sidecars
+    certificates = [n for n in names if n.endswith(".json") and not n.endswith(".fp.json")]
+    return [os.path.join(wipes_dir, n) for n in sorted(certificates, key=lambda n: (n[-20:-5], n), reverse=True)]
+
+
+def verify_archive(archive_dir=ARCHIVE_DIR):
+    """Read back every archived artifact; returns a list of error strings."""
+    errors = []
+    conn = _connect(archive_dir)
+    for (name,) in conn.execute("SELECT name FROM artifacts").fetchall():
+        try:
+            _read_archived(conn, archive_dir, name)
+        except (ArchiveError, OSError, zlib.error) as e:
+            errors.append(f"{name}: {e}")
+    conn.close()
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old wipe artifacts")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_pack = sub.add_parser("pack", help="move old artifacts from wipes/ into the archive")
+    p_pack.add_argument("--older-than", type=float, default=ARCHIVE_AFTER_DAYS, metavar="DAYS")
+    p_pack.add_argument("--wipes-dir", default=WIPES_DIR)
+    p_pack.add_argument("--dry-run", action="store_true")
+    sub.add_parser("list", help="list archived artifacts")
+    p_extract = sub.add_parser("extract", help="write an archived artifact back out")
+    p_extract.add_argument("name")
+    p_extract.add_argument("-o", "--output-dir", default=".")
+    sub.add_parser("verify", help="read back and hash-check every archived artifact")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        s = pack(args.older_than, args.wipes_dir, args.archive_dir, args.dry_run)
+        if args.dry_run:
+            print(f"Would archive {s['files']} files")
+        else:
+            print(f"Archived {s['files']} files: {s['bytes_in']} bytes in, {s['bytes_stored']} bytes stored "
+                  f"({s['chunks_new']} new chunks, {s['chunks_shared']} deduplicated)")
+        for error in s["errors"]:
+            print(f"  NOT archived: {error}")
+    elif args.command == "list":
+        for name, size, archived_at in list_artifacts(args.archive_dir):
+            print(f"{name:<40} {size:>10}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(archived_at))}")
+    elif args.command == "extract":
+        data = read_artifact(args.name, args.archive_dir)
+        if data is None:
+            raise SystemExit(f"{args.name} is not in the archive")
+        out = os.path.join(args.output_dir, os.path.basename(args.name))
+        with open(out, "wb") as f:
+            f.write(data)
+        print(f"Wrote {out}")
+    else:
+        errors = verify_archive(args.archive_dir)
+        for error in errors:
+            print(error)
+        print("Archive OK" if not errors else f"{len(errors)} damaged artifacts")
+        raise SystemExit(1 if errors else 0)
@@ -0,0 +1,812 @@
+#wipe_pipeline.py
+# Qt-free wipe pipeline. WipeThread (in-process) and the worker processes in
+# wipe_manager both drive a WipeJob; progress goes out through the `emit`
+# callback instead of a Qt signal so the job can run in any process.
+import subprocess
+import os
+import sys
+import json
+import time
+import hashlib
+import random
+import traceback
+import re
+import sqlite3
+
+from report_generator import generate_report_and_sign
+from blockchain_connector import anchor_hash
+from anchor_queue import enqueue as enqueue_anchor
+from fingerprint import fingerprint_device, diff_fingerprints, save_fingerprint
+from erase_planner import PLANNED_MEDIA, plan_erase, poll_sanitize, SANITIZE_POLL_INTERVAL
+from overwrite_engine import ResilientOverwriter, CompareSkipOverwriter
+from quick_kill import quick_kill
+import wipe_stats
+import event_stream
+
+# "queue" hands the final hash to the durable anchoring outbox (anchor_queue)
+# so the wipe never waits on the chain; "sync" anchors inline as before.
+ANCHOR_MODE = os.environ.get("SECUREWIPER_ANCHOR_MODE", "queue")
+
+# Overwrite partition tables, superblocks and the disk edges before the
+# full overwrite pass (see quick_kill.py)
+QUICK_KILL = os.environ.get("SECUREWIPER_QUICK_KILL", "1") == "1"
+QUICK_KILL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quick_kill.py")
+
+# Slow-write flash media default to the read-compare-skip overwrite
+COMPARE_SKIP_MEDIA = ("USB Thumb Drive", "SD / microSD")
+COMPARE_SKIP = os.environ.get("SECUREWIPER_COMPARE_SKIP", "1") == "1"
+
+# Progress in erase command output, for throughput events: dd's
+# "<n> bytes (...) copied" and the percentage nwipe prints
+_DD_PROGRESS = re.compile(r"^(\d+) bytes\b.*copied")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)%")
+
+# NIST mapping table - Corrected to include --nogui for nwipe
+NIST_METHODS = {
+    "HDD": (
+        "Overwrite 1-pass (NIST 800-88 Clear)",
+        ["sudo", "nwipe", "--autonuke", "--nogui", "--method=zero"]
+    ),
+    "SATA SSD": (
+        "Secure Erase (NIST 800-88 Purge)",
+        ["sudo", "hdparm", "--user-master", "u", "--security-erase", "p"]
+    ),
+    "NVMe M.2 SSD": (
+        "NVMe Format (NIST 800-88 Purge)",
+        ["sudo", "nvme", "format"]
+    ),
+    "USB Thumb Drive": (
+        "Overwrite",
+        ["sudo", "dd", "if=/dev/zero", "bs=64M", "status=progress"]
+    ),
+    "SD / microSD": (
+        "Overwrite",
+        ["sudo", "dd", "if=/dev/zero", "bs=64M", "status=progress"]
+    ),
+    "Dummy Test": (
+        "Dummy Overwrite",
+        ["dd", "if=/dev/zero", "of=dummy_test.img", "bs=1M", "count=5", "status=progress"]
+    ),
+    "Unknown": (
+        "Default Overwrite (NIST 800-88 Clear)",
+        ["sudo", "nwipe", "--autonuke", "--nogui", "--method=zero"]
+    ),
+}
+
+
+class CommandRunner:
+    """
+    How WipeJob talks to the outside world: erase commands, probe commands
+    and waits. The fleet simulator swaps in a fake one so the whole pipeline
+    runs without root or real disks.
+    """
+    def stream(self, cmd, on_line):
+        """Run cmd, calling on_line(line) for each output line. Returns the exit code."""
+        proc = None
+        try:
+            # Using shell=True for commands with '&&' might be risky, but needed for hdparm chain
+            use_shell = "&&" in " ".join(cmd)
+            proc = subprocess.Popen(
+                " ".join(cmd) if use_shell else cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                shell=use_shell
+            )
+
+            for line in iter(proc.stdout.readline, ''):
+                on_line(line)
+
+            proc.stdout.close()
+            return proc.wait()
+        finally:
+            if proc and proc.poll() is None:
+                proc.kill()
+
+    def check_output(self, cmd):
+        return subprocess.check_output(cmd, text=True, stderr=subprocess.STDOUT)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class WipeJob:
+    """
+    One wipe of one drive: run the erase command, sample sectors, anchor the
+    final chain hash and produce the signed certificate.
+    """
+    def __init__(self, drive, media_type, serial=None, sample_count=5, emit=None,
+                 fingerprint=False, runner=None, device_path=None, anchor_mode=None,
+                 overwrite_mode=None, model=None, quick_kill=None, events=None):
+        self.drive = drive
+        self.media_type = media_type
+        self.serial = serial
+        # Drive model from lsblk; keys the throughput history (wipe_stats.py)
+        self.model = model
+        self.sample_count = sample_count
+        self.emit = emit or (lambda line: None)
+        # Structured events (event_stream.py); worker processes pass a
+        # callable that forwards them to the GUI process
+        self.events = events or event_stream.publish_event
+        self.job_id = f"{drive}-{int(time.time() * 1000)}"
+        self._erase_started = None
+        self._last_throughput = 0.0
+        # Tree-hash the whole device before and after the wipe (see fingerprint.py)
+        self.fingerprint = fingerprint
+        self.runner = runner or CommandRunner()
+        # Override for the device node, e.g. a sparse file standing in for a drive
+        self.device_path_override = device_path
+        self.anchor_mode = anchor_mode or ANCHOR_MODE
+        # "command" runs the nwipe/dd entry from NIST_METHODS; "resilient"
+        # overwrites in-process with bad-region skipping and "compare" only
+        # writes chunks that differ (overwrite_engine). None picks "compare"
+        # for flash media this process can open read-write, else "command"
+        # (which escalates through sudo).
+        if overwrite_mode is None:
+            compare = (COMPARE_SKIP and media_type in COMPARE_SKIP_MEDIA
+                       and os.access(self._device_path(), os.R_OK | os.W_OK))
+            overwrite_mode = "compare" if compare else "command"
+        self.overwrite_mode = overwrite_mode
+        self.quick_kill = QUICK_KILL if quick_kill is None else quick_kill
+        self.out_dir = os.path.abspath("wipes")
+        os.makedirs(self.out_dir, exist_ok=True)
+        # Create dummy file if it doesn't exist for the test option
+        if self.media_type == "Dummy Test" and not os.path.exists("dummy_test.img"):
+            with open("dummy_test.img", "wb") as f:
+                f.truncate(5 * 1024 * 1024) # 5MB
+
+        self.log_entries = []
+        self.prev_hash = hashlib.sha256(b"genesis").hexdigest()
+        # Wall time per pipeline stage, returned as result["stage_timings"]
+        self.stage_timings = {}
+
+    def _publish(self, event_type, **fields):
+        """Publish a structured event; a broken consumer never fails the wipe."""
+        try:
+            self.events(dict(fields, type=event_type, job_id=self.job_id, drive=self.drive, ts=time.time()))
+        except Exception:
+            pass
+
+    def _begin_stage(self, stage):
+        self._publish("phase", phase=stage, state="started")
+        started = time.perf_counter()
+        if stage == "erase":
+            self._erase_started = started
+        return started
+
+    def _record_stage(self, stage, started):
+        elapsed = time.perf_counter() - started
+        self.stage_timings[stage] = self.stage_timings.get(stage, 0.0) + elapsed
+        self._publish("phase", phase=stage, state="finished", seconds=round(elapsed, 3))
+
+    def _publish_throughput(self, bytes_done=None, bytes_total=None, percent=None, force=False,
+                            phase="erase", started=None):
+        """
+        Throughput sample for the event stream, at most one per
+        THROUGHPUT_INTERVAL. Rates are measured from `started`, which
+        defaults to the start of the erase stage.
+        """
+        now = time.perf_counter()
+        if not force and now - self._last_throughput < event_stream.THROUGHPUT_INTERVAL:
+            return
+        self._last_throughput = now
+        elapsed = now - (started or self._erase_started or now)
+        if percent is None and bytes_done is not None and bytes_total:
+            percent = bytes_done * 100 / bytes_total
+        if bytes_done is None and percent is not None and bytes_total:
+            bytes_done = int(bytes_total * percent / 100)
+        self._publish("throughput", phase=phase, bytes_done=bytes_done, bytes_total=bytes_total,
+                      percent=None if percent is None else round(percent, 2),
+                      mb_per_s=round(bytes_done / 1e6 / elapsed, 2) if bytes_done and elapsed > 0 else None,
+                      elapsed_seconds=round(elapsed, 1))
+
+    def _device_path(self):
+        if self.device_path_override:
+            return self.device_path_override
+        if self.media_type == "Dummy Test":
+            return os.path.abspath("dummy_test.img")
+        return f"/dev/{self.drive}"
+
+    def _device_size_bytes(self):
+        try:
+            # getsize() reports 0 for block devices; seeking to the end doesn't
+            with open(self._device_path(), "rb") as f:
+                return f.seek(0, os.SEEK_END)
+        except Exception:
+            try:
+                out = self.runner.check_output(["blockdev", "--getsize64", self._device_path()]).strip()
+                return int(out)
+            except Exception:
+                return None
+
+    def _chain_hash(self, prev_hash_hex, entry_bytes):
+        h = hashlib.sha256()
+        h.update(prev_hash_hex.encode("utf-8"))
+        h.update(entry_bytes)
+        return h.hexdigest()
+
+    def _append_entry(self, entry):
+        """Chain `entry` onto the log and return the new chain hash."""
+        eb = json.dumps(entry, sort_keys=True).encode("utf-8")
+        self.prev_hash = self._chain_hash(self.prev_hash, eb)
+        entry["chain_hash"] = self.prev_hash
+        self.log_entries.append(entry)
+        return self.prev_hash
+
+    def _sample_random_sectors(self, device_path, device_size_bytes, count):
+        samples = []
+        if device_size_bytes is None or device_size_bytes <= 0:
+            return samples
+        sector_size = 512
+        total_sectors = device_size_bytes // sector_size
+        if total_sectors <= 1:
+            return samples
+        picks = set()
+        # Ensure we don't try to sample more sectors than exist
+        count = min(count, total_sectors)
+
+        attempts = 0
+        while len(picks) < count and attempts < count * 20:
+            candidate = random.randint(0, total_sectors - 1)
+            picks.add(candidate)
+            attempts += 1
+
+        for sector in sorted(list(picks)):
+            try:
+                with open(device_path, "rb") as f:
+                    f.seek(sector * sector_size)
+                    data = f.read(sector_size)
+                    hexdata = data.hex()
+                    samples.append({
+                        "sector_index": sector,
+                        "offset_bytes": sector * sector_size,
+                        "hex": hexdata
+                    })
+            except Exception as e:
+                samples.append({
+                    "sector_index": sector,
+                    "offset_bytes": sector * sector_size,
+                    "error": str(e)
+                })
+        return samples
+
+    def _record_fingerprint(self, phase, device_path, base_name, previous=None):
+        """
+        Fingerprint the device and chain a "fingerprint" event. The per-chunk
+        digests go to a sidecar file (they run to megabytes on large drives);
+        the log keeps the tree root and the sidecar's own hash.
+        """
+        self.emit(f"Fingerprinting device ({phase})...")
+        started = time.perf_counter()
+        last_percent = [-1]
+
+        def progress(done, total):
+            percent = done * 100 // total if total else 100
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.emit(f"Fingerprint {phase}: {percent}% read")
+            self._publish_throughput(done, total, force=done == total, phase="fingerprint", started=started)
+
+        fp = fingerprint_device(device_path, progress=progress)
+        fp_path = os.path.join(self.out_dir, f"{base_name}.{phase}.fp.json")
+        save_fingerprint(fp, fp_path)
+        with open(fp_path, "rb") as f:
+            fp_file_hash = hashlib.sha256(f.read()).hexdigest()
+
+        entry = {
+            "event": "fingerprint",
+            "phase": phase,
+            "algorithm": fp["algorithm"],
+            "root": fp["root"],
+            "device_size": fp["device_size"],
+            "chunk_size": fp["chunk_size"],
+            "chunk_count": fp["chunk_count"],
+            "mb_per_s": fp["mb_per_s"],
+            "fingerprint_file": fp_path,
+            "fingerprint_file_sha256": fp_file_hash,
+            "timestamp": time.time()
+        }
+        if previous is not None:
+            entry["changed_chunks"] = len(diff_fingerprints(previous, fp))
+        self._append_entry(entry)
+        self.emit(f"Fingerprint {phase}: {fp['root']} ({fp['mb_per_s']} MB/s)")
+        return fp
+
+    def _run_command(self, cmd, size_bytes=None):
+        """
+        Run one erase command, streaming its output into the log. Returns
+        the exit code, or None if it could not be run at all.
+        """
+        self.emit(f"Running command: {' '.join(cmd)}")
+
+        def on_line(line):
+            ln = line.strip()
+            if ln:
+                self.emit(ln)
+                self._append_entry({ "event": "wipe_progress", "line": ln, "timestamp": time.time() })
+                dd = _DD_PROGRESS.match(ln)
+                percent = None if dd else _PERCENT.search(ln)
+                if dd:
+                    self._publish_throughput(int(dd.group(1)), size_bytes)
+                elif percent:
+                    self._publish_throughput(bytes_total=size_bytes, percent=float(percent.group(1)))
+
+        returncode = None
+        try:
+            returncode = self.runner.stream(cmd, on_line)
+            self.emit(f"Process finished with return code: {returncode}")
+        except Exception as e:
+            self.emit(f"Error running wipe command: {e}")
+            self._append_entry({ "event": "wipe_error", "error": str(e), "timestamp": time.time() })
+        return returncode
+
+    def _wait_for_sanitize(self, kind, device_path, estimated_seconds):
+        """Poll a background sanitize to completion, logging each new percent."""
+        last_percent = [-1]
+
+        def on_progress(status):
+            percent = int(status["progress"] * 100)
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.emit(f"Sanitize {status['state']}: {percent}%")
+                self._publish_throughput(percent=percent)
+                self._append_entry({
+                    "event": "sanitize_progress",
+                    "state": status["state"],
+                    "percent": percent,
+                    "timestamp": time.time()
+                })
+
+        self.emit("Sanitize running in the drive's background; polling status...")
+        ok, status = poll_sanitize(kind, device_path, estimated_seconds, on_progress=on_progress,
+                                   interval=SANITIZE_POLL_INTERVAL, run=self.runner.check_output,
+                                   sleep=self.runner.sleep)
+        self._append_entry({
+            "event": "sanitize_complete",
+            "success": ok,
+            "state": status["state"],
+            "error": status.get("error"),
+            "timestamp": time.time()
+        })
+        return ok
+
+    def _run_resilient_overwrite(self, device_path, size_bytes):
+        """
+        Overwrite with overwrite_engine and chain its unwritable-range map.
+        Returns the engine report, or None if it could not run.
+        """
+        if not size_bytes:
+            self.emit("Resilient overwrite needs the device size, which could not be read.")
+            self._append_entry({ "event": "wipe_error", "error": "unknown device size", "timestamp": time.time() })
+            return None
+
+        def progress(done, total, message):
+            if message:
+                self.emit(message)
+            self.emit(f"Resilient overwrite: {done * 100 // total}% written")
+            self._publish_throughput(done, total)
+
+        self.emit(f"Running resilient overwrite of {device_path} ({size_bytes} bytes)")
+        try:
+            report = ResilientOverwriter(device_path, size_bytes, progress=progress).run()
+        except Exception as e:
+            self.emit(f"Error running resilient overwrite: {e}")
+            self._append_entry({ "event": "wipe_error", "error": str(e), "timestamp": time.time() })
+            return None
+
+        self._append_entry(dict(report, event="resilient_overwrite", timestamp=time.time()))
+        if report["unwritable_ranges"]:
+            self.emit(f"{len(report['unwritable_ranges'])} unwritable ranges, "
+                      f"{report['unwritable_bytes']} bytes not overwritten"
+                      + (" (aborted: device stopped responding)" if report["aborted"] else ""))
+        return report
+
+    def _run_compare_overwrite(self, device_path, size_bytes):
+        """
+        Read-compare-skip overwrite, chained with its skipped/written counts.
+        Returns the engine report, or None if it could not run.
+        """
+        if not size_bytes:
+            self.emit("Read-compare-skip overwrite needs the device size, which could not be read.")
+            self._append_entry({ "event": "wipe_error", "error": "unknown device size", "timestamp": time.time() })
+            return None
+
+        def progress(done, total, message):
+            if message:
+                self.emit(message)
+            self.emit(f"Compare-skip overwrite: {done * 100 // total}% checked")
+            self._publish_throughput(done, total)
+
+        self.emit(f"Running read-compare-skip overwrite of {device_path} ({size_bytes} bytes)")
+        try:
+            report = CompareSkipOverwriter(device_path, size_bytes, progress=progress).run()
+        except Exception as e:
+            self.emit(f"Error running read-compare-skip overwrite: {e}")
+            self._append_entry({ "event": "wipe_error", "error": str(e), "timestamp": time.time() })
+            return None
+
+        self._append_entry(dict(report, event="compare_skip_overwrite", timestamp=time.time()))
+        mb = 1024 * 1024
+        self.emit(f"Skipped {report['bytes_skipped'] // mb} MB already blank, wrote {report['bytes_written'] // mb} MB, "
+                  f"verified {report['bytes_verified'] // mb} MB in {report['elapsed_seconds']:.1f} s")
+        if report["failed_ranges"]:
+            self.emit(f"{len(report['failed_ranges'])} ranges could not be written or verified")
+        return report
+
+    def _run_quick_kill(self, device_path, size_bytes):
+        """Metadata pre-pass, chained as its own log entry. Never fails the job."""
+        try:
+            if os.access(device_path, os.R_OK | os.W_OK):
+                report = quick_kill(device_path, size_bytes, progress=self.emit)
+            else:
+                report = self._run_quick_kill_privileged(device_path, size_bytes)
+        except Exception as e:
+            self.emit(f"Quick-kill pre-pass failed: {e}")
+            self._append_entry({ "event": "quick_kill", "error": str(e), "timestamp": time.time() })
+            return None
+        self._append_entry(dict(report, event="quick_kill", timestamp=time.time()))
+        self.emit(f"Quick-kill: overwrote {len(report['regions'])} metadata regions "
+                  f"({report['bytes_written'] // (1024 * 1024)} MB, {report['partitions_found']} partitions) "
+                  f"in {report['elapsed_seconds']:.1f} s")
+        return report
+
+    def _run_quick_kill_privileged(self, device_path, size_bytes):
+        """quick_kill.py through sudo, like the erase commands; returns its report."""
+        cmd = ["sudo", sys.executable, QUICK_KILL_SCRIPT, device_path, str(size_bytes)]
+        reports = []
+
+        def on_line(line):
+            line = line.rstrip("\n")
+            if line.startswith("{"):
+                reports.append(line)
+            elif line:
+                self.emit(line)
+
+        code = self.runner.stream(cmd, on_line)
+        if code != 0 or not reports:
+            raise RuntimeError(f"quick_kill.py exited with code {code}")
+        return json.loads(reports[-1])
+
+    def _estimate_eta(self, method_name, size_bytes, plan):
+        """Historical ETA for this erase, falling back to the planner's estimate."""
+        try:
+            eta = wipe_stats.estimate_seconds(self.model, self.media_type, method_name, size_bytes)
+        except sqlite3.Error as e:
+            self.emit(f"Could not read wipe history: {e}")
+            eta = None
+        if eta is None and plan is not None and plan["estimated_seconds"]:
+            eta = {"seconds": plan["estimated_seconds"], "basis": "planner estimate", "samples": 0}
+        if eta is not None:
+            self.emit(f"Estimated erase time: ~{wipe_stats.format_duration(eta['seconds'])} ({eta['basis']})")
+        return eta
+
+    def _record_throughput(self, log_file, method_name, size_bytes, success):
+        """Chain a throughput entry for the erase and add it to the wipe history."""
+        erase_seconds = self.stage_timings.get("erase", 0.0)
+        try:
+            check = wipe_stats.check_throughput(self.model, self.media_type, method_name,
+                                                size_bytes, erase_seconds) if success else {}
+            wipe_stats.record_wipe(log_file, self.drive, self.model, self.serial, self.media_type,
+                                   method_name, size_bytes, time.time() - erase_seconds,
+                                   erase_seconds, success, check.get("slow_drive", False))
+        except sqlite3.Error as e:
+            self.emit(f"Could not record wipe statistics: {e}")
+            check = {}
+
+        self._append_entry({
+            "event": "throughput",
+            "erase_seconds": round(erase_seconds, 3),
+            "size_bytes": size_bytes,
+            "mb_per_s": check.get("mb_per_s"),
+            "expected_mb_per_s": check.get("expected_mb_per_s"),
+            "baseline": check.get("basis"),
+            "slow_drive": check.get("slow_drive", False),
+            "timestamp": time.time()
+        })
+        if check.get("slow_drive"):
+            self.emit(f"WARNING: {check['mb_per_s']:.1f} MB/s is far below the usual "
+                      f"{check['expected_mb_per_s']:.1f} MB/s for {check['basis']}; the drive may be failing.")
+        elif check.get("mb_per_s") and check.get("basis") == "no baseline":
+            self.emit(f"{check['mb_per_s']:.1f} MB/s; no baseline for this model yet, slow-drive check skipped.")
+        return check
+
+    def run(self):
+        result = {
+            "success": False,
+            "drive": self.drive,
+            "pdf": None,
+            "json": None,
+            "cert_data": None,
+            "log_path": None
+        }
+
+        device_path = self._device_path()
+        dev_size = self._device_size_bytes()
+
+        # SSDs get a probed, capability-aware plan (see erase_planner);
+        # if probing fails they fall back to the fixed table like the rest.
+        plan = None
+        if self.media_type in PLANNED_MEDIA:
+            stage_start = self._begin_stage("plan")
+            plan = plan_erase(self.media_type, device_path, dev_size, run=self.runner.check_output)
+            self._record_stage("plan", stage_start)
+
+        if plan is not None:
+            method_name = plan["method_name"]
+            steps = plan["steps"]
+        else:
+            method_name, base_cmd = NIST_METHODS.get(self.media_type, NIST_METHODS["Unknown"])
+
+            # FIX: Correctly construct the command for all cases
+            cmd = list(base_cmd)
+            is_dd_command = 'dd' in cmd
+
+            if is_dd_command:
+                 # dd command needs its 'of=' part constructed with the full path
+                 for i, part in enumerate(cmd):
+                     if part.startswith('of='):
+                         cmd[i] = f"of={device_path}"
+                         break
+            else:
+                # Most other commands just append the device path at the end
+                cmd.append(device_path)
+            steps = [{"cmd": cmd, "poll": None}]
+
+        # Failing-media mode replaces any overwrite-class method; purge
+        # methods that run inside the drive are left alone. It writes
+        # in-process, so a device this user cannot open keeps the sudo command.
+        resilient = self.overwrite_mode == "resilient" and (plan is None or plan["nist_level"] == "Clear")
+        if resilient and not os.access(device_path, os.R_OK | os.W_OK):
+            self.emit(f"Failing-media mode needs read-write access to {device_path}, which this user lacks "
+                      f"(run SecureWiper as root); using {method_name} instead")
+            resilient = False
+        if resilient:
+            method_name = "Resilient Overwrite 1-pass (NIST 800-88 Clear)"
+            steps = [{"engine": "resilient"}]
+        elif self.overwrite_mode == "compare" and (plan is None or plan["nist_level"] == "Clear"):
+            method_name = "Read-Compare-Skip Overwrite 1-pass (NIST 800-88 Clear)"
+            steps = [{"engine": "compare"}]
+
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        base_name = f"{self.drive}_{timestamp}"
+        log_file = os.path.join(self.out_dir, f"{base_name}.log")
+        result["log_path"] = log_file
+
+        eta = self._estimate_eta(method_name, dev_size, plan)
+
+        self._append_entry({
+            "event": "start_wipe",
+            "drive": self.drive,
+            "device_path": device_path,
+            "serial": self.serial,
+            "model": self.model,
+            "media_type": self.media_type,
+            "method_name": method_name,
+            "size_bytes": dev_size,
+            "eta_seconds": eta and round(eta["seconds"]),
+            "timestamp": time.time()
+        })
+        self._publish("job_start", serial=self.serial, model=self.model, media_type=self.media_type,
+                      method_name=method_name, size_bytes=dev_size, eta_seconds=eta and round(eta["seconds"]),
+                      log_path=log_file)
+
+        if plan is not None:
+            self._append_entry({
+                "event": "erase_plan",
+                "method_name": plan["method_name"],
+                "nist_level": plan["nist_level"],
+                "estimated_seconds": plan["estimated_seconds"],
+                "reason": plan["reason"],
+                "steps": [step["cmd"] for step in steps],
+                "candidates": plan["candidates"],
+                "timestamp": time.time()
+            })
+            self.emit(f"Planned {plan['nist_level']} method: {method_name} "
+                      f"(est. {plan['estimated_seconds']} s, {plan['reason']})")
+
+        pre_fp = None
+        if self.fingerprint:
+            stage_start = self._begin_stage("fingerprint")
+            try:
+                pre_fp = self._record_fingerprint("pre_wipe", device_path, base_name)
+            except Exception as e:
+                self.emit(f"Pre-wipe fingerprint failed: {e}")
+            self._record_stage("fingerprint", stage_start)
+
+        self.emit(f"Using method: {method_name}")
+
+        # In-drive purges (crypto erase, sanitize) are already near-instant
+        if self.quick_kill and dev_size and (plan is None or plan["nist_level"] == "Clear"):
+            stage_start = self._begin_stage("quick_kill")
+            self._run_quick_kill(device_path, dev_size)
+            self._record_stage("quick_kill", stage_start)
+
+        stage_start = self._begin_stage("erase")
+        success = True
+        overwrite_report = None
+        for step in steps:
+            if step.get("engine") == "resilient":
+                overwrite_report = self._run_resilient_overwrite(device_path, dev_size)
+                success = bool(overwrite_report) and not overwrite_report["unwritable_ranges"]
+                continue
+            if step.get("engine") == "compare":
+                compare_report = self._run_compare_overwrite(device_path, dev_size)
+                success = bool(compare_report) and not compare_report["failed_ranges"]
+                continue
+            if self._run_command(step["cmd"], dev_size) != 0:
+                success = False
+                break
+            if step.get("poll") and not self._wait_for_sanitize(
+                    step["poll"], device_path, plan and plan["estimated_seconds"]):
+                success = False
+                break
+        result["success"] = success
+        self._record_stage("erase", stage_start)
+        self._publish_throughput(dev_size if success else None, dev_size, force=True)
+        result["slow_drive"] = self._record_throughput(log_file, method_name, dev_size, success).get("slow_drive", False)
+
+        # Partial success: the drive was overwritten except for a known map of bad regions
+        cert_status = None
+        cert_extra = {}
+        if overwrite_report and overwrite_report["unwritable_ranges"]:
+            ranges = overwrite_report["unwritable_ranges"]
+            result["partial"] = True
+            cert_status = "PARTIAL"
+            shown = ", ".join(f"{r['start']}-{r['end']}" for r in ranges[:3])
+            if len(ranges) > 3:
+                shown += f" (+{len(ranges) - 3} more in log)"
+            cert_extra = {
+                "Unwritable Bytes": f"{overwrite_report['unwritable_bytes']} of {overwrite_report['bytes_total']}",
+                "Unwritable Ranges": shown,
+            }
+
+        if self.fingerprint:
+            stage_start = self._begin_stage("fingerprint")
+            try:
+                self._record_fingerprint("post_wipe", device_path, base_name, previous=pre_fp)
+            except Exception as e:
+                self.emit(f"Post-wipe fingerprint failed: {e}")
+            self._record_stage("fingerprint", stage_start)
+
+        stage_start = self._begin_stage("sampling")
+        self.emit("Starting random sector sampling for verification...")
+        samples = self._sample_random_sectors(device_path, dev_size, self.sample_count)
+        self._append_entry({ "event": "sector_samples", "samples": samples, "timestamp": time.time() })
+        self.emit(f"Sampled {len(samples)} sectors.")
+        self._record_stage("sampling", stage_start)
+
+        final_hash = self.prev_hash
+        if self.anchor_mode == "sync":
+            stage_start = self._begin_stage("anchor")
+            txid = anchor_hash(final_hash)
+            result["anchor_status"] = "anchored"
+            self._record_stage("anchor", stage_start)
+            self._publish("ledger", status="anchored", final_hash=final_hash, txid=txid)
+        else:
+            # Confirmed later by the anchor submitter, which appends an
+            # anchor_confirmed entry and updates the certificate.
+            txid = None
+            result["anchor_status"] = "queued"
+
+        self._append_entry({
+            "event": "end_wipe",
+            "timestamp": time.time(),
+            "success": result["success"],
+            "final_hash": final_hash,
+            "txid": txid,
+            "anchor_status": result["anchor_status"]
+        })
+
+        stage_start = self._begin_stage("log_write")
+        with open(log_file, "w") as f:
+            json.dump({"log_entries": self.log_entries}, f, indent=2)
+        self._record_stage("log_write", stage_start)
+
+        # Generate certificate and reports
+        stage_start = self._begin_stage("report")
+        try:
+            json_path, pdf_path, cert_data_dict = generate_report_and_sign(
+                drive=self.drive,
+                serial=self.serial,
+                wipe_method=method_name,
+                success=result["success"],
+                final_hash=final_hash,
+                txid=txid or "Pending anchor",
+                status=cert_status,
+                extra_fields=cert_extra
+            )
+            result["pdf"] = pdf_path
+            result["json"] = json_path
+            result["cert_data"] = cert_data_dict # This is the crucial part for the viewer
+            self.emit(f"Generated report: {pdf_path}")
+            self._publish("certificate", status=cert_data_dict["Status"], json=json_path, pdf=pdf_path,
+                          final_hash=final_hash)
+        except Exception as e:
+            self.emit(f"Failed to generate signed report: {e}")
+            self._publish("certificate", status="error", error=str(e))
+        self._record_stage("report", stage_start)
+
+        if result["anchor_status"] == "queued":
+            stage_start = self._begin_stage("anchor")
+            try:
+                enqueue_anchor(final_hash, log_file, result["json"])
+                self.emit("Final hash queued for anchoring.")
+            except Exception as e:
+                result["anchor_status"] = "failed"
+                self.emit(f"Failed to queue final hash for anchoring: {e}")
+            self._record_stage("anchor", stage_start)
+            self._publish("ledger", status=result["anchor_status"], final_hash=final_hash, txid=None)
+
+        result["stage_timings"] = self.stage_timings
+        self._publish("job_finished", success=result["success"], partial=result.get("partial", False),
+                      slow_drive=result.get("slow_drive", False), anchor_status=result["anchor_status"],
+                      stage_timings={k: round(v, 3) for k, v in self.stage_timings.items()})
+        return result
+
+
+def append_log_entry(log_path, entry):
+    """
+    Chain a new entry onto an already written wipe log (e.g. when the anchor
+    for its final hash is confirmed later). Returns the new chain hash.
+    """
+    with open(log_path, "r") as f:
+        log_entries = json.load(f)["log_entries"]
+    prev_hash = log_entries[-1]["chain_hash"] if log_entries else hashlib.sha256(b"genesis").hexdigest()
+
+    h = hashlib.sha256()
+    h.update(prev_hash.encode("utf-8"))
+    h.update(json.dumps(entry, sort_keys=True).encode("utf-8"))
+    entry["chain_hash"] = h.hexdigest()
+    log_entries.append(entry)
+
+    tmp_path = log_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"log_entries": log_entries}, f, indent=2)
+    os.replace(tmp_path, log_path)
+    return entry["chain_hash"]
+
+
+def failed_result(drive, error):
+    """Result dict for a job that died before producing one of its own."""
+    return {
+        "success": False,
+        "drive": drive,
+        "pdf": None,
+        "json": None,
+        "cert_data": None,
+        "log_path": None,
+        "error": error
+    }
+
+
+def run_job_in_worker(conn, drive, media_type, serial=None, sample_count=5, job_options=None):
+    """
+    Entry point of a wipe worker process. Runs one WipeJob and streams
+    ("progress", line) and ("event", event) messages followed by one
+    ("finished", result) over the write end of a multiprocessing Pipe.
+    """
+    def emit(line):
+        try:
+            conn.send(("progress", line))
+        except (BrokenPipeError, OSError):
+            # GUI went away; keep wiping, the log and certificate still land on disk
+            pass
+
+    def forward_event(event):
+        try:
+            conn.send(("event", event))
+        except (BrokenPipeError, OSError):
+            pass
+
+    try:
+        job = WipeJob(drive, media_type, serial, sample_count, emit=emit, events=forward_event,
+                      **(job_options or {}))
+        result = job.run()
+    except Exception:
+        result = failed_result(drive, traceback.format_exc())
+    try:
+        conn.send(("finished", result))
+    except (BrokenPipeError, OSError):
+        pass
+    conn.close()
@@ -0,0 +1,299 @@
+#wipe_stats.py
+# Historical wipe throughput. Every finished job records model, serial,
+# media type, method, size and erase duration into a local SQLite store;
+# old jobs can be back-filled from the chained logs in wipes/. The
+# per-model / per-method figures drive:
+#   - ETA estimates when a job starts (estimate_seconds)
+#   - longest-first ordering of queued jobs so bays don't idle at the end
+#     of a batch waiting on one big drive (order_longest_first)
+#   - a slow-drive flag for drives writing far below their model's history,
+#     which usually means the drive is failing (check_throughput)
+#
+#   python wipe_stats.py import            # back-fill from wipes/*.log
+#   python wipe_stats.py report
+#   python wipe_stats.py eta --model "ST2000DM008-2FR1" --media-type HDD --size 2T
+import os
+import re
+import glob
+import json
+import sqlite3
+import argparse
+import statistics
+
+STATS_DB = os.environ.get("SECUREWIPER_STATS_DB", "wipe_stats.db")
+
+# Fewest past wipes a group needs before its figures are trusted
+MIN_HISTORY = 3
+# A drive below this fraction of its group's median MB/s is flagged as slow
+SLOW_FRACTION = 0.5
+# Jobs with less erase time than this (crypto erase, aborted runs) say
+# nothing about write throughput
+MIN_RATE_SECONDS = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wipes (
+    log_path      TEXT PRIMARY KEY,
+    drive         TEXT,
+    model         TEXT,
+    serial        TEXT,
+    media_type    TEXT,
+    method        TEXT,
+    size_bytes    INTEGER,
+    started       REAL,
+    erase_seconds REAL,
+    mb_per_s      REAL,
+    success       INTEGER,
+    slow          INTEGER
+);
+CREATE INDEX IF NOT EXISTS wipes_model ON wipes (model, method);
+CREATE INDEX IF NOT EXISTS wipes_method ON wipes (method, media_type);
+"""
+
+_SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4, "P": 1024 ** 5}
+
+
+def _connect(db_path=None):
+    # Wipe workers write concurrently; let them queue on the lock
+    conn = sqlite3.connect(db_path or STATS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def parse_size(text):
+    """lsblk-style size ("465.8G", "2T", "512") to bytes, or None."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGTP]?)(?:i?B)?\s*", str(text or ""), re.IGNORECASE)
+    if not match:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def mb_per_s(size_bytes, erase_seconds):
+    if not size_bytes or not erase_seconds or erase_seconds < MIN_RATE_SECONDS:
+        return None
+    return size_bytes / 1e6 / erase_seconds
+
+
+def record_wipe(log_path, drive, model, serial, media_type, method, size_bytes,
+                started, erase_seconds, success, slow=False, db_path=None):
+    """Insert or replace the stats row for one job (keyed by its log file)."""
+    with _connect(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO wipes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(log_path), drive, model or None, serial, media_type, method,
+             size_bytes, started, erase_seconds,
+             mb_per_s(size_bytes, erase_seconds) if success else None,
+             int(bool(success)), int(bool(slow))),
+        )
+    conn.close()
+
+
+def stats_from_log(log_path):
+    """
+    Pull a stats row out of a chained wipe log. Logs written before sizes
+    were recorded only give the start/end duration, so their MB/s is unknown.
+    """
+    with open(log_path) as f:
+        entries = json.load(f).get("log_entries", [])
+    start = next((e for e in entries if e.get("event") == "start_wipe"), None)
+    end = next((e for e in entries if e.get("event") == "end_wipe"), None)
+    if not start or not end:
+        return None
+    throughput = next((e for e in entries if e.get("event") == "throughput"), {})
+    return {
+        "log_path": log_path,
+        "drive": start.get("drive"),
+        "model": start.get("model"),
+        "serial": start.get("serial"),
+        "media_type": start.get("media_type"),
+        "method": start.get("method_name"),
+        "size_bytes": start.get("size_bytes"),
+        "started": start.get("timestamp"),
+        "erase_seconds": throughput.get("erase_seconds", end["timestamp"] - start["timestamp"]),
+        "success": end.get("success", False),
+        "slow": throughput.get("slow_drive", False),
+    }
+
+
+def import_logs(wipes_dir="wipes", db_path=None):
+    """Back-fill the store from every log in wipes_dir; returns the number imported."""
+    imported = 0
+    for log_path in sorted(glob.glob(os.path.join(wipes_dir, "*.log"))):
+        try:
+            row = stats_from_log(log_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if row:
+            record_wipe(db_path=db_path, **row)
+            imported += 1
+    return imported
+
+
+def _group_rows(where, params, db_path=None):
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT size_bytes, erase_seconds, mb_per_s FROM wipes WHERE success = 1 AND slow = 0 AND {where}",
+            params,
+        ).fetchall()
+    conn.close()
+    return rows
+
+
+def _summarise(rows):
+    rates = [r["mb_per_s"] for r in rows if r["mb_per_s"]]
+    durations = [r["erase_seconds"] for r in rows if r["erase_seconds"]]
+    return {
+        "count": len(rows),
+        "rate_samples": len(rates),
+        "median_mb_per_s": statistics.median(rates) if rates else None,
+        "median_seconds": statistics.median(durations) if durations else None,
+    }
+
+
+def group_stats(model=None, method=None, media_type=None, db_path=None):
+    """Summary of past successful wipes matching every given field."""
+    clauses, params = ["1 = 1"], []
+    for column, value in (("model", model), ("method", method), ("media_type", media_type)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return _summarise(_group_rows(" AND ".join(clauses), params, db_path))
+
+
+def aggregate(by, db_path=None):
+    """Per-`by` ("model" or "method") summaries, largest groups first."""
+    if by not in ("model", "method", "media_type"):
+        raise ValueError(f"cannot aggregate by {by!r}")
+    with _connect(db_path) as conn:
+        keys = [r[0] for r in conn.execute(
+            f"SELECT {by} FROM wipes WHERE {by} IS NOT NULL GROUP BY {by} ORDER BY COUNT(*) DESC")]
+    conn.close()
+    return {key: group_stats(db_path=db_path, **{by: key}) for key in keys}
+
+
+def _reference_groups(model, media_type, method):
+    """
+    Most to least specific groups to take history from. With a method only
+    groups of that method are used: a model's or media type's history mixes
+    hours-long overwrites with seconds-long crypto erases.
+    """
+    if method:
+        if model:
+            yield f"model {model}, {method}", {"model": model, "method": method}
+        yield method, {"method": method, "media_type": media_type}
+        return
+    if model:
+        yield f"model {model}", {"model": model}
+    if media_type:
+        yield media_type, {"media_type": media_type}
+
+
+def likely_method(model=None, media_type=None, db_path=None):
+    """
+    The method past wipes of this model (else media type) used most, for
+    jobs that are not planned yet; None without enough history.
+    """
+    for column, value in (("model", model), ("media_type", media_type)):
+        if not value:
+            continue
+        with _connect(db_path) as conn:
+            row = conn.execute(
+                f"SELECT method, COUNT(*) AS n FROM wipes WHERE success = 1 AND slow = 0 AND {column} = ? "
+                "AND method IS NOT NULL GROUP BY method ORDER BY n DESC LIMIT 1", (value,)).fetchone()
+        conn.close()
+        if row and row["n"] >= MIN_HISTORY:
+            return row["method"]
+    return None
+
+
+def estimate_seconds(model=None, media_type=None, method=None, size_bytes=None, db_path=None):
+    """
+    ETA from the most specific group with enough history: size / median
+    MB/s when the size is known and the group has rates, else the median
+    duration (fixed-time methods such as crypto erase never have a rate).
+    Returns {"seconds", "basis", "samples"} or None without enough history.
+    """
+    for basis, fields in _reference_groups(model, media_type, method):
+        stats = group_stats(db_path=db_path, **fields)
+        if size_bytes and stats["rate_samples"] >= MIN_HISTORY:
+            return {"seconds": size_bytes / 1e6 / stats["median_mb_per_s"],
+                    "basis": basis, "samples": stats["rate_samples"]}
+        if ((not size_bytes or not stats["rate_samples"])
+                and stats["count"] >= MIN_HISTORY and stats["median_seconds"]):
+            return {"seconds": stats["median_seconds"], "basis": basis, "samples": stats["count"]}
+    return None
+
+
+def check_throughput(model, media_type, method, size_bytes, erase_seconds, db_path=None):
+    """
+    Compare a finished erase against past wipes of the same model with the
+    same method. Method or media-type medians are not used: a healthy but
+    naturally slow model (5400 rpm disk, USB 2.0 stick) would look failing
+    next to them. Returns {"mb_per_s", "expected_mb_per_s", "basis",
+    "slow_drive"}; basis is "no baseline" without enough model history.
+    """
+    rate = mb_per_s(size_bytes, erase_seconds)
+    result = {"mb_per_s": rate, "expected_mb_per_s": None, "basis": "no baseline", "slow_drive": False}
+    if rate is None or not model or not method:
+        return result
+    stats = group_stats(model=model, method=method, db_path=db_path)
+    if stats["rate_samples"] >= MIN_HISTORY:
+        result["expected_mb_per_s"] = stats["median_mb_per_s"]
+        result["basis"] = f"model {model}, {method}"
+        result["slow_drive"] = rate < SLOW_FRACTION * stats["median_mb_per_s"]
+    return result
+
+
+def order_longest_first(jobs, db_path=None):
+    """
+    Sort job dicts (model, media_type, size_bytes, optional method) by
+    estimated erase time, longest first, setting job["eta"] to the estimate
+    (or None). Jobs not planned yet are estimated for the method their model
+    or media type usually gets. Jobs with no history go first: they are the
+    ones most likely to be long.
+    """
+    for job in jobs:
+        method = job.get("method") or likely_method(job.get("model"), job.get("media_type"), db_path=db_path)
+        job["eta"] = estimate_seconds(job.get("model"), job.get("media_type"), method,
+                                      size_bytes=job.get("size_bytes"), db_path=db_path)
+    return sorted(jobs, key=lambda j: float("inf") if j["eta"] is None else j["eta"]["seconds"],
+                  reverse=True)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historical wipe throughput")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="back-fill the store from wipe logs")
+    p_import.add_argument("wipes_dir", nargs="?", default="wipes")
+    sub.add_parser("report", help="per-model and per-method throughput")
+    p_eta = sub.add_parser("eta", help="estimate an erase")
+    p_eta.add_argument("--model")
+    p_eta.add_argument("--media-type")
+    p_eta.add_argument("--method")
+    p_eta.add_argument("--size", help="e.g. 931.5G")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"Imported {import_logs(args.wipes_dir)} logs into {STATS_DB}")
+    elif args.command == "report":
+        for by in ("model", "method"):
+            print(f"By {by}:")
+            for key, s in aggregate(by).items():
+                rate = f"{s['median_mb_per_s']:8.1f} MB/s" if s["median_mb_per_s"] else "       n/a"
+                took = format_duration(s["median_seconds"]) if s["median_seconds"] else "n/a"
+                print(f"  {key:<48} {s['count']:5d} wipes  {rate}  median {took}")
+    else:
+        eta = estimate_seconds(args.model, args.media_type, args.method, parse_size(args.size))
+        if eta is None:
+            print("Not enough history for an estimate")
+        else:
+            print(f"~{format_duration(eta['seconds'])} (from {eta['samples']} past wipes: {eta['basis']})")